@@ -4,100 +4,193 @@ import subprocess
 import sys
 import requests
 from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+
+# Project root on sys.path so the pipeline stages import in-process
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.pipeline import run as run_pipeline, StageError, FileCheckpoints
+from tools import shards
+from tools.shards import MANIFEST
+from tools.kv_publish import KVClient, Publisher, API_BASE, read as kv_read
+from tools import user_sections
+
+# PIPELINE_MODE=subprocess runs each stage in its own interpreter (isolation)
+PIPELINE_MODE = os.environ.get('PIPELINE_MODE', 'inprocess').lower()
+# Seconds of the function's maxDuration (300) the pipeline may use; the rest
+# is left for the KV publish. Past it the run checkpoints and returns 202
+# with a continuation token (?continue=<token>) for the next invocation.
+PIPELINE_BUDGET = float(os.environ.get('PIPELINE_BUDGET_SEC', '240'))
+# KV_API_BASE=http://127.0.0.1:8788/client/v4 runs against tools/kv_local.py
+KV_BASE = API_BASE.rstrip('/') + "/accounts/{account}/storage/kv/namespaces/{namespace}/values/"
+# health.json fields that change every run; they alone do not trigger an upload
+HEALTH_VOLATILE = ('lastUpdated', 'stageTimings')
+# Single-user state blob the Worker wrote before per-user keys (user/<uid>/state.json)
+LEGACY_STATE_KEY = "user_state_personal.json"
+
+class KVCheckpoints:
+    """Pipeline checkpoint kept in Cloudflare KV (the function's disk does not survive invocations)"""
+    KEY = "pipeline_checkpoint.json"
+
+    def __init__(self, account, namespace, token):
+        self.url = KV_BASE.format(account=account, namespace=namespace) + self.KEY
+        self.headers = {'Authorization': f"Bearer {token}"}
+
+    def load(self):
+        r = requests.get(self.url, headers=self.headers, timeout=15)
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        return r.json()
+
+    def save(self, ck):
+        r = requests.put(self.url, headers={**self.headers, 'Content-Type': 'application/json'},
+                         data=json.dumps(ck, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), timeout=30)
+        r.raise_for_status()
+
+    def clear(self):
+        requests.delete(self.url, headers=self.headers, timeout=15)
+
+def kv_manifest(client):
+    """The manifest KV serves now, or None (first publish, or unreadable)"""
+    try:
+        raw = kv_read(client, MANIFEST)
+        m = json.loads(raw) if raw else None
+    except ValueError as e:
+        print(f"[WARN] KV {MANIFEST} unreadable: {e}, starting a new change feed", file=sys.stderr)
+        return None
+    return m if isinstance(m, dict) and m.get('version') == shards.MANIFEST_VERSION else None
+
+def publish_kv(publisher, data_obj, health_data, root):
+    """
+    data.json, the shards and search index QC's emit wrote under root,
+    manifest.json and health.json through the hash-gated publisher (only
+    changed values are uploaded; shards and feeds neither the new nor the
+    previous manifest references are deleted). The function's disk only has
+    the deployed manifest, so the change feed is chained onto the manifest KV
+    serves, with its view shards read back from KV.
+    """
+    manifest = shards.load_manifest(root)
+    parts = shards.split(data_obj)
+    hashes = {n: {'hash': shards.shard_hash(shards.encode(parts[n]))} for n in shards.VIEW_SHARDS}
+    if manifest is None or manifest.get('dataVersion') != shards.view_version(hashes, data_obj.get('sections') or {}):
+        raise RuntimeError(f"{MANIFEST} under {root} is not this run's (QC did not write the shards)")
+    prev = kv_manifest(publisher.kv)
+    view = [r for n in shards.VIEW_SHARDS for r in parts[n]]
+    changes, feeds = shards.chain(prev, manifest['dataVersion'], view, lambda path: kv_read(publisher.kv, path))
+    manifest = {**manifest, 'changes': changes}
+    # Served JSON goes up with its .gz/.br siblings (Content-Encoding in their KV metadata)
+    publisher.put_json('data.json', data_obj, precompressed=True)
+    for s in list(manifest['shards'].values()) + ([manifest['search']] if manifest.get('search') else []):
+        with open(os.path.join(root, s['path']), 'rb') as f:
+            publisher.put(s['path'], f.read(), precompressed=True)
+    for path, blob in feeds.items():
+        publisher.put(path, blob, precompressed=True)
+    # manifest last: it must never point at a shard KV does not have yet
+    publisher.put_json(MANIFEST, manifest, volatile=('generatedAt',), precompressed=True)
+    # A browser may still hold the previous manifest: keep what it points at one more round
+    publisher.prune((shards.SHARD_DIR + '/', shards.CHANGES_DIR + '/'), shards.referenced(manifest) | shards.referenced(prev))
+    publisher.put_json('health.json', health_data, volatile=HEALTH_VOLATILE)
+    return publisher.finish()
+
+def request_param(request, name):
+    """Query parameter from whatever request shape the runtime hands us"""
+    try:
+        args = getattr(request, 'args', None)
+        if args is not None and args.get(name):
+            return args.get(name)
+        if isinstance(request, dict):
+            q = request.get('queryStringParameters') or request.get('query') or {}
+            if q.get(name):
+                return q.get(name)
+        path = getattr(request, 'path', None) or (request.get('path') if isinstance(request, dict) else None)
+        if path:
+            vals = parse_qs(urlparse(path).query).get(name)
+            if vals:
+                return vals[0]
+    except Exception:
+        pass
+    return None
+
 def handler(request):
-try:
-project_root = os.getcwd()
-print(f"[INFO] Project root: {project_root}", file=sys.stderr)
-required_files = ['tools/collector.py', 'tools/schema_merge.py', 'qc_and_learn.py']
-for req_file in required_files:
-full_path = os.path.join(project_root, req_file)
-if not os.path.exists(full_path):
-print(f"[ERROR] Missing required file: {req_file}", file=sys.stderr)
-return {'statusCode': 500,'body': json.dumps({'ok': False,'error': 'missing_file','file': req_file,'path': full_path})}
-print("[STEP 0] Fetching user_state from Cloudflare KV...", file=sys.stderr)
-kv_account = os.environ.get('CLOUDFLARE_KV_ACCOUNT_ID')
-kv_token = os.environ.get('CLOUDFLARE_KV_API_TOKEN')
-kv_namespace = os.environ.get('CLOUDFLARE_KV_NAMESPACE_ID')
-user_state_data = {}
-if kv_account and kv_token and kv_namespace:
-try:
-kv_url = f"https://api.cloudflare.com/client/v4/accounts/{kv_account}/storage/kv/namespaces/{kv_namespace}/values/user_state_personal.json"
-kv_response = requests.get(kv_url, headers={'Authorization': f"Bearer {kv_token}"}, timeout=15)
-if kv_response.ok:
-user_state_data = kv_response.json()
-print(f"[OK] Downloaded user_state from KV: {len(user_state_data)} entries", file=sys.stderr)
-else:
-print(f"[WARN] KV fetch returned {kv_response.status_code}", file=sys.stderr)
-except Exception as e:
-print(f"[WARN] KV fetch failed: {e}", file=sys.stderr)
-else:
-print("[WARN] Missing KV credentials - using empty user_state", file=sys.stderr)
-try:
-with open('user_state.json', 'w', encoding='utf-8') as f:
-json.dump(user_state_data, f, indent=2, ensure_ascii=False)
-print(f"[OK] Wrote user_state.json", file=sys.stderr)
-except Exception as e:
-print(f"[WARN] Writing user_state.json failed: {e}", file=sys.stderr)
-print("[STEP 1] Running collector...", file=sys.stderr)
-collector_result = subprocess.run([sys.executable, os.path.join(project_root, 'tools/collector.py')], capture_output=True, text=True, timeout=120, cwd=project_root)
-if collector_result.returncode != 0:
-print(f"[ERROR] Collector failed: {collector_result.stderr}", file=sys.stderr)
-return {'statusCode': 500,'body': json.dumps({'ok': False,'error': 'collector_failed','detail': collector_result.stderr[:500],'stdout': collector_result.stdout[:500]})}
-candidates = []
-for line in collector_result.stdout.strip().split('\n'):
-s = line.strip()
-if not s: continue
-try: candidates.append(json.loads(s))
-except json.JSONDecodeError: pass
-os.makedirs('tmp', exist_ok=True)
-with open('tmp/candidates.jsonl', 'w', encoding='utf-8') as f:
-for cand in candidates: f.write(json.dumps(cand, ensure_ascii=False) + '\n')
-print(f"[OK] Collector: {len(candidates)} candidates -> tmp/candidates.jsonl", file=sys.stderr)
-print("[STEP 2] Running schema merge...", file=sys.stderr)
-data_json_path = os.path.join(project_root, 'data.json')
-merge_result = subprocess.run([sys.executable, os.path.join(project_root, 'tools/schema_merge.py'), data_json_path, 'tmp/candidates.jsonl', data_json_path], capture_output=True, text=True, timeout=120, cwd=project_root)
-if merge_result.returncode != 0:
-print(f"[WARN] Schema merge non-zero: {merge_result.stderr}", file=sys.stderr)
-print("[OK] Schema merge completed", file=sys.stderr)
-print("[STEP 3] Running QC and Learn...", file=sys.stderr)
-qc_result = subprocess.run([sys.executable, os.path.join(project_root, 'qc_and_learn.py'), '--mode', 'nightly'], capture_output=True, text=True, timeout=120, cwd=project_root)
-if qc_result.returncode != 0:
-print(f"[WARN] QC returned non-zero: {qc_result.stderr}", file=sys.stderr)
-print("[OK] QC completed", file=sys.stderr)
-print("[STEP 4] Reading final data.json...", file=sys.stderr)
-try:
-data_obj = json.loads(open(data_json_path, 'r', encoding='utf-8').read())
-job_count = len(data_obj.get('jobListings', []))
-print(f"[OK] Final data.json: {job_count} jobs", file=sys.stderr)
-except Exception as e:
-print(f"[ERROR] Reading data.json: {e}", file=sys.stderr)
-return {'statusCode': 500,'body': json.dumps({'ok': False,'error': 'data_read_failed','detail': str(e)[:200]})}
-print("[STEP 5] Saving to Cloudflare KV...", file=sys.stderr)
-kv_saved = False
-if kv_account and kv_token and kv_namespace:
-try:
-health_data = {'ok': True,'totalListings': job_count,'lastUpdated': datetime.utcnow().isoformat() + 'Z','source': 'vercel-scraper'}
-kv_health_url = f"https://api.cloudflare.com/client/v4/accounts/{kv_account}/storage/kv/namespaces/{kv_namespace}/values/health.json"
-hr = requests.put(kv_health_url, headers={'Authorization': f"Bearer {kv_token}", 'Content-Type': 'application/json'}, json=health_data, timeout=30)
-if not hr.ok: print(f"[WARN] Health save failed: {hr.status_code}", file=sys.stderr)
-if job_count > 0:
-kv_data_url = f"https://api.cloudflare.com/client/v4/accounts/{kv_account}/storage/kv/namespaces/{kv_namespace}/values/data.json"
-dr = requests.put(kv_data_url, headers={'Authorization': f"Bearer {kv_token}", 'Content-Type': 'application/json'}, json=data_obj, timeout=30)
-if dr.ok: print(f"[OK] KV saved data.json", file=sys.stderr); kv_saved = True
-else: print(f"[ERROR] KV data save failed: {dr.status_code} - {dr.text[:200]}", file=sys.stderr)
-else:
-print("[SKIP] KV save: 0 jobs (protect against empty publish)", file=sys.stderr)
-except Exception as e:
-print(f"[ERROR] KV save exception: {e}", file=sys.stderr)
-else:
-print("[WARN] Missing KV credentials - skipping KV save", file=sys.stderr)
-try: os.remove('tmp/candidates.jsonl')
-except: pass
-return {'statusCode': 200,'body': json.dumps({'ok': True,'collected': len(candidates),'jobs_in_data': job_count,'merged': True,'qc_passed': True,'stored_in_kv': kv_saved,'user_state_synced': bool(user_state_data),'timestamp': datetime.utcnow().isoformat() + 'Z'})}
-except subprocess.TimeoutExpired as e:
-print(f"[ERROR] Process timeout: {e}", file=sys.stderr)
-return {'statusCode': 500,'body': json.dumps({'ok': False,'error': 'timeout','detail': str(e)[:200]})}
-except Exception as e:
-print(f"[ERROR] Exception: {e}", file=sys.stderr)
-import traceback; traceback.print_exc(file=sys.stderr)
-return {'statusCode': 500,'body': json.dumps({'ok': False,'error': 'exception','detail': str(e)[:500]})}
+    try:
+        project_root = os.getcwd()
+        print(f"[INFO] Project root: {project_root}", file=sys.stderr)
+        required_files = ['sources/collector.py', 'tools/schema_merge.py', 'qc_and_learn.py']
+        for req_file in required_files:
+            full_path = os.path.join(project_root, req_file)
+            if not os.path.exists(full_path):
+                print(f"[ERROR] Missing required file: {req_file}", file=sys.stderr)
+                return {'statusCode': 500,'body': json.dumps({'ok': False,'error': 'missing_file','file': req_file,'path': full_path})}
+        print("[STEP 0] Fetching pinned job IDs from Cloudflare KV...", file=sys.stderr)
+        kv_account = os.environ.get('CLOUDFLARE_KV_ACCOUNT_ID')
+        kv_token = os.environ.get('CLOUDFLARE_KV_API_TOKEN')
+        kv_namespace = os.environ.get('CLOUDFLARE_KV_NAMESPACE_ID')
+        users_kv, users, pinned = None, None, None
+        if kv_account and kv_token and kv_namespace:
+            users_kv = KVClient(kv_account, kv_namespace, kv_token)
+            try:
+                # The old single-user blob becomes user/personal/* the first time (and whenever it changes)
+                legacy = users_kv.get(LEGACY_STATE_KEY)
+                if legacy:
+                    user_sections.import_legacy(users_kv, json.loads(legacy))
+                users = user_sections.load_users(users_kv)
+                pinned = user_sections.pinned_ids(users)
+                print(f"[OK] {len(pinned)} pinned job IDs from {len(users)} users in KV", file=sys.stderr)
+            except Exception as e:
+                # Without the pins QC could archive jobs someone applied to: stop here
+                print(f"[ERROR] KV user meta fetch failed: {e}", file=sys.stderr)
+                return {'statusCode': 503,'body': json.dumps({'ok': False,'error': 'user_meta_unavailable','detail': str(e)[:300]})}
+        else:
+            print("[WARN] Missing KV credentials - using local users/", file=sys.stderr)
+        token = request_param(request, 'continue')
+        budget = float(request_param(request, 'budget') or PIPELINE_BUDGET)
+        store = KVCheckpoints(kv_account, kv_namespace, kv_token) if (kv_account and kv_token and kv_namespace) else FileCheckpoints(project_root)
+        print(f"[STEP 1-3] Running pipeline ({PIPELINE_MODE}, budget {budget:.0f}s{', continuing ' + token if token else ''})...", file=sys.stderr)
+        try:
+            result = run_pipeline(project_root, pinned=pinned, mode='nightly', how=PIPELINE_MODE,
+                                  budget=budget, token=token, store=store)
+        except StageError as e:
+            print(f"[ERROR] Stage {e.stage} failed: {e.detail}", file=sys.stderr)
+            return {'statusCode': 500,'body': json.dumps({'ok': False,'error': f"{e.stage}_failed",'detail': e.detail[:500],'stdout': e.stdout[:500]})}
+        if not result['complete']:
+            print(f"[PARTIAL] Checkpointed before {result['stage']}; continue with {result['continuation']}", file=sys.stderr)
+            return {'statusCode': 202,'body': json.dumps({'ok': True,'complete': False,'continuation': result['continuation'],'stage': result['stage'],'timings': result['timings'],'timestamp': datetime.utcnow().isoformat() + 'Z'})}
+        data_obj = result['data']
+        job_count = result['jobs']
+        timings = result['timings']
+        print(f"[OK] Final data.json: {job_count} jobs; timings {json.dumps(timings)}", file=sys.stderr)
+        print("[STEP 4] Saving to Cloudflare KV...", file=sys.stderr)
+        kv_saved, kv_stats = False, None
+        if kv_account and kv_token and kv_namespace:
+            try:
+                health_data = {'ok': True,'totalListings': job_count,'lastUpdated': datetime.utcnow().isoformat() + 'Z','source': 'vercel-scraper','stageTimings': timings,'publish': result.get('publish')}
+                publisher = Publisher(KVClient(kv_account, kv_namespace, kv_token))
+                if job_count > 0:
+                    # Hash-gated against data.meta: a run that changed nothing uploads nothing
+                    kv_stats = publish_kv(publisher, data_obj, health_data, project_root)
+                    kv_saved = True
+                else:
+                    print("[SKIP] KV save: 0 jobs (protect against empty publish)", file=sys.stderr)
+                    publisher.put_json('health.json', health_data, volatile=HEALTH_VOLATILE)
+                    kv_stats = publisher.finish()
+                print(f"[OK] KV publish: {json.dumps(kv_stats)}", file=sys.stderr)
+            except Exception as e:
+                print(f"[ERROR] KV save exception: {e}", file=sys.stderr)
+        else:
+            print("[WARN] Missing KV credentials - skipping KV save", file=sys.stderr)
+        users_refreshed = None
+        if users_kv is not None:
+            print("[STEP 5] Re-materialising stale user sections...", file=sys.stderr)
+            try:
+                # Only users with an expiring exam_done mark or a re-keyed job ID
+                users_refreshed = len(user_sections.refresh(users_kv, aliases=result.get('aliases'), users=users))
+            except Exception as e:
+                print(f"[WARN] User sections refresh failed: {e}", file=sys.stderr)
+        return {'statusCode': 200,'body': json.dumps({'ok': True,'collected': result['collected'],'jobs_in_data': job_count,'merged': True,'qc_passed': True,'stored_in_kv': kv_saved,'kv': kv_stats,'pinned': len(pinned) if pinned is not None else None,'users_refreshed': users_refreshed,'pipeline': result['mode'],'complete': True,'timings': timings,'timestamp': datetime.utcnow().isoformat() + 'Z'})}
+    except subprocess.TimeoutExpired as e:
+        print(f"[ERROR] Process timeout: {e}", file=sys.stderr)
+        return {'statusCode': 500,'body': json.dumps({'ok': False,'error': 'timeout','detail': str(e)[:200]})}
+    except Exception as e:
+        print(f"[ERROR] Exception: {e}", file=sys.stderr)
+        import traceback; traceback.print_exc(file=sys.stderr)
+        return {'statusCode': 500,'body': json.dumps({'ok': False,'error': 'exception','detail': str(e)[:500]})}
@@ -0,0 +1,89 @@
+import hmac
+import json
+import os
+import sys
+from urllib.parse import urlparse, parse_qs
+
+# Per-user state: store one user's marks and materialise only their sections.
+#   POST {"user": uid, "state": {job id: {"action", "ts"}}} -> that user's sections
+#   GET  ?user=uid                                           -> that user's sections
+# Both need "Authorization: Bearer <secret>", the user's own secret (app.js
+# keeps a random uid and secret in localStorage). The first save for a uid
+# claims it with that secret; USER_STATE_INVITE, when set, must also be sent
+# (as "invite") to claim a uid, so strangers cannot create users that pin jobs.
+# A uid that already has marks but no secret (the imported single-user blob,
+# user/personal) is never claimed openly: the save must carry the invite or
+# USER_STATE_MIGRATION_SECRET (as "migration"), else 403 claim_needs_secret.
+# The job pipeline never runs here (tools/user_sections.py).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import user_sections
+from tools.kv_publish import KVClient
+
+INVITE = os.environ.get('USER_STATE_INVITE')
+MIGRATION_SECRET = os.environ.get('USER_STATE_MIGRATION_SECRET')
+
+def matches(sent, expected):
+    return bool(expected) and hmac.compare_digest(str(sent or ''), expected)
+
+def request_body(request):
+    try:
+        if hasattr(request, 'get_json'):
+            return request.get_json(silent=True) or {}
+        body = request.get('body') if isinstance(request, dict) else None
+        if isinstance(body, (str, bytes)) and len(body) > user_sections.MAX_STATE_BYTES * 2:
+            return {}
+        return json.loads(body) if isinstance(body, (str, bytes)) else (body or {})
+    except Exception:
+        return {}
+
+def request_user(request):
+    args = getattr(request, 'args', None)
+    if args is not None and args.get('user'):
+        return args.get('user')
+    if isinstance(request, dict):
+        q = request.get('queryStringParameters') or request.get('query') or {}
+        if q.get('user'):
+            return q.get('user')
+        vals = parse_qs(urlparse(request.get('path') or '').query).get('user')
+        return vals[0] if vals else None
+    return None
+
+def request_secret(request):
+    headers = getattr(request, 'headers', None)
+    if headers is None and isinstance(request, dict):
+        headers = request.get('headers')
+    headers = {str(k).lower(): v for k, v in dict(headers or {}).items()}
+    auth = headers.get('authorization') or ''
+    return auth[7:].strip() if auth.lower().startswith('bearer ') else None
+
+def reply(code, obj):
+    return {'statusCode': code, 'body': json.dumps(obj)}
+
+def handler(request):
+    env = [os.environ.get(k) for k in ('CLOUDFLARE_KV_ACCOUNT_ID', 'CLOUDFLARE_KV_NAMESPACE_ID', 'CLOUDFLARE_KV_API_TOKEN')]
+    if not all(env):
+        return reply(500, {'ok': False, 'error': 'missing_kv_credentials'})
+    kv = KVClient(*env)
+    method = (getattr(request, 'method', None) or (request.get('httpMethod') if isinstance(request, dict) else None) or 'GET').upper()
+    body = request_body(request) if method == 'POST' else {}
+    uid = body.get('user') or request_user(request)
+    try:
+        user_sections.check_uid(uid)
+    except user_sections.StateError as e:
+        return reply(400, {'ok': False, 'error': 'bad_user', 'detail': str(e)})
+    try:
+        vouched = matches(body.get('invite'), INVITE) or matches(body.get('migration'), MIGRATION_SECRET)
+        claim = method == 'POST' and (vouched or not INVITE)
+        if not user_sections.authorize(kv, uid, request_secret(request), claim=claim, adopt=claim and vouched):
+            needs = method == 'POST' and user_sections.unowned(kv, uid)
+            return reply(403, {'ok': False, 'error': 'claim_needs_secret' if needs else 'forbidden'})
+        if method == 'POST':
+            sections = user_sections.save_state(kv, uid, body.get('state'))
+        else:
+            sections = user_sections.load_sections(kv, uid)
+        return reply(200, {'ok': True, 'user': uid, 'sections': sections})
+    except user_sections.StateError as e:
+        return reply(400, {'ok': False, 'error': 'bad_state', 'detail': str(e)})
+    except Exception as e:
+        print(f"[ERROR] user state for {uid}: {e}", file=sys.stderr)
+        return reply(500, {'ok': False, 'error': 'exception', 'detail': str(e)[:300]})
@@ -9,16 +9,61 @@
 
   // FIX P3-W-C-010: Correct data.json URL (from Cloudflare Worker KV, NOT Worker endpoint)
   const DATA_URL = 'https://vacancy.animeshkumar97.workers.dev/data.json';
+  // Sharded data: manifest.json (always revalidated) + content-hashed shards (immutable)
+  const DATA_BASE = DATA_URL.replace(/[^/]*$/, "");
+  const MANIFEST_URL = DATA_BASE + 'manifest.json';
+  const SHARD_CACHE = new Map();  // shard path -> records
+  const DATA_CACHE_KEY = "vac_data_cache";  // {version, jobListings} last built from the manifest
+  let MANIFEST=null;  // last manifest loadData() used (search index path)
+  // Whose marks these are: user/<uid>/* in KV, read and written through
+  // api/user-state.py with this browser's secret (tools/user_sections.py)
+  const USER_STATE_API = window.USER_STATE_API || "/api/user-state";
+  const localValue=(k, make)=>{
+    try{
+      let v=localStorage.getItem(k);
+      if(!v){ v=make(); localStorage.setItem(k, v); }
+      return v;
+    }catch{ return make(); }
+  };
+  const randomId=()=>(crypto.randomUUID ? crypto.randomUUID().replace(/-/g,"") : String(Math.random()).slice(2)+Date.now());
+  // A uid of its own per browser; "personal" (the old single-user marks) is only
+  // kept where it is already stored, and claiming it takes the migration code
+  const USER_ID=localValue("vac_user_id", ()=>"u_"+randomId());
+  const USER_SECRET=localValue("vac_user_secret", randomId);
+  const USER_HEADERS={"Authorization":"Bearer "+USER_SECRET};
+  const JOB_ID=/^[A-Za-z0-9_-]{1,64}$/;
   
   const qs=(s,r)=>(r||document).querySelector(s);
   const qsa=(s,r)=>Array.from((r||document).querySelectorAll(s));
   const esc=(s)=>(s==null?"":String(s)).replace(/[&<>\"']/g,c=>({"&":"&amp;","<":"&lt;",">":"&gt;","\"":"&quot;","'":"'"}[c]));
   
+  // Deadlines are stored as YYYY-MM-DD; dd/mm/yyyy and dd-mm-yyyy still come from older data
+  const DAY_MS=86400000;
+  const parseDeadline=(s)=>{
+    if(!s||typeof s!=="string"||s.toUpperCase()==="N/A") return null;
+    const a=s.replace(/-/g, "/").split("/");
+    if(a.length!==3) return null;
+    const [y,m,d]=(a[0].length===4 ? [a[0],a[1],a[2]] : [a[2],a[1],a[0]]).map(x=>parseInt(x, 10));
+    // FIX P3-W-C-008: Validate day/month ranges
+    if(!(m>=1 && m<=12 && d>=1 && d<=31)) return null;
+    const ms=Date.UTC(y, m-1, d);
+    return isNaN(ms)?null:ms;
+  };
+  // Days until the deadline, counted in IST (computed here, never stored)
+  const daysLeft=(j)=>{
+    const ms=parseDeadline(j.deadline);
+    if(ms===null) return null;
+    const todayIST=Math.floor((Date.now()+5.5*3600000)/DAY_MS)*DAY_MS;
+    return Math.round((ms-todayIST)/DAY_MS);
+  };
+
   // FIX P3-W-C-009: Handle both slash and dash date formats
   const fmtDate=(s)=>{
     if(!s || s.toUpperCase()==="N/A") return "N/A";
-    // Convert dash to slash for consistency
-    return s.replace(/-/g, "/").toUpperCase() !== "N/A" ? s.replace(/-/g, "/") : "N/A";
+    const ms=parseDeadline(s);
+    if(ms===null) return s.replace(/-/g, "/");
+    const d=new Date(ms);
+    return String(d.getUTCDate()).padStart(2,"0")+"/"+String(d.getUTCMonth()+1).padStart(2,"0")+"/"+d.getUTCFullYear();
   };
   
   const bust=(p)=>p+(p.includes("?")?"&":"?")+"t="+Date.now();
@@ -45,6 +90,98 @@
     }
   }
 
+  async function fetchShard(path){
+    if(SHARD_CACHE.has(path)) return SHARD_CACHE.get(path);
+    // A shard's content never changes under its path, so the HTTP cache may answer
+    const r=await fetch(DATA_BASE+path);
+    if(!r.ok) throw new Error("shard "+path+": "+r.status);
+    const recs=await r.json();
+    SHARD_CACHE.set(path, recs);
+    return recs;
+  }
+
+  function readDataCache(){
+    try{ return JSON.parse(localStorage.getItem(DATA_CACHE_KEY)||"null"); }catch{ return null; }
+  }
+  function writeDataCache(version, jobListings){
+    try{ localStorage.setItem(DATA_CACHE_KEY, JSON.stringify({version, jobListings})); }catch{}
+  }
+
+  // Change feeds leading from version `from` to m.dataVersion, or null if the chain is broken
+  function changeChain(m, from){
+    const byFrom=new Map((m.changes||[]).map(c=>[c.from,c]));
+    const chain=[];
+    let v=from;
+    while(v!==m.dataVersion){
+      const c=byFrom.get(v);
+      if(!c || chain.length>byFrom.size) return null;
+      chain.push(c);
+      v=c.to;
+    }
+    return chain;
+  }
+
+  // Apply one changes/<from>-<to>.json feed to a list of records
+  function applyChanges(list, feed){
+    const byId=new Map(list.map(j=>[j.id,j]));
+    for(const id of feed.removed||[]) byId.delete(id);
+    for(const [id,ch] of Object.entries(feed.changed||{})){
+      const j=byId.get(id);
+      if(!j) throw new Error("change for unknown job "+id);
+      const next={...j, ...(ch.set||{})};
+      for(const f of ch.unset||[]) delete next[f];
+      byId.set(id,next);
+    }
+    for(const j of feed.added||[]) byId.set(j.id,j);
+    return Array.from(byId.values());
+  }
+
+  // The cached view records brought up to m.dataVersion, or null
+  async function cachedView(m){
+    const cached=readDataCache();
+    if(!cached || !m.dataVersion || !Array.isArray(cached.jobListings)) return null;
+    if(cached.version===m.dataVersion) return cached.jobListings;
+    const chain=changeChain(m, cached.version);
+    if(!chain) return null;
+    let list=cached.jobListings;
+    for(const c of chain){
+      const r=await fetch(DATA_BASE+c.path);
+      if(!r.ok) throw new Error("feed "+c.path+": "+r.status);
+      list=applyChanges(list, await r.json());
+    }
+    const expected=Object.values(m.shards).reduce((n,s)=>n+s.count,0);
+    if(list.length!==expected) throw new Error("feed result has "+list.length+" jobs, manifest "+expected);
+    return list;
+  }
+
+  // data.json-shaped object for the main view: the cached copy (updated with
+  // the change feeds) or the shards the manifest lists; falls back to the
+  // full data.json without a manifest
+  async function loadData(){
+    try{
+      const r=await fetch(bust(MANIFEST_URL),{cache:"no-store"});
+      if(r.ok){
+        const m=await r.json();
+        let list=null;
+        try{ list=await cachedView(m); }catch(err){ console.warn("Change feed failed, loading shards:", err); }
+        if(!list){
+          const paths=Object.values(m.shards).map(s=>s.path);
+          const parts=await Promise.all(paths.map(fetchShard));
+          for(const p of SHARD_CACHE.keys()){ if(!paths.includes(p)) SHARD_CACHE.delete(p); }
+          list=[].concat(...parts);
+        }
+        if(m.dataVersion) writeDataCache(m.dataVersion, list);
+        MANIFEST=m;
+        return {jobListings:list, sections:m.sections||{}, view:m.view||null, transparencyInfo:m.transparencyInfo||{}};
+      }
+    }catch(err){
+      console.warn("Manifest load failed, using data.json:", err);
+    }
+    const r=await fetch(bust(DATA_URL),{cache:"no-store"});
+    if(!r.ok) throw new Error("data.json: "+r.status);
+    return await r.json();
+  }
+
   async function renderStatus(){
     try{
       // FIX: Also fetch health from correct location
@@ -74,13 +211,28 @@
   });
 
   let USER_STATE={}, USER_VOTES={};
+  // This user's materialised sections: {applied, other, examDoneArchived}
+  let USER_SECTIONS={};
   const ACTIVE_TIMERS = new Map();
 
-  // FIX P3-W-C-003: Merge Phase 1 applied_ids from data.json.sections
+  // This user's sections, materialised from their state next to the shared data
+  async function loadUserSections(){
+    try{
+      const r=await fetch(bust(USER_STATE_API+"?user="+encodeURIComponent(USER_ID)),{cache:"no-store",headers:USER_HEADERS});
+      if(r.ok){
+        const s=await r.json();
+        if(s && s.ok && s.sections && typeof s.sections==="object") USER_SECTIONS=s.sections;
+      }
+    }catch(err){
+      console.warn("User sections fetch failed:", err);
+    }
+  }
+
+  // FIX P3-W-C-003: applied jobs come from this user's sections (not data.json)
   async function loadUserStateServer(){
     try{
       // First: Load from Worker (KV)
-      const wr=await fetch(ENDPOINT+"?state=1",{mode:"cors"});
+      const wr=await fetch(ENDPOINT+"?state=1&user="+encodeURIComponent(USER_ID),{mode:"cors"});
       if(wr.ok){
         const wj=await wr.json();
         if(wj && wj.ok){
@@ -111,26 +263,8 @@
       console.error("KV state fetch failed:", err);
     }
     
-    // FIX P3-W-C-003: ALSO load Phase 1 applied_ids from data.json
-    try{
-      const dataResp=await fetch(bust(DATA_URL),{cache:"no-store"}); 
-      if(dataResp.ok){
-        const data=await dataResp.json();
-        const appliedFromPhase1 = data.sections?.applied || [];
-        const otherFromPhase1 = data.sections?.other || [];
-        
-        // Merge Phase 1 applied jobs into USER_STATE
-        appliedFromPhase1.forEach(jobId => {
-          if(!USER_STATE[jobId]){
-            USER_STATE[jobId] = {action: "applied", ts: new Date().toISOString(), source: "phase1"};
-          }
-        });
-        
-        console.log(`[Phase1] Loaded ${appliedFromPhase1.length} applied jobs from data.json`);
-      }
-    }catch(err){
-      console.error("Phase 1 data.json merge failed:", err);
-    }
+    // FIX P3-W-C-003: ALSO load this user's materialised sections
+    await loadUserSections();
     
     // Fallback: Load from localStorage
     try{ 
@@ -161,6 +295,25 @@
     try{ localStorage.setItem("vac_user_votes",JSON.stringify(USER_VOTES)); }catch{} 
   }
 
+  // POST this user's marks to api/user-state.py. Marks the API holds for this
+  // uid without an owner (imported from before per-user sync) answer 403
+  // claim_needs_secret: ask once for the migration code and retry with it.
+  let MIGRATION_ASKED=false;
+  async function saveUserSections(mine, migration){
+    const r=await fetch(USER_STATE_API,{
+      method:"POST",
+      headers:{...USER_HEADERS,"Content-Type":"application/json"},
+      body:JSON.stringify({user:USER_ID, state:mine, invite:window.USER_STATE_INVITE, migration}),
+      signal: AbortSignal.timeout(5000)
+    });
+    if(r.status!==403 || migration || MIGRATION_ASKED) return r;
+    const err=await r.clone().json().catch(()=>({}));
+    if(err.error!=="claim_needs_secret") return r;
+    MIGRATION_ASKED=true;
+    const code=prompt("Marks saved on this site before per-user sync belong to this browser's ID. Enter the migration code to take them over:");
+    return code ? saveUserSections(mine, code.trim()) : r;
+  }
+
   // FIX P3-W-C-007: Wait for response before proceeding
   async function persistUserStateServer(){
     try{
@@ -169,6 +322,7 @@
         headers:{"Content-Type":"application/json"},
         body:JSON.stringify({ 
           type:"user_state_sync", 
+          user:USER_ID,
           payload:USER_STATE, 
           votes:USER_VOTES, 
           ts:new Date().toISOString() 
@@ -179,7 +333,16 @@
       if(!resp.ok) {
         console.warn(`State sync returned ${resp.status}`);
       }
-      return resp.ok;
+      // Materialise this user's sections (job IDs only; the API caps the size)
+      const mine=Object.fromEntries(Object.entries(USER_STATE).filter(([id,s])=>JOB_ID.test(id) && s && s.action));
+      const ur=await saveUserSections(mine);
+      if(ur.ok){
+        const u=await ur.json();
+        if(u && u.sections) USER_SECTIONS=u.sections;
+      }else{
+        console.warn(`User state save returned ${ur.status}`);
+      }
+      return resp.ok && ur.ok;
     }catch(err){
       console.error("KV state sync failed:", err);
       return false;
@@ -276,7 +439,7 @@
 
   function cardHTML(j, applied=false){
     const src=(j.source||"").toLowerCase()==="official" ? '<span class="chip" title="Official source">Official</span>' : '<span class="chip" title="From aggregator">Agg</span>';
-    const d=(j.daysLeft!=null && j.daysLeft!=="")?j.daysLeft:"—";
+    const dl=daysLeft(j), d=dl!==null?dl:"—";
     const det=esc(j.detailLink||j.applyLink||"#");
     const lid=j.id||"";
     const vote=USER_VOTES[lid]?.vote||"";
@@ -322,32 +485,8 @@
 
   // FIX P3-W-C-009: Better deadline parsing with dash support
   function sortByDeadline(list){
-    const parse=(s)=>{ 
-      if(!s||s.toUpperCase()==="N/A") return null;
-      
-      // FIX: Convert dash to slash for parsing
-      const normalized = s.replace(/-/g, "/");
-      const a=normalized.split("/"); 
-      
-      if(a.length!==3) return null;
-      
-      try {
-        const d = parseInt(a[0], 10);
-        const m = parseInt(a[1], 10);
-        const y = parseInt(a[2], 10);
-        
-        // FIX P3-W-C-008: Validate day/month ranges
-        if(m < 1 || m > 12 || d < 1 || d > 31) return null;
-        
-        const ms=Date.UTC(y, m-1, d); 
-        return isNaN(ms)?null:ms;
-      } catch {
-        return null;
-      }
-    };
-    
     return list.slice().sort((a,b)=>{ 
-      const da=parse(a.deadline),db=parse(b.deadline);
+      const da=parseDeadline(a.deadline),db=parseDeadline(b.deadline);
       
       // FIX P3-W-C-009: Handle both null cases properly
       if(da===null&&db===null) return (a.title||"").localeCompare(b.title||"");
@@ -357,6 +496,117 @@
     });
   }
 
+  // QC's precomputed render order (data.view.order); sorting here only for data without it
+  function inViewOrder(data){
+    const jobs=data.jobListings||[];
+    const order=data.view?.order;
+    if(!Array.isArray(order)) return sortByDeadline(jobs);
+    const byId=new Map(), rest=[];
+    for(const j of jobs){ if(j.id && !byId.has(j.id)) byId.set(j.id,j); else rest.push(j); }
+    const list=[];
+    for(const id of order){ const j=byId.get(id); if(j){ list.push(j); byId.delete(id); } }
+    // Records the view does not list (no id, or added after the run) go last, sorted
+    rest.push(...byId.values());
+    return rest.length ? list.concat(sortByDeadline(rest)) : list;
+  }
+
+  // ===== Search: shards/search.<hash>.json (tools/search_index.py), fetched on first use =====
+  let SEARCH_INDEX=null, SEARCH_LOADING=null, SEARCH_IDS=null;  // SEARCH_IDS: Set of matching ids, null = no filter
+  const SEARCH_SPLIT=/[^\p{L}\p{N}]+/u;
+
+  function loadSearchIndex(){
+    const path=MANIFEST?.search?.path;
+    if(SEARCH_INDEX && SEARCH_INDEX.path===path) return Promise.resolve(SEARCH_INDEX);
+    if(!path) return Promise.resolve(null);
+    if(!SEARCH_LOADING){
+      SEARCH_LOADING=fetchShard(path).then(idx=>{
+        SHARD_CACHE.delete(path);
+        idx.path=path;
+        // [[token, ordinals]] sorted by the build; sorted again here so the order is
+        // exactly what "<" compares (UTF-16 code units) in prefixOrdinals
+        idx.tokens.sort((a,b)=>a[0]<b[0]?-1:(a[0]>b[0]?1:0));
+        idx.tokenKeys=idx.tokens.map(t=>t[0]);
+        SEARCH_INDEX=idx;
+        fillFacets(idx);
+        return idx;
+      }).finally(()=>{ SEARCH_LOADING=null; });
+    }
+    return SEARCH_LOADING;
+  }
+
+  function fillFacets(idx){
+    const sel=qs("#search-facet");
+    if(!sel) return;
+    const cur=sel.value;
+    const opts=['<option value="">All listings</option>'];
+    for(const [facet,vals] of Object.entries(idx.facets||{})){
+      const names=Object.keys(vals);
+      if(!names.length) continue;
+      opts.push('<optgroup label="'+esc(facet)+'">');
+      for(const v of names) opts.push('<option value="'+esc(facet+"\u0000"+v)+'">'+esc(v)+' ('+vals[v].length+')</option>');
+      opts.push('</optgroup>');
+    }
+    sel.innerHTML=opts.join("");
+    sel.value=cur;
+  }
+
+  // Ordinals of every token starting with prefix (binary search over the sorted keys)
+  function prefixOrdinals(idx, prefix){
+    const keys=idx.tokenKeys;
+    let lo=0, hi=keys.length;
+    while(lo<hi){ const mid=(lo+hi)>>1; if(keys[mid]<prefix) lo=mid+1; else hi=mid; }
+    const out=new Set();
+    for(let i=lo; i<keys.length && keys[i].startsWith(prefix); i++){
+      for(const n of idx.tokens[i][1]) out.add(n);
+    }
+    return out;
+  }
+
+  function intersect(a, b){
+    if(a===null) return b;
+    const out=new Set();
+    for(const n of a) if(b.has(n)) out.add(n);
+    return out;
+  }
+
+  // Set of matching job ids for the query and facet ("facet\0value"), null when neither is set
+  function searchIds(idx, query, facet){
+    const words=(query||"").toLowerCase().split(SEARCH_SPLIT).filter(Boolean);
+    if(!words.length && !facet) return null;
+    let hits=null;
+    for(const w of words){
+      hits=intersect(hits, prefixOrdinals(idx, w));
+      if(!hits.size) break;
+    }
+    if(facet){
+      const [name,val]=facet.split("\u0000");
+      hits=intersect(hits, new Set(idx.facets?.[name]?.[val]||[]));
+    }
+    return new Set([...hits].map(n=>idx.ids[n]));
+  }
+
+  // Without an index (data.json fallback) titles are scanned instead
+  function scanIds(query){
+    const words=(query||"").toLowerCase().split(SEARCH_SPLIT).filter(Boolean);
+    if(!words.length) return null;
+    return new Set(qsa(".card[data-id]").filter(c=>{
+      const toks=(c.querySelector(".title")?.textContent||"").toLowerCase().split(SEARCH_SPLIT);
+      return words.every(w=>toks.some(t=>t.startsWith(w)));
+    }).map(c=>c.getAttribute("data-id")));
+  }
+
+  function applySearch(){
+    for(const c of qsa(".card[data-id]")) c.hidden=!!SEARCH_IDS && !SEARCH_IDS.has(c.getAttribute("data-id"));
+  }
+
+  async function runSearch(){
+    const q=qs("#search-q")?.value||"", facet=qs("#search-facet")?.value||"";
+    let idx=null;
+    try{ idx=await loadSearchIndex(); }catch(err){ console.warn("Search index failed, scanning titles:", err); }
+    SEARCH_IDS=idx ? searchIds(idx, q, facet) : scanIds(q);
+    applySearch();
+  }
+
   let TOKEN=0;
 
   async function render(){
@@ -367,10 +617,8 @@
 
     let data=null;
     try{ 
-      // FIX P3-W-C-010: Use correct DATA_URL (from Cloudflare Worker KV)
-      const r=await fetch(bust(DATA_URL),{cache:"no-store"});
-      if(!r.ok) throw 0; 
-      data=await r.json(); 
+      // Manifest + shards from the Worker KV (data.json as fallback)
+      data=await loadData();
     }catch(err){ 
       console.error("Failed to fetch data.json:", err);
       data=null; 
@@ -386,13 +634,15 @@
       return;
     }
 
-    const list=sortByDeadline(data.jobListings||[]);
-    const sections=data.sections||{};
+    const list=inViewOrder(data);
+    // Per-user sections (data.sections only has them in data.json from before the split)
+    const sections=USER_SECTIONS.applied ? USER_SECTIONS : (data.sections||{});
     qs("#total-listings").textContent="Listings: "+list.length;
 
-    // FIX P3-W-C-003: Merge Phase 1 applied_ids with USER_STATE
+    // FIX P3-W-C-003: Merge this user's applied_ids with USER_STATE
     const idsAppliedFromData=new Set(sections.applied||[]);
     const idsOtherFromData=new Set(sections.other||[]);
+    const idsDone=new Set((sections.examDoneArchived||[]).filter(id=>USER_STATE[id]));  // unless undone since
 
     const idsApplied=new Set(idsAppliedFromData), idsOther=new Set(idsOtherFromData);
 
@@ -419,6 +669,7 @@
         }else{
           idsApplied.delete(jid);
           idsOther.delete(jid);
+          idsDone.add(jid);
         }
       }
     });
@@ -427,6 +678,7 @@
 
     for(const job of list){
       const id = job.id || "";
+      if(idsDone.has(id) && !idsApplied.has(id)) continue;  // exam_done over 7 days: archived for this user
       const applied = idsApplied.has(id);
       const refused = idsOther.has(id);
 
@@ -583,6 +835,7 @@
     rootOpen.replaceChildren(fOpen);
     rootApp.replaceChildren(fApp);
     rootOther.replaceChildren(fOther);
+    if(SEARCH_IDS) runSearch();  // the data (and index) may have moved on since the last query
   }
 
   function openModal(sel){
@@ -711,6 +964,12 @@
     await loadUserStateServer();
     await renderStatus();
     await render();
+    const sq=qs("#search-q"), sf=qs("#search-facet");
+    let searchTimer=null;
+    sq?.addEventListener("input", ()=>{ clearTimeout(searchTimer); searchTimer=setTimeout(runSearch, 120); });
+    sq?.addEventListener("focus", ()=>{ loadSearchIndex().catch(()=>{}); }, {once:true});
+    sf?.addEventListener("focus", ()=>{ loadSearchIndex().catch(()=>{}); }, {once:true});
+    sf?.addEventListener("change", runSearch);
     // Re-render every 5 minutes to catch backend updates
     setInterval(render, 5*60*1000);
   });
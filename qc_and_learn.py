@@ -1,10 +1,27 @@
 #!/usr/bin/env python3
 # qc_and_learn.py v2025-11-03-FIXED (Applied Jobs Inclusion)
 # FIXES: C-003, H-001, H-002 + applied job preservation
-
-import json, pathlib, re, argparse, urllib.parse, os, sys
-from datetime import datetime, timedelta, date, timezone
+#
+# Importing this module has no side effects. Phases:
+#   load -> dedupe -> link_updates -> add_missing -> screen
+#   -> apply_reports -> classify -> emit
+# run(data, logs, rules, learn, pinned) runs everything in memory and
+# returns the outputs plus per-phase timings; main() is load + run + emit.
+# QC is user-agnostic: it never reads anyone's marks, only the pinned job IDs
+# (applied by some user, never filtered). Per-user applied / other lists are
+# materialised from the shared IDs by tools/user_sections.py.
+
+import json, pathlib, re, argparse, urllib.parse, os, sys, time, hashlib
+from datetime import datetime, date
 from tools.eligibility import is_eligible  # FIX: Import comprehensive eligibility
+from tools.core import parse_date_any, iso_date, posts_from_text as parse_posts_from_text
+from tools.canonical import canonical_url, canonical_url_many, canonical_id, legacy_id
+from tools.update_linker import ParentIndex, LINK_THRESHOLD
+from tools.reports import find_report as lookup_report
+from tools.patterns import PatternMatcher, MAX_PER_HOST, title_tokens, path_tokens
+from tools.event_log import load_state as load_log_state, save_state as save_log_state, consume as consume_logs
+from tools import verdict_cache, job_store, archive, view_model, user_sections
+from tools.shards import write_shards
 
 P = pathlib.Path
 
@@ -18,22 +35,6 @@ def JLOAD(p, d):
         print(f"[WARN] {p} error: {e}, using default", file=sys.stderr)
     return d
 
-def JLOADL(p):
-    out=[]
-    if P(p).exists():
-        try:
-            for line in P(p).read_text(encoding="utf-8").splitlines():
-                line=line.strip()
-                if not line: 
-                    continue
-                try: 
-                    out.append(json.loads(line))
-                except json.JSONDecodeError:
-                    pass
-        except Exception:
-            pass
-    return out
-
 def JWRITE(p, obj):
     """Atomic write with temp file"""
     try:
@@ -43,100 +44,39 @@ def JWRITE(p, obj):
     except Exception as e:
         print(f"[ERROR] Writing {p}: {e}", file=sys.stderr)
 
-ap = argparse.ArgumentParser()
-ap.add_argument("--mode", default="nightly")
-RUN_MODE = (ap.parse_args().mode or "nightly").lower()
-
-raw = JLOAD("data.json", {"jobListings":[], "archivedListings":[], "transparencyInfo":{}})
-jobs = list(raw.get("jobListings") or [])
-archived = list(raw.get("archivedListings") or [])
-votes = JLOADL("votes.jsonl")
-reports = JLOADL("reports.jsonl")
-subs = JLOADL("submissions.jsonl")
-rules = JLOAD("rules.json", {"captureHints":[], "aggregatorScores":{}})
-
-# FIX A-004: Better user_state loading with fallback
-user_state = JLOAD("user_state.json", {})
-if not isinstance(user_state, dict):
-    user_state = {}
-
-learn = JLOAD("learn_registry.json", {})
-if not isinstance(learn, dict): 
-    learn={}
-learn.setdefault("byHost", {})
-learn.setdefault("bySlug", {})
-learn.setdefault("patterns", {})
-learn.setdefault("notes", [])
-
-def note(ev):
-    try:
-        learn["notes"] = ([{**ev, "at": datetime.utcnow().isoformat()+"Z"}] + (learn.get("notes") or []))[:50]
-    except:
-        pass
+# transparencyInfo fields that change on every run; they alone do not make data.json new
+VOLATILE_TRANSPARENCY = ("lastUpdated", "eligibilityCache")
+
+def content_sha1(data):
+    """Hash of a data.json dict without its per-run transparencyInfo fields"""
+    transp = {k: v for k, v in (data.get("transparencyInfo") or {}).items() if k not in VOLATILE_TRANSPARENCY}
+    blob = json.dumps({**data, "transparencyInfo": transp}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(blob.encode("utf-8", "replace")).hexdigest()
 
 def host(u):
-    try: 
+    try:
         return urllib.parse.urlparse(u or "").netloc.lower()
-    except: 
+    except:
         return ""
 
-def path_tokens(u):
-    try:
-        p=urllib.parse.urlparse(u or "")
-        return [s for s in (p.path or "").lower().split("/") if s]
-    except: 
-        return []
-
-def title_tokens(t):
-    return [x for x in re.split(r"[^a-z0-9]+",(t or "").lower()) if x]
-
-def norm_url(u):
-    try:
-        p=urllib.parse.urlparse(u or "")
-        base=p._replace(query="", fragment="")
-        s=urllib.parse.urlunparse(base)
-        return s.rstrip("/").lower()
-    except: 
-        return (u or "").rstrip("/").lower()
-
 def slugify(text):
     t=(text or "").lower()
     t=re.sub(r"[^a-z0-9]+","-",t).strip("-")
     return t[:80] if t else ""
 
-def parse_date_any(s):
-    if not s or s.strip().upper()=="N/A": 
-        return None
-    s=s.strip()
-    for f in ("%d/%m/%Y","%Y-%m-%d","%d-%m-%Y","%d %B %Y","%d %b %Y"):
-        try: 
-            return datetime.strptime(s,f).date()
-        except: 
-            pass
-    return None
-
-def stable_id(applyLink):
-    """Generate DETERMINISTIC stable ID using SHA1"""
-    import hashlib
-    try:
-        norm = norm_url(applyLink)
-        return f"job_{hashlib.sha1(norm.encode()).hexdigest()[:12]}"
-    except:
-        return f"job_{hashlib.md5((applyLink or '').lower().encode()).hexdigest()[:12]}"
-
 def check_eligibility(job):
     """
     FIX C-003: Use comprehensive eligibility module
     Delegates to tools/eligibility.py for sophisticated filtering
     """
     title = job.get('title', '')
-    
-    # Use the merged eligibility function
-    is_eligible_result, reason = is_eligible(title)
-    
+
+    # Use the merged eligibility function (verdicts persist across runs)
+    is_eligible_result, reason = verdict_cache.lookup("qc", title, lambda: is_eligible(title))
+
     if not is_eligible_result:
         return False, reason
-    
+
     return True, "Eligible"
 
 UPD_TOK = [
@@ -145,461 +85,519 @@ UPD_TOK = [
 ]
 DATE_PAT = re.compile(r"(\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{1,2}\s+[A-Za-z]{3,9}\s+\d{2,4})")
 
-def is_update_title(t): 
+def is_update_title(t):
     return any(k in (t or "").lower() for k in UPD_TOK)
 
-def normalize_pdf_stem(u):
-    try:
-        p=urllib.parse.urlparse(u or "")
-        fn=(p.path or "").rsplit("/",1)[-1].lower()
-        fn=re.sub(r"(?i)(corrigendum|extension|extended|addendum|amendment|notice|revised|rectified|reopen|re-open|reopened)","",fn)
-        return re.sub(r"[\W_]+","", fn)
-    except: 
-        return ""
-
-def url_root(u):
-    try:
-        p=urllib.parse.urlparse(u or "")
-        root=p._replace(query="", fragment="")
-        path=(root.path or "/").rsplit("/",1)[0]
-        return f"{root.scheme}://{root.netloc}{path}"
-    except: 
-        return u or ""
-
-def adv_no(t):
-    m=re.search(r"(advt|advertisement|notice)\s*(no\.?|number)?\s*[:\-]?\s*([A-Za-z0-9\/\-\._]+)", t or "", re.I)
-    if m: 
-        return m.group(3).lower()
-    return ""
-
-POSTS_PAT = re.compile(r"(\d{1,6})\s*(posts?|vacanc(?:y|ies)|seats?)", re.I)
-
-def parse_posts_from_text(txt):
-    if not txt: 
-        return None
-    m = POSTS_PAT.search(txt)
-    if m:
-        try: 
-            return int(m.group(1))
-        except: 
-            return None
-    return None
-
-def learn_set_slug(slug, **kw):
-    if not slug: 
-        return
-    if not isinstance(learn.get("bySlug"), dict): 
-        learn["bySlug"]={}
-    rec = learn["bySlug"].setdefault(slug, {})
-    changed=False
-    for k,v in kw.items():
-        if v in (None,""): 
-            continue
-        if rec.get(k)!=v:
-            rec[k]=v; 
-            changed=True
-    if changed:
-        rec["updatedAt"]=datetime.utcnow().isoformat()+"Z"
-        note({"slug_hint":slug, **kw})
-
-def patterns_for_host(h):
-    return (learn.get("patterns") or {}).get(h, [])
-
-def mark_non_vacancy_pattern(h, title, url):
-    if not h: 
-        return
-    tt = list(dict.fromkeys(title_tokens(title)))[:8]
-    pt = [x for x in path_tokens(url) if len(x)<=40][:6]
-    pat = {"kind":"non_vacancy","titleTokens":tt,"pathTokens":pt,"addedAt":datetime.utcnow().isoformat()+"Z"}
-    learn["patterns"]=learn.get("patterns") or {}
-    arr = learn["patterns"].setdefault(h, [])
-    def same(a,b): 
-        return a.get("kind")==b.get("kind") and a.get("titleTokens")==b.get("titleTokens") and a.get("pathTokens")==b.get("pathTokens")
-    if not any(same(pat,p) for p in arr):
-        arr.append(pat); 
-        note({"learned":"non_vacancy_pattern","host":h,"titleTokens":tt,"pathTokens":pt})
-
-def matches_non_vacancy_pattern(h, title, url):
-    arr = patterns_for_host(h)
-    if not arr: 
-        return False
-    tt = set(title_tokens(title)); 
-    pt = set(path_tokens(url))
-    for p in arr:
-        if p.get("kind")!="non_vacancy": 
-            continue
-        need_tt = set(p.get("titleTokens",[])); 
-        need_pt = set(p.get("pathTokens",[]))
-        if need_pt and not need_pt.issubset(pt): 
-            continue
-        if not need_tt or len(tt.intersection(need_tt))>=max(1,len(need_tt)//2 or 1):
-            return True
-    return False
-
-# FIX H-001: Extract applied_ids BEFORE processing jobs
-applied_ids = []
-other_marked_ids = []
-today = date.today()
-
-for jid, state_rec in user_state.items():
-    if not state_rec or not isinstance(state_rec, dict): 
-        continue
-    action = state_rec.get("action")
-    
-    if action == "applied":
-        applied_ids.append(jid)
-    elif action == "other" or action == "not_interested":
-        other_marked_ids.append(jid)
-    elif action == "exam_done":
-        ts = state_rec.get("ts")
-        if ts:
-            try:
-                # FIX H-004: Better timestamp parsing with error handling
-                done_date = datetime.fromisoformat(ts.replace("Z","")).date()
-                days_since_done = (today - done_date).days
-                
-                # Keep in applied if <=7 days from exam_done
-                if days_since_done <= 7:
-                    applied_ids.append(jid)
-                # Mark for removal if >7 days
-                else:
-                    user_state[jid]["should_archive"] = True
-            except ValueError as e:
-                print(f"[WARN] Bad timestamp for {jid}: {ts}", file=sys.stderr)
-                # If timestamp parsing fails, keep job (don't lose it)
-                applied_ids.append(jid)
-        else:
-            applied_ids.append(jid)
-
-applied_ids = list(set(applied_ids))  # Deduplicate
-other_marked_ids = list(set(other_marked_ids))
-
-print(f"[QC] Loaded {len(applied_ids)} applied IDs, {len(other_marked_ids)} other marked", file=sys.stderr)
-
-# FIX A-003: Dedup jobs by URL first, assign stable IDs
-url_to_job = {}
-
-for j in jobs:
-    url_key = norm_url(j.get("applyLink"))
-    
-    if not url_key:
-        continue
-    
-    # Always use stable ID based on URL (deterministic)
-    j["id"] = stable_id(j.get("applyLink"))
-    
-    if url_key not in url_to_job:
-        url_to_job[url_key] = j
-    else:
-        existing = url_to_job[url_key]
-        
-        # Prefer official sources over aggregators
-        if j.get("source") == "official" and existing.get("source") != "official":
-            url_to_job[url_key] = j
-        # Keep the one with more complete data
-        elif len((j.get("title") or "")) > len((existing.get("title") or "")):
-            url_to_job[url_key] = j
-        
-        # Merge flags from both
-        existing_flags = existing.get("flags", {})
-        new_flags = j.get("flags", {})
-        url_to_job[url_key].setdefault("flags", {})
-        url_to_job[url_key]["flags"].update(existing_flags)
-        url_to_job[url_key]["flags"].update(new_flags)
-
-jobs = list(url_to_job.values())
-
-parents = []
-updates = []
-for j in jobs:
-    if is_update_title(j.get("title")):
-        updates.append(j)
-    else:
-        parents.append(j)
-
-kept = []
-merged_count = 0
-for j in updates:
-    best=None; 
-    score=0.0
-    for p in parents:
-        s=0.0
-        if url_root(j.get("applyLink"))==url_root(p.get("applyLink")): 
-            s+=0.45
-        if normalize_pdf_stem(j.get("applyLink")) and normalize_pdf_stem(j.get("applyLink"))==normalize_pdf_stem(p.get("applyLink")): 
-            s+=0.35
-        if adv_no(j.get("title")) and adv_no(j.get("title"))==adv_no(p.get("title")): 
-            s+=0.25
-        if s>score: 
-            score, best = s, p
-    if best and score>=0.6:
-        best.setdefault("updates", []).append({"title": j.get("title"), "link": j.get("applyLink"), "capturedAt": datetime.utcnow().isoformat()+"Z"})
-        dates = [m.group(1) for m in DATE_PAT.finditer(j.get("title") or "")]
-        parsed = [parse_date_any(x.replace("-","/")) for x in dates if x]; 
-        parsed = [d for d in parsed if d]
-        if parsed:
-            new_deadline = max(parsed)
-            cur = parse_date_any(best.get("deadline"))
-            if not cur or new_deadline > cur:
-                best["deadline"] = new_deadline.strftime("%d/%m/%Y")
-                learn_set_slug(slugify(best.get("title")), lastDate=best["deadline"])
-        pcount = parse_posts_from_text(j.get("title"))
-        if pcount and not best.get("numberOfPosts"):
-            best["numberOfPosts"] = pcount
-            learn_set_slug(slugify(best.get("title")), posts=pcount)
-        merged_count+=1
-    j["type"]="UPDATE"; 
-    j.setdefault("flags",{})["no_parent_found"]=True
-
-jobs = parents
-
-seen_keys={norm_url(j.get("applyLink")) for j in jobs}
-for s in subs:
-    if s.get("type")!="missing": 
-        continue
-    title=(s.get("title") or "").strip()
-    url=norm_url((s.get("url") or "").strip())
-    site=(s.get("officialSite") or "").strip()
-    last=(s.get("lastDate") or s.get("deadline") or "").strip() or "N/A"
-    posts=s.get("posts")
-    if site and site not in rules["captureHints"]: 
-        rules["captureHints"].append(site)
-    if not title or not url: 
-        continue
-    if url in seen_keys: 
-        continue
-    card={
-        "id": stable_id(url),
-        "title": title, 
-        "qualificationLevel": "Any graduate", 
-        "domicile": "All India",
-        "deadline": last, 
-        "applyLink": url, 
-        "detailLink": url,
-        "source": "official", 
-        "type": "VACANCY",
-        "flags": {"added_from_missing": True, "trusted": True}
-    }
-    try:
-        if isinstance(posts,str) and posts.strip().isdigit(): 
-            posts=int(posts.strip())
-        if isinstance(posts,int) and posts>0: 
-            card["numberOfPosts"]=posts
-    except: 
-        pass
-    jobs.append(card)
-
-def find_report(j):
-    jid = j.get("id")
-    rid_report = report_map.get(jid)
-    if not rid_report:
-        for rid, rep in report_map.items():
-            if rep.get("url") and norm_url(j.get("applyLink")) == norm_url(rep.get("url")):
-                return rep
-    return rid_report
-
-report_map = {}
-for r in reports:
-    if r.get("type")!="report": 
-        continue
-    jid=r.get("jobId") or ""
-    report_map[jid]=r
-    for k in ("lastDate","eligibility","evidenceUrl","posts"):
-        v=r.get(k)
-        if v: 
-            report_map[jid][k]=v
-    if r.get("reasonCode"):
-        report_map[jid]["reasonCode"]=r["reasonCode"]
-    else:
-        print(f"[WARN] report_missing_reasonCode for {jid}", file=sys.stderr)
-
 def keep_date(j):
     d=parse_date_any(j.get("deadline"))
-    if d: 
+    if d:
         return d
     ku=j.get("flags",{}).get("keep_until")
     if ku:
-        try: 
+        try:
             return datetime.fromisoformat(ku).date()
-        except: 
+        except:
             return None
     return None
 
-primary=[]
-other=[]
-rejected_hindi=0
-rejected_teacher=0
-rejected_tech=0
-rejected_pg=0
-rejected_skills=0
-rejected_domicile=0
-archived_exam_done=0
-
-# FIX H-001 + H-002: Process jobs with applied_ids ALREADY extracted
-for j in jobs:
-    jid = j.get("id")
-    h = host(j.get("applyLink"))
-
-    # FIX H-001 + H-002: Check applied status FIRST (protection before filtering)
-    if jid in applied_ids:
-        # NEVER filter applied jobs (even if expired!)
-        # But check if should be archived (exam_done >7 days)
-        if jid in user_state:
-            state_rec = user_state.get(jid)
-            if state_rec and state_rec.get("action") == "exam_done":
-                # Check if marked for archival
-                if state_rec.get("should_archive"):
-                    j.setdefault("flags",{})["removed_reason"]="auto_archived_exam_done_7d"
-                    j.setdefault("flags",{})["archived_reason"]="exam_done_7d_expired"
-                    archived.append(j)
-                    archived_exam_done += 1
-                    print(f"[QC] Archiving applied job (exam_done >7d): {jid[:16]}", file=sys.stderr)
-                    continue
-        
-        # Keep applied job in primary (NEVER filter!)
-        primary.append(j)
-        print(f"[QC] Keeping applied job: {jid[:16]} - {j.get('title', '')[:50]}", file=sys.stderr)
-        continue
-
-    # ===== For non-applied jobs: apply eligibility checks =====
-    
-    # FIX C-003: Check eligibility using comprehensive module
-    is_eligible_result, reason = check_eligibility(j)
-    if not is_eligible_result:
-        # Track rejection reasons
-        if "Hindi" in reason:
-            rejected_hindi += 1
-        elif "Teacher" in reason:
-            rejected_teacher += 1
-        elif "Tech" in reason:
-            rejected_tech += 1
-        elif "Postgraduate" in reason:
-            rejected_pg += 1
-        elif "Specialty" in reason:
-            rejected_skills += 1
-        elif "Domicile" in reason:
-            rejected_domicile += 1
+# ===== Learning registry =====
+
+class Learner:
+    """learn_registry.json plus the compiled non-vacancy patterns for one run"""
+
+    def __init__(self, learn, rules):
+        if not isinstance(learn, dict):
+            learn={}
+        learn.setdefault("byHost", {})
+        learn.setdefault("bySlug", {})
+        learn.setdefault("patterns", {})
+        learn.setdefault("notes", [])
+        self.learn = learn
+        # Learned non-vacancy patterns, compacted and compiled once per run
+        self.patterns = PatternMatcher(
+            learn["patterns"], int((rules.get("learnPatterns") or {}).get("maxPerHost") or MAX_PER_HOST)
+        )
+
+    def note(self, ev):
+        learn = self.learn
+        try:
+            learn["notes"] = ([{**ev, "at": datetime.utcnow().isoformat()+"Z"}] + (learn.get("notes") or []))[:50]
+        except:
+            pass
+
+    def set_slug(self, slug, **kw):
+        learn = self.learn
+        if not slug:
+            return
+        if not isinstance(learn.get("bySlug"), dict):
+            learn["bySlug"]={}
+        rec = learn["bySlug"].setdefault(slug, {})
+        changed=False
+        for k,v in kw.items():
+            if v in (None,""):
+                continue
+            if rec.get(k)!=v:
+                rec[k]=v;
+                changed=True
+        if changed:
+            rec["updatedAt"]=datetime.utcnow().isoformat()+"Z"
+            self.note({"slug_hint":slug, **kw})
+
+    def mark_non_vacancy_pattern(self, h, title, url):
+        if not h:
+            return False
+        tt = list(dict.fromkeys(title_tokens(title)))[:8]
+        pt = [x for x in path_tokens(url) if len(x)<=40][:6]
+        pat = {"kind":"non_vacancy","titleTokens":tt,"pathTokens":pt,"addedAt":datetime.utcnow().isoformat()+"Z"}
+        if self.patterns.add(h, pat):
+            self.note({"learned":"non_vacancy_pattern","host":h,"titleTokens":tt,"pathTokens":pt})
+            return True
+        return False
+
+    def matches_non_vacancy_pattern(self, h, title, url):
+        return self.patterns.matches(h, title, url)
+
+# ===== Phases =====
+
+def load(base_dir=".", pinned=None):
+    """
+    Read every QC input from base_dir; returns the keyword arguments for run().
+    pinned (job IDs some user applied to, e.g. from the KV user/<uid>/meta.json keys) is used
+    instead of the ones under users/.
+    """
+    b = P(base_dir)
+    # data.json via the SQLite job store (re-imported if data.json changed outside the pipeline)
+    raw = job_store.load_data(str(b / "data.json"),
+                              default={"jobListings":[], "transparencyInfo":{}})
+    # votes/reports/submissions: only lines appended since the last run are read,
+    # folded into logs_state.json (see tools/event_log.py)
+    logs = load_log_state(str(b / "logs_state.json"))
+    consume_logs(logs, str(b))
+    rules = JLOAD(b / "rules.json", {"captureHints":[], "aggregatorScores":{}})
+    if pinned is None:
+        pinned = user_sections.local_pins(str(b))
+    learn = JLOAD(b / "learn_registry.json", {})
+    # Counts, reasons and recent IDs of the cold archive (records stay on disk)
+    rollup = archive.load_rollup(str(b))
+    return {"data": raw, "logs": logs, "rules": rules, "learn": learn, "pinned": sorted(pinned or []), "rollup": rollup}
+
+def dedupe(jobs, pinned):
+    """
+    FIX A-003: Dedup jobs by canonical URL first, assign canonical IDs.
+    Returns (jobs, pinned on canonical IDs, {previous ID: canonical ID}).
+    """
+    url_to_job = {}
+    id_aliases = {}  # previous / legacy IDs -> canonical ID (users' marks follow these)
+
+    for j, url_key in zip(jobs, canonical_url_many([j.get("applyLink") for j in jobs])):
+
+        if not url_key:
+            continue
+
+        # Always use canonical ID based on URL (deterministic, alias-proof)
+        new_id = canonical_id(j.get("applyLink"))
+        for old_id in (j.get("id"), legacy_id(j.get("applyLink"))):
+            if old_id and old_id != new_id:
+                id_aliases[old_id] = new_id
+        j["id"] = new_id
+
+        if url_key not in url_to_job:
+            url_to_job[url_key] = j
         else:
-            pass  # Other reasons
-        
-        j.setdefault("flags",{})["removed_reason"] = f"auto_filtered_{reason}"
-        j.setdefault("flags",{})["auto_filtered"] = reason
-        archived.append(j)
-        print(f"[QC] Filtering: {j.get('title', '')[:50]} ({reason})", file=sys.stderr)
-        continue
-
-    if matches_non_vacancy_pattern(h, j.get("title",""), j.get("applyLink","")):
-        if not (j.get("numberOfPosts") and parse_date_any(j.get("deadline"))):
-            j.setdefault("flags",{})["removed_reason"]="auto_filtered_learn_non_vacancy"
-            j.setdefault("flags",{})["auto_filtered"]="learn_non_vacancy"
-            archived.append(j)
+            existing = url_to_job[url_key]
+
+            # Prefer official sources over aggregators
+            if j.get("source") == "official" and existing.get("source") != "official":
+                url_to_job[url_key] = j
+            # Keep the one with more complete data
+            elif len((j.get("title") or "")) > len((existing.get("title") or "")):
+                url_to_job[url_key] = j
+
+            # Merge flags from both
+            existing_flags = existing.get("flags", {})
+            new_flags = j.get("flags", {})
+            url_to_job[url_key].setdefault("flags", {})
+            url_to_job[url_key]["flags"].update(existing_flags)
+            url_to_job[url_key]["flags"].update(new_flags)
+
+    # Carry pins over to the canonical IDs
+    pinned = sorted({id_aliases.get(x, x) for x in pinned})
+
+    return list(url_to_job.values()), pinned, id_aliases
+
+def link_updates(jobs, learner):
+    """Fold corrigendum/extension titles into their parent; returns (parents, merged count)"""
+    parents = []
+    updates = []
+    for j in jobs:
+        if is_update_title(j.get("title")):
+            updates.append(j)
+        else:
+            parents.append(j)
+
+    merged_count = 0
+    parent_index = ParentIndex(parents) if updates else None
+    for j in updates:
+        # Only parents sharing url root / PDF stem / advt no. are scored
+        best, score = parent_index.best(j)
+        if best and score>=LINK_THRESHOLD:
+            best.setdefault("updates", []).append({"title": j.get("title"), "link": j.get("applyLink"), "capturedAt": datetime.utcnow().isoformat()+"Z"})
+            dates = [m.group(1) for m in DATE_PAT.finditer(j.get("title") or "")]
+            parsed = [parse_date_any(x.replace("-","/")) for x in dates if x];
+            parsed = [d for d in parsed if d]
+            if parsed:
+                new_deadline = max(parsed)
+                cur = parse_date_any(best.get("deadline"))
+                if not cur or new_deadline > cur:
+                    best["deadline"] = new_deadline.strftime("%d/%m/%Y")
+                    learner.set_slug(slugify(best.get("title")), lastDate=best["deadline"])
+            pcount = parse_posts_from_text(j.get("title"))
+            if pcount and not best.get("numberOfPosts"):
+                best["numberOfPosts"] = pcount
+                learner.set_slug(slugify(best.get("title")), posts=pcount)
+            merged_count+=1
+        j["type"]="UPDATE";
+        j.setdefault("flags",{})["no_parent_found"]=True
+
+    return parents, merged_count
+
+def add_missing(jobs, subs, rules):
+    """Cards for user-submitted missing vacancies that are not listed yet"""
+    seen_keys={canonical_url(j.get("applyLink")) for j in jobs}
+    for site in subs["sites"]:
+        if site not in rules["captureHints"]:
+            rules["captureHints"].append(site)
+    for s in subs["missing"].values():
+        title=(s.get("title") or "").strip()
+        url=(s.get("url") or "").strip()
+        last=(s.get("lastDate") or s.get("deadline") or "").strip() or "N/A"
+        posts=s.get("posts")
+        if not title or not url:
             continue
+        if canonical_url(url) in seen_keys:
+            continue
+        card={
+            "id": canonical_id(url),
+            "title": title,
+            "qualificationLevel": "Any graduate",
+            "domicile": "All India",
+            "deadline": last,
+            "applyLink": url,
+            "detailLink": url,
+            "source": "official",
+            "type": "VACANCY",
+            "flags": {"added_from_missing": True, "trusted": True}
+        }
+        try:
+            if isinstance(posts,str) and posts.strip().isdigit():
+                posts=int(posts.strip())
+            if isinstance(posts,int) and posts>0:
+                card["numberOfPosts"]=posts
+        except:
+            pass
+        jobs.append(card)
+    return jobs
+
+# Per-job decisions from screen() / apply_reports(), consumed by classify()
+KEEP_APPLIED = "applied"
+ARCHIVE = "archive"
+
+# (substring of the eligibility reason, transparencyInfo counter)
+REJECT_COUNTERS = (
+    ("Hindi", "rejectedHindi"), ("Teacher", "rejectedTeacher"), ("Tech", "rejectedTech"),
+    ("Postgraduate", "rejectedPostgraduate"), ("Specialty", "rejectedSpecialSkills"),
+    ("Domicile", "rejectedDomicile"),
+)
+
+def _flag_non_vacancy(j):
+    j.setdefault("flags",{})["removed_reason"]="auto_filtered_learn_non_vacancy"
+    j.setdefault("flags",{})["auto_filtered"]="learn_non_vacancy"
+
+def screen(jobs, pinned, learner, stats):
+    """
+    FIX H-001 + H-002: pinned jobs first (never filtered), then eligibility
+    and learned non-vacancy patterns. Returns [job, decision] pairs in job
+    order; decision None means the job still gets reports applied.
+    """
+    pinned = set(pinned)
+    out = []
+    for j in jobs:
+        jid = j.get("id")
+
+        # FIX H-001 + H-002: Check pinned status FIRST (protection before filtering)
+        if jid in pinned:
+            # NEVER filter a job someone applied to (even if expired!); once
+            # exam_done passes 7 days it drops out of their sections instead
+            print(f"[QC] Keeping applied job: {jid[:16]} - {j.get('title', '')[:50]}", file=sys.stderr)
+            out.append([j, KEEP_APPLIED])
+            continue
+
+        # ===== For non-pinned jobs: apply eligibility checks =====
+
+        # FIX C-003: Check eligibility using comprehensive module
+        is_eligible_result, reason = check_eligibility(j)
+        if not is_eligible_result:
+            # Track rejection reasons
+            for word, key in REJECT_COUNTERS:
+                if word in reason:
+                    stats[key] += 1
+                    break
+
+            j.setdefault("flags",{})["removed_reason"] = f"auto_filtered_{reason}"
+            j.setdefault("flags",{})["auto_filtered"] = reason
+            print(f"[QC] Filtering: {j.get('title', '')[:50]} ({reason})", file=sys.stderr)
+            out.append([j, ARCHIVE])
+            continue
+
+        if learner.matches_non_vacancy_pattern(host(j.get("applyLink")), j.get("title",""), j.get("applyLink","")):
+            if not (j.get("numberOfPosts") and parse_date_any(j.get("deadline"))):
+                _flag_non_vacancy(j)
+                out.append([j, ARCHIVE])
+                continue
 
-    info = find_report(j)
-    if info:
+        out.append([j, None])
+    return out
+
+def apply_reports(screened, report_state, learner):
+    """Apply aggregated user reports (tools/reports.py) to jobs screen() left undecided"""
+    learned = False
+    for item in screened:
+        j, decision = item
+        if decision is not None:
+            continue
+        h = host(j.get("applyLink"))
+
+        # Patterns learned from earlier reports apply to later jobs in the same run
+        if learned and learner.matches_non_vacancy_pattern(h, j.get("title",""), j.get("applyLink","")):
+            if not (j.get("numberOfPosts") and parse_date_any(j.get("deadline"))):
+                _flag_non_vacancy(j)
+                item[1] = ARCHIVE
+                continue
+
+        info = lookup_report(report_state, j)
+        if not info:
+            continue
         reasons = set([info.get("reasonCode") or info.get("reasons", "")]) if info.get("reasonCode") else set()
         if "wrong_last_date" in reasons and info.get("lastDate"):
-            j["deadline"]=info["lastDate"]; 
-            learn_set_slug(slugify(j.get("title")), lastDate=j["deadline"])
+            j["deadline"]=info["lastDate"];
+            learner.set_slug(slugify(j.get("title")), lastDate=j["deadline"])
         if "wrong_eligibility" in reasons and info.get("eligibility"):
-            j["qualificationLevel"]=info["eligibility"]; 
-            learn_set_slug(slugify(j.get("title")), eligibility=j["qualificationLevel"])
+            j["qualificationLevel"]=info["eligibility"];
+            learner.set_slug(slugify(j.get("title")), eligibility=j["qualificationLevel"])
         if "bad_link" in reasons and info.get("evidenceUrl"):
             j["applyLink"]=info["evidenceUrl"]
             j["detailLink"]=info["evidenceUrl"]
             j.setdefault("flags",{})["fixed_link"]=True
-            learn_set_slug(slugify(j.get("title")), fixedLink=j["applyLink"])
+            learner.set_slug(slugify(j.get("title")), fixedLink=j["applyLink"])
         if "duplicate" in reasons or "not_vacancy" in reasons or "last_date_over" in reasons:
             j.setdefault("flags",{})["removed_reason"]="reported_"+("_".join(sorted(reasons)))
             if "not_vacancy" in reasons:
-                mark_non_vacancy_pattern(h, j.get("title",""), j.get("applyLink",""))
-            archived.append(j)
+                learned = learner.mark_non_vacancy_pattern(h, j.get("title",""), j.get("applyLink","")) or learned
+            item[1] = ARCHIVE
             continue
         if info.get("posts") and not j.get("numberOfPosts"):
             try:
                 p=int(info["posts"])
                 if p>0:
                     j["numberOfPosts"]=p
-                    learn_set_slug(slugify(j.get("title")), posts=p)
-            except: 
+                    learner.set_slug(slugify(j.get("title")), posts=p)
+            except:
                 pass
+    return screened
+
+def classify(screened, archived, today):
+    """Split kept jobs into primary / other (expired); archived ones are appended in job order"""
+    primary=[]
+    other=[]
+    for j, decision in screened:
+        # Stored records stay the same from day to day: an ISO deadline,
+        # daysLeft (and the view's sort key and org facet) are worked out by
+        # whoever reads them
+        if j.get("deadline") is not None:
+            j["deadline"]=iso_date(j["deadline"])
+        for k in ("daysLeft", "sortKey", "org"):
+            j.pop(k, None)
+        if decision == ARCHIVE:
+            archived.append(j)
+            continue
+        if decision == KEEP_APPLIED:
+            primary.append(j)
+            continue
 
-    last=keep_date(j)
-    if last is not None:
-        j["daysLeft"]=(last - today).days
-    if not j.get("numberOfPosts"):
-        c=parse_posts_from_text(j.get("title")) or j.get("flags",{}).get("posts")
-        if c:
-            j["numberOfPosts"]=c
-
-    # KEEP all non-archived jobs (don't remove for expired deadline!)
-    if last and last < today:
-        other.append(j)
-    else:
-        primary.append(j)
-
-def host_only(u):
-    try: 
-        return urllib.parse.urlparse(u or "").netloc.lower()
-    except: 
-        return ""
+        last=keep_date(j)
+        if not j.get("numberOfPosts"):
+            c=parse_posts_from_text(j.get("title")) or j.get("flags",{}).get("posts")
+            if c:
+                j["numberOfPosts"]=c
 
-sources=set()
-for h in (rules.get("captureHints") or []):
-    try: 
-        sources.add(urllib.parse.urlparse(h).netloc.lower())
-    except: 
-        pass
-seen_hosts={}
-for j in primary+other:
-    seen_hosts.setdefault(host_only(j.get("applyLink")),0)
-    seen_hosts[host_only(j.get("applyLink"))]+=1
-sources_status=[{"host":h,"items":seen_hosts.get(h,0)} for h in sorted(sources)]
-
-transp = raw.get("transparencyInfo") or {}
-transp.update({
-    "schemaVersion":"1.10",
-    "runMode": RUN_MODE,
-    "lastUpdated": datetime.utcnow().isoformat()+"Z",
-    "mergedUpdates": merged_count,
-    "totalListings": len(primary)+len(other),
-    "sourcesByStatus": sources_status,
-    "archivedCount": len(archived),
-    "appliedCount": len(applied_ids),
-    "rejectedHindi": rejected_hindi,
-    "rejectedTeacher": rejected_teacher,
-    "rejectedTech": rejected_tech,
-    "rejectedPostgraduate": rejected_pg,
-    "rejectedSpecialSkills": rejected_skills,
-    "rejectedDomicile": rejected_domicile,
-    "archivedExamDone": archived_exam_done,
-    "learning": {
-        "hosts": len(learn.get("byHost") or {}),
-        "slugs": len(learn.get("bySlug") or {}),
-        "patterns": { h: len(v) for h,v in (learn.get("patterns") or {}).items() }
+        # KEEP all non-archived jobs (don't remove for expired deadline!)
+        if last and last < today:
+            other.append(j)
+        else:
+            primary.append(j)
+    return primary, other
+
+def sources_status(rules, listings):
+    sources=set()
+    for h in (rules.get("captureHints") or []):
+        try:
+            sources.add(urllib.parse.urlparse(h).netloc.lower())
+        except:
+            pass
+    seen_hosts={}
+    for j in listings:
+        seen_hosts.setdefault(host(j.get("applyLink")),0)
+        seen_hosts[host(j.get("applyLink"))]+=1
+    return [{"host":h,"items":seen_hosts.get(h,0)} for h in sorted(sources)]
+
+def run(data, logs, rules, learn, pinned=(), rollup=None, mode="nightly", today=None):
+    """
+    QC over in-memory inputs (the dict load() returns). rules and learn are
+    updated in place; nothing is written until emit().
+    Returns {"data", "rules", "learn", "logs", "archive", "aliases", "mode", "stats", "health", "timings"};
+    aliases ({previous job ID: canonical ID}) is what tools/user_sections.refresh() needs.
+    """
+    timings = {}
+    t = time.perf_counter()
+    def lap(name):
+        nonlocal t
+        now = time.perf_counter()
+        timings[name] = round(now - t, 4)
+        t = now
+
+    run_mode = (mode or "nightly").lower()
+    today = today or date.today()
+    # lastUpdated only moves when the output differs from what was read
+    before = content_sha1(data)
+    previous = {k: (data.get("transparencyInfo") or {}).get(k) for k in VOLATILE_TRANSPARENCY}
+    jobs = list(data.get("jobListings") or [])
+    # Jobs still inline from before the cold archive move out with this run's
+    archived = list(data.get("archivedListings") or [])
+    rollup = rollup or archive.new_rollup()
+    archive_cfg = archive.config(rules)
+    learner = Learner(learn, rules)
+    learn = learner.learn
+    stats = {key: 0 for _, key in REJECT_COUNTERS}
+    lap("prepare")
+
+    jobs, pinned, id_aliases = dedupe(jobs, pinned)
+    lap("dedupe")
+    jobs, merged_count = link_updates(jobs, learner)
+    lap("link_updates")
+    jobs = add_missing(jobs, logs["submissions"], rules)
+    lap("add_missing")
+    screened = screen(jobs, pinned, learner, stats)
+    lap("screen")
+    # Reports pre-aggregated per job ID and per canonical URL (O(1) lookups)
+    apply_reports(screened, logs["reports"], learner)
+    lap("apply_reports")
+    primary, other = classify(screened, archived, today)
+    lap("classify")
+    archived_at = datetime.utcnow()
+    archive.note(rollup, archived, archived_at, archive_cfg["recentIds"])
+    expired_months = archive.retain(rollup, today, archive_cfg["retentionMonths"])
+    archive_summary = archive.summary(rollup, archive_cfg["retentionMonths"])
+
+    transp = data.get("transparencyInfo") or {}
+    # Per-run counters go to health.json only, so an unchanged day leaves data.json as it was
+    for k in ("logEventsRead", "appliedCount", "archivedExamDone"):
+        transp.pop(k, None)
+    transp.update({
+        "schemaVersion":"1.10",
+        "runMode": run_mode,
+        "lastUpdated": datetime.utcnow().isoformat()+"Z",
+        # Verdict cache hit rates (tools/verdict_cache.py) of the run that wrote this data
+        "eligibilityCache": verdict_cache.stats(),
+        "mergedUpdates": merged_count,
+        "totalListings": len(primary)+len(other),
+        "sourcesByStatus": sources_status(rules, primary+other),
+        "archivedCount": archive_summary["count"],
+        "pinnedCount": len(pinned),
+        **stats,
+        "learning": {
+            "hosts": len(learn.get("byHost") or {}),
+            "slugs": len(learn.get("bySlug") or {}),
+            "patterns": { h: len(v) for h,v in (learn.get("patterns") or {}).items() }
+        }
+    })
+
+    listings = primary+other
+    # Shared sections only: who applied to what lives in user/<uid>/sections.json
+    out = {
+        "jobListings": listings,  # ✅ ALL jobs (pinned + primary + other)
+        "archive": archive_summary,  # records live in archive/YYYY-MM.jsonl
+        "sections": {
+            "pinned": pinned,  # kept by schema_merge and QC whatever happens
+            "primary": [j.get("id") for j in primary]
+        },
+        "transparencyInfo": transp
     }
-})
-
-# ===== CRITICAL FIX: Include applied jobs IN jobListings + IDs in sections =====
-out = {
-    "jobListings": primary+other,  # ✅ ALL jobs (applied + primary + other)
-    "archivedListings": archived,
-    "sections": {
-        "applied": applied_ids,  # ✅ IDs for quick lookup
-        "other": other_marked_ids,
-        "primary": [j.get("id") for j in primary if j.get("id") not in applied_ids]
-    },
-    "transparencyInfo": transp
-}
-
-JWRITE("data.json", out)
-JWRITE("rules.json", rules)
-JWRITE("learn_registry.json", learn)
-JWRITE("learn.json", {"generatedAt": datetime.utcnow().isoformat()+"Z","runMode": RUN_MODE})
-JWRITE("health.json", {"ok": True, **transp})
-
-total_rejected = rejected_hindi + rejected_teacher + rejected_tech + rejected_pg + rejected_skills + rejected_domicile
-
-print(f"✓ QC complete: {len(primary)+len(other)} active ({len(applied_ids)} applied), {len(archived)} archived", file=sys.stderr)
-print(f"  Rejected: hindi={rejected_hindi}, teacher={rejected_teacher}, tech={rejected_tech}, pg={rejected_pg}, skills={rejected_skills}, domicile={rejected_domicile}", file=sys.stderr)
-print(f"  Total rejected: {total_rejected}, mode={RUN_MODE}", file=sys.stderr)
+    # Render order precomputed, so the page does not sort
+    out["view"] = view_model.build(listings)
+    if previous["lastUpdated"] and content_sha1(out) == before:
+        transp.update({k: v for k, v in previous.items() if v is not None})
+    lap("build_output")
+
+    return {
+        "data": out, "rules": rules, "learn": learn, "logs": logs, "mode": run_mode,
+        "archive": {"records": archived, "at": archived_at, "rollup": rollup, "drop": expired_months},
+        "aliases": id_aliases,
+        "stats": {**stats, "active": len(primary)+len(other), "pinned": len(pinned), "archived": len(archived)},
+        "health": {"logEventsRead": logs.get("lastRead") or {}, "eligibilityCache": verdict_cache.stats()},
+        "timings": timings,
+    }
+
+def emit(result, base_dir=".", health_extra=None):
+    """Write run() outputs to base_dir; health_extra is merged into health.json"""
+    b = P(base_dir)
+    transp = result["data"]["transparencyInfo"]
+    arch = result["archive"]
+    # Segments before data.json: a crash in between repeats archive lines, never loses them
+    archive.write(arch["records"], str(b), arch["at"])
+    archive.drop(arch["drop"], str(b))
+    archive.save_rollup(arch["rollup"], str(b))
+    try:
+        job_store.save_data(result["data"], str(b / "data.json"))
+    except Exception as e:
+        print(f"[ERROR] Writing {b / 'data.json'}: {e}", file=sys.stderr)
+    try:
+        # manifest.json + content-hashed shards for app.js
+        write_shards(result["data"], str(b))
+    except Exception as e:
+        print(f"[ERROR] Writing shards: {e}", file=sys.stderr)
+    JWRITE(b / "rules.json", result["rules"])
+    JWRITE(b / "learn_registry.json", result["learn"])
+    save_log_state(result["logs"], str(b / "logs_state.json"))
+    verdict_cache.save()
+    JWRITE(b / "learn.json", {"generatedAt": datetime.utcnow().isoformat()+"Z","runMode": result["mode"]})
+    JWRITE(b / "health.json", {"ok": True, **transp, **result["health"], **(health_extra or {})})
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", default="nightly")
+    ap.add_argument("--timings", action="store_true", help="print per-phase timings")
+    ap.add_argument("--pinned", help="JSON list of pinned job IDs (default: from users/)")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    inputs = load(pinned=JLOAD(args.pinned, []) if args.pinned else None)
+    load_sec = round(time.perf_counter() - t0, 4)
+    result = run(**inputs, mode=args.mode)
+    t0 = time.perf_counter()
+    emit(result)
+    if not args.pinned:
+        # Local users: re-materialise the ones this run made stale
+        user_sections.refresh(user_sections.DirStore("users"), date.today(), result["aliases"])
+    result["timings"] = {"load": load_sec, **result["timings"], "emit": round(time.perf_counter() - t0, 4)}
+
+    st = result["stats"]
+    total_rejected = sum(st[key] for _, key in REJECT_COUNTERS)
+    print(f"✓ QC complete: {st['active']} active ({st['pinned']} pinned), {st['archived']} archived", file=sys.stderr)
+    print(f"  Rejected: hindi={st['rejectedHindi']}, teacher={st['rejectedTeacher']}, tech={st['rejectedTech']}, pg={st['rejectedPostgraduate']}, skills={st['rejectedSpecialSkills']}, domicile={st['rejectedDomicile']}", file=sys.stderr)
+    print(f"  Total rejected: {total_rejected}, mode={result['mode']}", file=sys.stderr)
+    if args.timings:
+        print("  Timings: " + " ".join(f"{k}={v}s" for k, v in result["timings"].items()), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,13 +2,20 @@
 # tools/qc_checks.py — validate final data.json with auto-deduplication
 # FIXES: P3-H-009 (better dedup logic), auto-archive invalid data
 
-import json
 import sys
 import pathlib
 from urllib.parse import urlparse
-from datetime import datetime, date
 import hashlib
 
+from tools.core import parse_date_any
+from tools.canonical import canonical_url
+from tools import job_store
+
+try:
+    from tools.near_dup import NearDupIndex
+except ImportError:
+    NearDupIndex = None
+
 def is_http_url(u):
     if not u:
         return False
@@ -18,28 +25,9 @@ def is_http_url(u):
     except:
         return False
 
-def parse_date_any(s):
-    if not s or s.strip().upper() == "N/A":
-        return None
-    s = s.strip()
-    for f in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
-        try:
-            return datetime.strptime(s, f).date()
-        except:
-            pass
-    return None
-
-def norm_url(u):
-    try:
-        p = urlparse(u or "")
-        base = p._replace(query="", fragment="")
-        return base.geturl().rstrip("/").lower()
-    except:
-        return (u or "").rstrip("/").lower()
-
 def make_key(job):
     """Generate dedup key from job data"""
-    url_key = norm_url(job.get("applyLink"))
+    url_key = canonical_url(job.get("applyLink"))
     title_key = (job.get("title") or "").lower()[:50]
     return hashlib.sha1(f"{url_key}|{title_key}".encode()).hexdigest()[:16]
 
@@ -50,7 +38,7 @@ def main():
         sys.exit(2)
 
     try:
-        data = json.loads(p.read_text(encoding="utf-8"))
+        data = job_store.load_data(str(p), strict=True)
     except Exception as e:
         print(f"[QC] Invalid JSON: {e}", file=sys.stderr)
         sys.exit(2)
@@ -132,13 +120,23 @@ def main():
         if typ not in ("VACANCY", "UPDATE"):
             problems.append(f"[{rid}] invalid type: {typ}")
 
-    # If deduplication happened, write back
+    # If deduplication happened, write back (once, below)
+    dirty = False
     if duplicates_removed > 0:
         data["jobListings"] = deduped
         data["transparencyInfo"]["totalListings"] = len(deduped)
-        p.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+        dirty = True
         print(f"[QC] Auto-deduped {duplicates_removed} duplicates", file=sys.stderr)
 
+    # Near-duplicates that exact keys miss (report only, never auto-removed)
+    if NearDupIndex is not None:
+        nd = NearDupIndex()
+        for rec in deduped:
+            nd.add(rec)
+        for group in nd.clusters():
+            ids = ", ".join(str(deduped[o].get("id")) for o in group)
+            problems.append(f"possible near-duplicates: {ids}")
+
     # Validate archived entries
     for i, rec in enumerate(archived):
         rr = rec.get("flags", {}).get("removed_reason")
@@ -148,7 +146,10 @@ def main():
     # Update total if needed
     if isinstance(tinfo.get("totalListings"), int) and tinfo["totalListings"] != len(deduped):
         data["transparencyInfo"]["totalListings"] = len(deduped)
-        p.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+        dirty = True
+
+    if dirty:
+        job_store.save_data(data, str(p))
 
     # Print results
     critical = [m for m in problems if "missing id" in m or "invalid JSON" in m]
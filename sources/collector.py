@@ -3,11 +3,16 @@
 # Uses cloudscraper to handle SSL certificate verification issues
 
 import cloudscraper
-import json, sys, re, time, os, hashlib, pathlib
+import json, sys, re, time, os, pathlib
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 from collections import defaultdict
 
+# Shared normalisation (tools/core.py) — same IDs as every later stage
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.core import clean, posts_from_text
+from tools.canonical import canonical_id, record_response, save as save_canonical
+
 # Create cloudflare-aware scraper (handles SSL automatically!)
 scraper = cloudscraper.create_scraper()
 
@@ -66,25 +71,12 @@ POS_KEYWORDS = ["recruitment", "vacancy", "job", "opening", "notification", "app
 # BLOCK regex for obvious blocked positions
 BLOCK = re.compile(r"(teacher|tgt|pgt|prt|b\.?ed|ctet|tet|b\.?tech|m\.?tech|b\.e|m\.e|mca|bca|developer|architect|analyst|nursing|pharma|iti|polytechnic|diploma|mba|msc|m\.sc|phd|post\s*graduate)", re.I)
 
-# Posts pattern
-POSTS_PAT = re.compile(r"(\d{1,6})\s*(posts?|vacanc(?:y|ies)|seats?)", re.I)
-
-def clean(s): 
-    return re.sub(r"\s+", " ", (s or "").strip())
-
 def host(u):
     try: 
         return urlparse(u or "").netloc.lower()
     except: 
         return ""
 
-def stable_id(url):
-    try:
-        norm_url = (url or "").lower().strip()
-        return f"job_{hashlib.sha1(norm_url.encode()).hexdigest()[:12]}"
-    except:
-        return f"job_{hashlib.md5((url or '').lower().encode()).hexdigest()[:12]}"
-
 def detect_qualification(title):
     """Extract qualification level from job title"""
     title_lower = (title or "").lower()
@@ -98,16 +90,6 @@ def detect_qualification(title):
     
     return "Any graduate"
 
-def posts_from_text(txt):
-    """Extract number of posts from text"""
-    m = POSTS_PAT.search(txt or "")
-    if not m: 
-        return None
-    try: 
-        return int(m.group(1))
-    except: 
-        return None
-
 def extract_pdf_link(job_url, base_url):
     """Extract PDF link from job posting page"""
     try:
@@ -115,8 +97,9 @@ def extract_pdf_link(job_url, base_url):
             return None, False
         
         # FIX: Use cloudscraper instead of requests
-        r = scraper.get(job_url, timeout=15)
+        r = scraper.get(job_url, timeout=PDF_TIMEOUT)
         r.raise_for_status()
+        record_response(job_url, r)
         soup = BeautifulSoup(r.text, "html.parser")
         
         for link in soup.find_all('a'):
@@ -155,6 +138,9 @@ def fetch_site(url, selector):
         # FIX: Use cloudscraper instead of requests
         r = scraper.get(url, timeout=30)
         r.raise_for_status()
+        # Same-host redirects and rel=canonical of the page feed the alias cache
+        record_response(url, r)
+        base = getattr(r, "url", None) or url
         soup = BeautifulSoup(r.text, "html.parser")
         
         jobs = []
@@ -168,7 +154,7 @@ def fetch_site(url, selector):
             if not is_relevant(title):
                 continue
             
-            full_url = href if href.startswith("http") else urljoin(url, href)
+            full_url = href if href.startswith("http") else urljoin(base, href)
             jobs.append((title, full_url))
         
         print(f"[FETCH_OK] {url[:50]}: found {len(jobs)} jobs", file=sys.stderr)
@@ -178,70 +164,144 @@ def fetch_site(url, selector):
         print(f"[FETCH_ERR] {url[:50]}: {type(e).__name__}", file=sys.stderr)
         return []
 
-def collect():
-    """Collect from all sources"""
-    all_jobs = []
-    agg_counts = defaultdict(int)
-    
-    print("[COLLECT] Starting official sites scrape...", file=sys.stderr)
-    for url, sel, org, domicile in OFFICIAL_SITES:
-        print(f"[FETCH] {url[:50]}...", file=sys.stderr)
-        for title, link in fetch_site(url, sel):
-            qual = detect_qualification(title)
-            posts = posts_from_text(title)
-            
-            pdf_link = None
-            has_posts = posts is not None
-            has_explicit_qual = qual != "Any graduate"
-            
-            if not has_posts and not has_explicit_qual:
+# Worst case for one seed: page fetch (30s) plus one PDF probe (15s); later
+# probes only start while PDF_TIMEOUT is left before the deadline
+PDF_TIMEOUT = 15
+SEED_RESERVE = 45
+MAX_PDF_PROBES = 5  # per seed under a deadline, so one slow site cannot eat the run
+
+def collect_official(url, sel, org, domicile, deadline=None, pending=None):
+    """
+    Jobs listed on one official seed page. Under a deadline, links whose PDF
+    probe is skipped (MAX_PDF_PROBES reached or budget nearly spent) are
+    appended to pending for probe_pending() to pick up later.
+    """
+    jobs = []
+    probes = 0
+    for title, link in fetch_site(url, sel):
+        qual = detect_qualification(title)
+        posts = posts_from_text(title)
+        
+        pdf_link = None
+        has_posts = posts is not None
+        has_explicit_qual = qual != "Any graduate"
+        
+        if not has_posts and not has_explicit_qual:
+            if deadline is not None and probes >= MAX_PDF_PROBES:
+                print(f"[COLLECT] {MAX_PDF_PROBES} PDF probes done for {url[:40]}, deferring {link[:50]}", file=sys.stderr)
+                if pending is not None:
+                    pending.append({"seed": url, "url": link})
+            elif deadline is not None and deadline - time.monotonic() < PDF_TIMEOUT:
+                print(f"[COLLECT] Time budget nearly spent, deferring the PDF probe for {link[:50]}", file=sys.stderr)
+                if pending is not None:
+                    pending.append({"seed": url, "url": link})
+            else:
+                probes += 1
                 pdf_link, _ = extract_pdf_link(link, url)
-            
-            job = {
-                "id": stable_id(link),
-                "title": title,
-                "url": link,
-                "source": "official",
-                "org": org,
-                "domicile": domicile,
-                "qual": qual,
-                "posts": posts,
-                "pdf_link": pdf_link,
-                "agg_count": 0
-            }
-            
-            all_jobs.append(job)
         
-        time.sleep(0.5)
+        jobs.append({
+            "id": canonical_id(link),
+            "title": title,
+            "url": link,
+            "source": "official",
+            "org": org,
+            "domicile": domicile,
+            "qual": qual,
+            "posts": posts,
+            "pdf_link": pdf_link,
+            "agg_count": 0
+        })
+    return jobs
+
+def collect_aggregator(agg_url, agg_counts):
+    jobs = []
+    for title, link in fetch_site(agg_url, "a[href]"):
+        norm_title = title.lower().strip()
+        agg_counts[norm_title] += 1
+        
+        qual = detect_qualification(title)
+        posts = posts_from_text(title)
+        agg_host = host(agg_url)
+        
+        jobs.append({
+            "id": canonical_id(link),
+            "title": title,
+            "url": link,
+            "source": "aggregator",
+            "domicile": "All India",
+            "qual": qual,
+            "posts": posts,
+            "agg_host": agg_host,
+            "agg_score": AGG_SCORES.get(agg_host, 0.6),
+            "agg_count": agg_counts[norm_title]
+        })
+    return jobs
+
+def probe_pending(progress, deadline=None):
+    """
+    Run the PDF probes collect_official() deferred (progress["pdfPending"])
+    and set pdf_link on their jobs; False when the deadline stopped it first.
+    """
+    pending = progress["pdfPending"]
+    while pending:
+        if deadline is not None and deadline - time.monotonic() < PDF_TIMEOUT:
+            print(f"[COLLECT] Time budget nearly spent, {len(pending)} PDF probes left for the next run", file=sys.stderr)
+            return False
+        p = pending[0]
+        pdf_link, _ = extract_pdf_link(p["url"], p["seed"])
+        if pdf_link:
+            for j in progress["jobs"]:
+                if j["source"] == "official" and j["url"] == p["url"] and not j.get("pdf_link"):
+                    j["pdf_link"] = pdf_link
+        pending.pop(0)
+    return True
+
+def collect(progress=None, deadline=None):
+    """
+    Collect from all sources.
+    progress ({"done", "jobs", "aggCounts", "pdfPending"}) is updated after
+    every seed so a checkpointed run can resume; with a deadline
+    (time.monotonic()) no seed or PDF probe is started that could overrun it,
+    and progress["complete"] stays False. Deferred probes are carried in
+    pdfPending and run once every seed is done.
+    """
+    progress = {} if progress is None else progress
+    progress.setdefault("done", [])
+    progress.setdefault("jobs", [])
+    progress.setdefault("aggCounts", {})
+    progress.setdefault("pdfPending", [])
+    progress["complete"] = False
+    all_jobs = progress["jobs"]
+    agg_counts = defaultdict(int, progress["aggCounts"])
+    done = set(progress["done"])
     
-    print("[COLLECT] Starting aggregators scrape...", file=sys.stderr)
-    for agg_url in AGGREGATORS:
-        print(f"[FETCH] {agg_url[:50]}...", file=sys.stderr)
-        for title, link in fetch_site(agg_url, "a[href]"):
-            norm_title = title.lower().strip()
-            agg_counts[norm_title] += 1
-            
-            qual = detect_qualification(title)
-            posts = posts_from_text(title)
-            agg_host = host(agg_url)
-            
-            job = {
-                "id": stable_id(link),
-                "title": title,
-                "url": link,
-                "source": "aggregator",
-                "domicile": "All India",
-                "qual": qual,
-                "posts": posts,
-                "agg_host": agg_host,
-                "agg_score": AGG_SCORES.get(agg_host, 0.6),
-                "agg_count": agg_counts[norm_title]
-            }
-            
-            all_jobs.append(job)
+    seeds = [("official", s) for s in OFFICIAL_SITES] + [("aggregator", (u,)) for u in AGGREGATORS]
+    kind_started = set()
+    for kind, seed in seeds:
+        url = seed[0]
+        if url in done:
+            continue
+        if deadline is not None and deadline - time.monotonic() < SEED_RESERVE:
+            print(f"[COLLECT] Time budget nearly spent, stopping before {url[:50]} ({len(done)}/{len(seeds)} seeds done)", file=sys.stderr)
+            return all_jobs, agg_counts
+        if kind not in kind_started:
+            print(f"[COLLECT] Starting {'official sites' if kind == 'official' else 'aggregators'} scrape...", file=sys.stderr)
+            kind_started.add(kind)
         
-        time.sleep(0.3)
+        print(f"[FETCH] {url[:50]}...", file=sys.stderr)
+        if kind == "official":
+            all_jobs.extend(collect_official(*seed, deadline=deadline, pending=progress["pdfPending"]))
+            time.sleep(0.5)
+        else:
+            all_jobs.extend(collect_aggregator(url, agg_counts))
+            time.sleep(0.3)
+        done.add(url)
+        progress["done"].append(url)
+        progress["aggCounts"] = dict(agg_counts)
     
+    if not probe_pending(progress, deadline):
+        return all_jobs, agg_counts
+    progress["complete"] = True
     return all_jobs, agg_counts
 
 def dedup_and_rank(items, agg_counts):
@@ -249,6 +309,7 @@ def dedup_and_rank(items, agg_counts):
     COMPLETE dedup logic:
     - Keep ALL official jobs
     - Keep aggregator jobs IF found in 2+ aggregators or from high-scoring aggregator
+    - Title variants of one vacancy fold together first (rules.json -> nearDuplicate)
     """
     bykey = {}
     
@@ -276,8 +337,12 @@ def dedup_and_rank(items, agg_counts):
         
         bykey[key].setdefault("flags", {})["corroborated"] = True
     
+    kept = list(bykey.values())
+    if (RULES.get("nearDuplicate") or {}).get("enabled", False):
+        kept = fold_near_duplicates(kept)
+    
     final = []
-    for job in bykey.values():
+    for job in kept:
         if job["source"] == "official":
             final.append(job)
         elif job.get("agg_count", 0) >= 2:
@@ -286,35 +351,79 @@ def dedup_and_rank(items, agg_counts):
     
     return final
 
-if __name__ == "__main__":
-    out, agg_counts = collect()
+def fold_near_duplicates(jobs):
+    """
+    Fold title variants of one vacancy (tools/near_dup.py, rules.json ->
+    nearDuplicate) into a single job, officials first so an aggregator copy
+    folds into the official listing. A variant from another source or
+    aggregator corroborates the job it folds into.
+    """
+    from tools.near_dup import NearDupIndex
+    idx = NearDupIndex.from_rules(RULES)
+    kept = []
+    for j in sorted(jobs, key=lambda j: j["source"] != "official"):
+        hit = idx.match({"title": j["title"], "applyLink": j["url"], "source": j["source"]})
+        if hit is None:
+            idx.add({"title": j["title"], "applyLink": j["url"], "source": j["source"]})
+            kept.append(j)
+            continue
+        into = kept[hit[0]]
+        if (j["source"], j.get("agg_host")) != (into["source"], into.get("agg_host")):
+            into["agg_count"] = into.get("agg_count", 0) + max(j.get("agg_count", 0), 1)
+            into.setdefault("flags", {})["corroborated"] = True
+        into.setdefault("flags", {}).setdefault("near_duplicates", []).append(
+            {"applyLink": j["url"], "title": j["title"], "score": round(hit[1], 3)})
+    print(f"[DEDUP] {len(jobs) - len(kept)} near-duplicate titles folded", file=sys.stderr)
+    kept = {id(j) for j in kept}
+    return [j for j in jobs if id(j) in kept]
+
+def to_candidate(j):
+    """Collector job -> candidates.jsonl record (schema_merge input)"""
+    rec = {
+        "id": j["id"],
+        "title": j["title"],
+        "applyLink": j["url"],
+        "detailLink": j["url"],
+        "source": j["source"],
+        "domicile": j.get("domicile", "All India"),
+        "type": "VACANCY",
+        "qualificationLevel": j.get("qual", "Any graduate")
+    }
+    
+    if j.get("posts"):
+        rec["numberOfPosts"] = j["posts"]
+    
+    if j.get("pdf_link"):
+        rec["pdfLink"] = j["pdf_link"]
+        rec.setdefault("flags", {})["needs_pdf_review"] = True
+    
+    if j.get("corroborated"):
+        rec.setdefault("flags", {})["corroborated"] = True
+    
+    if (j.get("flags") or {}).get("near_duplicates"):
+        rec.setdefault("flags", {})["near_duplicates"] = j["flags"]["near_duplicates"]
+    
+    return rec
+
+def run(progress=None, deadline=None):
+    """
+    Collect, dedup and rank; returns candidate records, or None when the
+    deadline stopped collection early (resume later with the same progress)
+    """
+    progress = {} if progress is None else progress
+    out, agg_counts = collect(progress, deadline)
+    if not progress["complete"]:
+        save_canonical()
+        return None
     out = dedup_and_rank(out, agg_counts)
     
     for j in out:
         j.setdefault("domicile", "All India")
     
     print(f"[DONE] Collected {len(out)} total jobs", file=sys.stderr)
-    
-    for j in out:
-        rec = {
-            "id": j["id"],
-            "title": j["title"],
-            "applyLink": j["url"],
-            "detailLink": j["url"],
-            "source": j["source"],
-            "domicile": j.get("domicile", "All India"),
-            "type": "VACANCY",
-            "qualificationLevel": j.get("qual", "Any graduate")
-        }
-        
-        if j.get("posts"):
-            rec["numberOfPosts"] = j["posts"]
-        
-        if j.get("pdf_link"):
-            rec["pdfLink"] = j["pdf_link"]
-            rec.setdefault("flags", {})["needs_pdf_review"] = True
-        
-        if j.get("corroborated"):
-            rec.setdefault("flags", {})["corroborated"] = True
-        
+    save_canonical()
+    return [to_candidate(j) for j in out]
+
+if __name__ == "__main__":
+    for rec in run():
         print(json.dumps(rec, ensure_ascii=False))
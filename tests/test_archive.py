@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import archive
+
+def job(jid, reason):
+    return {"id": jid, "title": jid, "flags": {"removed_reason": reason}}
+
+def archive_at(rollup, base, when, jobs):
+    archive.write(jobs, str(base), when)
+    archive.note(rollup, jobs, when)
+
+def test_retain_moves_old_months_into_purged(tmp_path):
+    r = archive.new_rollup()
+    archive_at(r, tmp_path, datetime(2024, 1, 5), [job("a", "expired"), job("b", "duplicate")])
+    archive_at(r, tmp_path, datetime(2024, 6, 5), [job("c", "expired")])
+    archive_at(r, tmp_path, datetime(2025, 3, 5), [job("d", "not_vacancy")])
+    before = archive.summary(r)
+
+    dropped = archive.retain(r, date(2025, 4, 1), months=12)
+    assert dropped == ["2024-01"]
+    assert sorted(r["months"]) == ["2024-06", "2025-03"]
+    assert r["purged"] == {"count": 2, "reasons": {"expired": 1, "duplicate": 1}}
+    archive.drop(dropped, str(tmp_path))
+    assert archive.segments(str(tmp_path)) == ["2024-06", "2025-03"]
+
+    after = archive.summary(r, 12)
+    # Purged months still count towards the reasons, not towards what is retained
+    assert after["count"] == before["count"] == 4
+    assert after["reasons"] == before["reasons"] == {"expired": 2, "duplicate": 1, "not_vacancy": 1}
+    assert after["retained"] == 2
+    assert archive.retain(r, date(2025, 4, 1), months=12) == []
+
+def test_rebuild_rollup_matches_noted_months(tmp_path):
+    r = archive.new_rollup()
+    archive_at(r, tmp_path, datetime(2025, 1, 2), [job("a", "expired"), job("b", "expired")])
+    archive_at(r, tmp_path, datetime(2025, 2, 2), [job("c", "duplicate")])
+    with open(tmp_path / archive.ARCHIVE_DIR / "2025-02.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"archivedAt": "2025-02-03T00:00:00Z", "reas')  # half-written line
+    rebuilt = archive.rebuild_rollup(str(tmp_path))
+    assert rebuilt["months"] == r["months"]
+    assert rebuilt["recent"] == ["a", "b", "c"]
+    assert [rec["id"] for rec in archive.iter_records(str(tmp_path), ["2025-01"])] == ["a", "b"]
+
+def test_unreadable_rollup_is_rebuilt(tmp_path):
+    r = archive.new_rollup()
+    archive_at(r, tmp_path, datetime(2025, 1, 2), [job("a", "expired")])
+    archive.save_rollup(r, str(tmp_path))
+    assert archive.load_rollup(str(tmp_path)) == r
+    (tmp_path / archive.ARCHIVE_DIR / archive.ROLLUP).write_text("{not json")
+    assert archive.load_rollup(str(tmp_path))["months"] == {"2025-01": {"count": 1, "reasons": {"expired": 1}}}
+
+def test_recent_ids_are_capped(tmp_path):
+    r = archive.new_rollup()
+    archive.note(r, [job(str(i), "expired") for i in range(10)], datetime(2025, 1, 1), recent_ids=3)
+    assert r["recent"] == ["7", "8", "9"]
+    assert json.loads(json.dumps(archive.summary(r)))["recentIds"] == ["7", "8", "9"]
@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import canonical
+
+class Resp:
+    def __init__(self, url, history=(), ok=True, html=""):
+        self.url, self.ok, self.text = url, ok, html
+        self.history = [Resp(u) for u in history]
+        self.headers = {"Content-Type": "text/html"} if html else {}
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path):
+    canonical.use_cache(str(tmp_path / "canonical_cache.json"))
+    yield
+
+@pytest.mark.parametrize("raw, want", [
+    ("http://www.SSC.gov.in:80/Notices/", "https://ssc.gov.in/notices"),
+    ("https://ssc.gov.in:443//a//b/index.html?x=1#top", "https://ssc.gov.in/a/b"),
+    ("https://bpsc.bihar.gov.in/default.aspx", "https://bpsc.bihar.gov.in"),
+    ("  ", ""),
+])
+def test_rule_url(raw, want):
+    assert canonical.rule_url(raw) == want
+
+def test_same_host_redirect_becomes_alias():
+    canonical.record_response("https://ssc.gov.in/old", Resp("https://ssc.gov.in/new", ["https://ssc.gov.in/old"]))
+    assert canonical.canonical_url("http://www.ssc.gov.in/old/") == "https://ssc.gov.in/new"
+    assert canonical.canonical_id("https://ssc.gov.in/old") == canonical.canonical_id("https://ssc.gov.in/new")
+
+@pytest.mark.parametrize("final, history, ok", [
+    ("https://ssc.gov.in/", [], True),                       # homepage
+    ("https://login.example.com/x", [], True),               # other host
+    ("https://ssc.gov.in/new", ["https://cdn.example.com/hop"], True),  # a hop leaves the host
+    ("https://ssc.gov.in/error", [], False),                 # error page
+])
+def test_untrusted_targets_are_not_aliases(final, history, ok):
+    canonical.record_response("https://ssc.gov.in/job", Resp(final, history, ok))
+    assert canonical.canonical_url("https://ssc.gov.in/job") == "https://ssc.gov.in/job"
+
+def test_canonical_link_trust():
+    page = "https://bssc.bihar.gov.in/notice?id=5"
+    canonical.record_response("https://bssc.bihar.gov.in/n5", Resp("https://bssc.bihar.gov.in/n5",
+                              html='<link rel="canonical" href="/notices/5">'))
+    assert canonical.canonical_url("https://bssc.bihar.gov.in/n5") == "https://bssc.bihar.gov.in/notices/5"
+    canonical.record_response("https://bssc.bihar.gov.in/n6", Resp("https://bssc.bihar.gov.in/n6",
+                              html='<link rel="canonical" href="https://bssc.bihar.gov.in/">'))
+    assert canonical.canonical_url("https://bssc.bihar.gov.in/n6") == "https://bssc.bihar.gov.in/n6"
+    # a URL with a query would alias every sibling page
+    assert not canonical.record_redirect(page, "https://bssc.bihar.gov.in/notices/5")
+
+def test_aliases_persist(tmp_path):
+    canonical.record_redirect("https://ssc.gov.in/a", "https://ssc.gov.in/b")
+    canonical.save()
+    canonical.use_cache(str(tmp_path / "canonical_cache.json"))
+    assert canonical.canonical_url("https://ssc.gov.in/a") == "https://ssc.gov.in/b"
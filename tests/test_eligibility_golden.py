@@ -0,0 +1,13 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import eligibility
+
+def test_golden_verdicts():
+    bad = eligibility.check_golden()
+    assert bad == [], "\n".join(f"{c['title']!r}: expected {c['expected']}, got {c['got']}" for c in bad)
+
+def test_many_matches_single():
+    titles = ["SSC CGL 2025", "  ssc cgl 2025 ", "Staff Nurse Recruitment", "SSC CGL 2025"]
+    assert eligibility.is_eligible_many(titles) == [eligibility.is_eligible(t) for t in titles]
@@ -0,0 +1,72 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import canonical, event_log
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path):
+    canonical.use_cache(str(tmp_path / "canonical_cache.json"))
+    yield
+
+def append(path, *events, raw=""):
+    with open(path, "a", encoding="utf-8") as f:
+        for ev in events:
+            f.write(json.dumps(ev) + "\n")
+        f.write(raw)
+
+def vote(jid, v):
+    return {"jobId": jid, "vote": v}
+
+def test_resume_reads_only_new_lines(tmp_path):
+    votes = tmp_path / "votes.jsonl"
+    append(votes, vote("a", "right"), vote("a", "wrong"))
+    st = event_log.new_state()
+    assert event_log.consume(st, str(tmp_path))["votes"] == 2
+    append(votes, vote("a", "right"))
+    assert event_log.consume(st, str(tmp_path))["votes"] == 1
+    assert st["votes"]["a"] == {"right": 2, "wrong": 1}
+    assert event_log.consume(st, str(tmp_path))["votes"] == 0
+
+def test_half_written_line_waits_for_next_run(tmp_path):
+    votes = tmp_path / "votes.jsonl"
+    append(votes, vote("a", "right"), raw='{"jobId": "a", "vo')
+    st = event_log.new_state()
+    assert event_log.consume(st, str(tmp_path))["votes"] == 1
+    append(votes, raw='te": "right"}\n')
+    assert event_log.consume(st, str(tmp_path))["votes"] == 1
+    assert st["votes"]["a"]["right"] == 2
+
+def test_truncated_log_is_rebuilt(tmp_path):
+    votes = tmp_path / "votes.jsonl"
+    append(votes, vote("a", "right"), vote("a", "right"), vote("b", "wrong"))
+    st = event_log.new_state()
+    event_log.consume(st, str(tmp_path))
+    votes.write_text(json.dumps(vote("c", "right")) + "\n")
+    assert event_log.consume(st, str(tmp_path))["votes"] == 1
+    assert st["votes"] == {"c": {"right": 1, "wrong": 0}}
+
+def test_rotated_log_same_size_is_rebuilt(tmp_path):
+    votes = tmp_path / "votes.jsonl"
+    append(votes, vote("a", "right"))
+    st = event_log.new_state()
+    event_log.consume(st, str(tmp_path))
+    # Rotated to a new file that has already grown past the old offset
+    os.replace(votes, tmp_path / "votes.jsonl.1")
+    append(votes, vote("b", "wrong"), vote("b", "wrong"))
+    assert event_log.consume(st, str(tmp_path))["votes"] == 2
+    assert st["votes"] == {"b": {"right": 0, "wrong": 2}}
+
+def test_state_round_trip(tmp_path):
+    append(tmp_path / "votes.jsonl", vote("a", "right"))
+    st = event_log.new_state()
+    event_log.consume(st, str(tmp_path))
+    path = str(tmp_path / "logs_state.json")
+    event_log.save_state(st, path)
+    again = event_log.load_state(path)
+    append(tmp_path / "votes.jsonl", vote("a", "right"))
+    assert event_log.consume(again, str(tmp_path))["votes"] == 1
+    assert again["votes"]["a"]["right"] == 2
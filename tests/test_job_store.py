@@ -0,0 +1,48 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import canonical, job_store
+
+DATA = {
+    "jobListings": [
+        {"id": "job_a", "title": "SSC CGL 2025", "applyLink": "https://ssc.gov.in/cgl", "deadline": "2025-12-01",
+         "source": "official", "updates": [{"title": "Admit card", "link": "https://ssc.gov.in/ac"}]},
+        {"id": "job_b", "title": "BSSC Inter", "applyLink": "https://bssc.bihar.gov.in/inter", "deadline": "N/A",
+         "source": "aggregator"},
+    ],
+    "sections": {"pinned": [], "primary": ["job_a", "job_b"]},
+    "transparencyInfo": {"totalListings": 2, "note": "ünïcode"},
+}
+
+def test_store_lives_next_to_data(tmp_path, monkeypatch):
+    canonical.use_cache(str(tmp_path / "canonical_cache.json"))
+    monkeypatch.chdir(tmp_path)
+    data_dir = tmp_path / "site"
+    data_dir.mkdir()
+    path = str(data_dir / "data.json")
+    stats = job_store.save_data(json.loads(json.dumps(DATA)), path)
+    assert stats["jobs"] == {"rows": 2, "changed": 2, "deleted": 0}
+    assert (data_dir / "jobs.db").exists() and not (tmp_path / "jobs.db").exists()
+    with open(path, "r", encoding="utf-8") as f:
+        assert f.read() == json.dumps(DATA, indent=2, ensure_ascii=False)
+    assert job_store.load_data(path) == DATA
+
+    changed = json.loads(json.dumps(DATA))
+    changed["jobListings"][1]["deadline"] = "2026-01-31"
+    assert job_store.save_data(changed, path)["jobs"] == {"rows": 2, "changed": 1, "deleted": 0}
+    with job_store.JobStore(job_store.store_path(path)) as store:
+        assert [j["id"] for j in store.deadline_between("2026-01-01", "2026-12-31")] == ["job_b"]
+        assert store.updates_for("job_a")[0]["title"] == "Admit card"
+
+def test_hand_edited_data_is_reimported(tmp_path):
+    canonical.use_cache(str(tmp_path / "canonical_cache.json"))
+    path = str(tmp_path / "data.json")
+    job_store.save_data(json.loads(json.dumps(DATA)), path)
+    edited = {**DATA, "jobListings": DATA["jobListings"][:1]}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(edited, f)
+    assert job_store.load_data(path) == edited
+    with job_store.JobStore(job_store.store_path(path)) as store:
+        assert store.get("job_b") is None
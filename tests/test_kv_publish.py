@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import kv_local, kv_publish
+from tools.kv_publish import KVClient, Publisher
+
+@pytest.fixture
+def kv(tmp_path, monkeypatch):
+    monkeypatch.setattr(kv_publish, "BACKOFF", 0)
+    srv = kv_local.serve(0, str(tmp_path / "kv"), fail=0)
+    base = f"http://127.0.0.1:{srv.server_address[1]}/client/v4"
+    yield lambda: KVClient("acct", "ns", "token", base=base)
+    srv.shutdown()
+    srv.server_close()
+
+def test_hash_gate_skips_unchanged_values(kv):
+    pub = Publisher(kv())
+    assert pub.put_json("data.json", {"jobs": [1], "lastUpdated": "a"}, volatile=("lastUpdated",))
+    assert pub.finish()["uploaded"] == 1
+
+    # A new run reads data.meta back from KV
+    pub = Publisher(kv())
+    assert not pub.put_json("data.json", {"jobs": [1], "lastUpdated": "b"}, volatile=("lastUpdated",))
+    assert pub.put_json("data.json", {"jobs": [1, 2], "lastUpdated": "b"}, volatile=("lastUpdated",))
+    assert pub.finish()["skipped"] == 1
+    assert json.loads(kv().get("data.json")) == {"jobs": [1, 2], "lastUpdated": "b"}
+
+def test_precompressed_variants_follow_the_value(kv):
+    client = kv()
+    pub = Publisher(client)
+    pub.put("v.json", b'{"a":1}' * 50, precompressed=True)
+    assert {"v.json", "v.json.gz"} <= set(client.list("v.json"))
+    # Same bytes without variants is a change: the siblings are deleted
+    assert pub.put("v.json", b'{"a":1}' * 50)
+    assert client.list("v.json") == ["v.json"]
+
+def test_large_values_are_gzipped_and_split(kv, monkeypatch):
+    monkeypatch.setattr(kv_publish, "TRANSFORM_OVER", 1000)
+    monkeypatch.setattr(kv_publish, "PART_BYTES", 400)
+    blob = os.urandom(1500)  # incompressible, so gzip leaves it over PART_BYTES
+    client = kv()
+    pub = Publisher(client)
+    assert pub.put("big.json", blob)
+    pub.finish()
+    entry = json.loads(client.get("data.meta"))["keys"]["big.json"]
+    assert entry["encoding"] == "gzip" and entry["parts"] == 4
+    assert client.get("big.json") is None
+    assert sorted(client.list("big.json")) == [f"big.json.gz.part{n}" for n in range(4)]
+    assert kv_publish.read(client, "big.json") == blob
+
+    # Shrinking back under the threshold stores it as-is and drops the parts
+    pub = Publisher(client)
+    assert pub.put("big.json", b"small")
+    pub.finish()
+    assert client.list("big.json") == ["big.json"]
+    assert kv_publish.read(client, "big.json") == b"small"
+
+def test_prune_deletes_unreferenced_keys(kv):
+    client = kv()
+    pub = Publisher(client)
+    for k in ("shards/a.json", "shards/b.json", "data.json"):
+        pub.put(k, b"{}")
+    assert pub.prune(["shards/"], keep={"shards/b.json"}) == 1
+    pub.finish()
+    assert sorted(client.list()) == ["data.json", "data.meta", "shards/b.json"]
+
+def test_retries_through_injected_failures(tmp_path, monkeypatch):
+    monkeypatch.setattr(kv_publish, "BACKOFF", 0)
+    srv = kv_local.serve(0, str(tmp_path / "kv"), fail=2)
+    try:
+        client = KVClient("acct", "ns", "token", base=f"http://127.0.0.1:{srv.server_address[1]}/client/v4")
+        pub = Publisher(client)
+        for n in range(3):
+            pub.put(f"k{n}", b"x")
+        assert pub.finish()["retries"] > 0
+        assert [client.get(f"k{n}") for n in range(3)] == [b"x"] * 3
+    finally:
+        srv.shutdown()
+        srv.server_close()
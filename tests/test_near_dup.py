@@ -0,0 +1,25 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import near_dup
+
+def test_exam_code_matches_spelled_out_title():
+    idx = near_dup.NearDupIndex()
+    idx.add({"title": "SSC CGL Recruitment 2025 – Apply Online", "applyLink": "https://ssc.gov.in/cgl", "source": "official"})
+    hit = idx.match({"title": "Combined Graduate Level Examination 2025", "source": "aggregator",
+                     "applyLink": "https://www.sarkariresult.com/ssc-cgl-2025/"})
+    assert hit is not None and hit[0] == 0
+
+def test_other_commission_is_vetoed():
+    idx = near_dup.NearDupIndex()
+    idx.add({"title": "SSC CGL Recruitment 2025", "applyLink": "https://ssc.gov.in/cgl", "source": "official"})
+    assert idx.match({"title": "Bihar SSC Combined Graduate Level Online Form 2025", "source": "aggregator",
+                      "applyLink": "https://www.freejobalert.com/bssc-cgl-2025/"}) is None
+
+def test_labelled_sample_precision_recall():
+    rep = near_dup.sample_report()
+    assert rep["truePairs"] == 10
+    assert rep["precision"] == 1.0
+    assert rep["recall"] == 0.8
+    assert rep["falsePairs"] == []
@@ -0,0 +1,63 @@
+import itertools
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import patterns
+from tools.patterns import PatternMatcher, compact, subsumes
+
+def pat(title=(), path=(), added="", kind="non_vacancy"):
+    return {"kind": kind, "titleTokens": list(title), "pathTokens": list(path), "addedAt": added}
+
+def test_subsumes():
+    # one of "result"/"merit" is enough for a, and b needs "result"
+    assert subsumes(pat(["result", "merit"]), pat(["result"]))
+    assert not subsumes(pat(["result"]), pat(["result", "merit"]))
+    assert subsumes(pat(path=["news"]), pat(path=["news", "2025"]))
+    assert subsumes(pat(), pat(["admit", "card"]))
+    assert not subsumes(pat(["admit", "card", "hall", "ticket"]), pat(["admit"]))
+    assert not subsumes(pat(path=["news", "2025"]), pat(path=["news"]))
+    assert not subsumes(pat(["result"]), pat(["result"], kind="other"))
+    # b may match on "merit" + "list" alone, which a never sees
+    assert not subsumes(pat(["result"]), pat(["result", "merit", "list"]))
+
+def test_compact_drops_covered_and_keeps_older_on_ties():
+    old = pat(["result"], path=["news"], added="2025-01-01")
+    arr = [old, pat(["result"], path=["news", "2025"], added="2025-02-01"),
+           pat(["result"], path=["news"], added="2025-03-01"), pat(["answer", "key"], added="2025-04-01")]
+    assert compact(arr) == [old, arr[3]]
+    # A broader newcomer replaces what it covers
+    broad = pat(["result", "merit"], added="x")
+    assert compact([pat(["result"]), broad]) == [broad]
+
+def test_compact_caps_newest_per_host():
+    arr = [pat([f"t{i}"], added=f"2025-01-{i:02d}") for i in range(1, 11)]
+    out = compact(arr, max_per_host=3)
+    assert [p["titleTokens"] for p in out] == [["t8"], ["t9"], ["t10"]]
+
+def test_compaction_keeps_every_match():
+    rng = random.Random(7)
+    vocab = ["result", "merit", "list", "admit", "card", "answer", "key"]
+    paths = ["news", "2025", "notice"]
+    arr = [pat(rng.sample(vocab, rng.randint(0, 3)), rng.sample(paths, rng.randint(0, 2)), added=str(i))
+           for i in range(40)]
+    for a, b in itertools.product(arr, arr):
+        if subsumes(a, b):
+            for tt in itertools.combinations(vocab, 3):
+                m = PatternMatcher({"h": [b]}, max_per_host=0).matches("h", " ".join(tt), "https://h/news/2025")
+                assert not m or PatternMatcher({"h": [a]}, max_per_host=0).matches("h", " ".join(tt), "https://h/news/2025")
+    full = PatternMatcher({"h": [dict(p) for p in arr]}, max_per_host=0)
+    assert len(full.patterns["h"]) < len(arr)
+    for n in range(4):
+        for tt in itertools.combinations(vocab, n):
+            for pt in ("news", "news/2025", "notice/x", ""):
+                url = f"https://h/{pt}"
+                naive = any(PatternMatcher({"h": [p]}, max_per_host=0).matches("h", " ".join(tt), url) for p in arr)
+                assert full.matches("h", " ".join(tt), url) == naive
+
+def test_add_skips_covered_patterns():
+    m = PatternMatcher({"h": [pat(["result"])]})
+    assert not m.add("h", pat(["result"], path=["news"]))
+    assert m.add("h", pat(["admit"]))
+    assert m.matches("h", "Admit card out", "https://h/x")
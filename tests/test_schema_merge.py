@@ -0,0 +1,70 @@
+import copy
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import canonical, schema_merge, verdict_cache
+
+EXISTING = [
+    {"id": "job_aaaaaaaaaaaa", "title": "BSSC Inter Level Recruitment 2025", "applyLink": "https://bssc.bihar.gov.in/inter",
+     "detailLink": "", "deadline": "2025-12-01", "domicile": "Bihar", "source": "official", "flags": {}},
+]
+
+CANDIDATES = [
+    # same URL three times: the longest title wins, whatever the order
+    {"title": "SSC CGL 2025", "applyLink": "https://ssc.gov.in/cgl", "domicile": "All India"},
+    {"title": "SSC CGL 2025 Combined Graduate Level", "applyLink": "http://www.ssc.gov.in/cgl/", "domicile": "All India"},
+    {"title": "SSC CGL 2025 Combined", "applyLink": "https://ssc.gov.in/cgl?ref=x", "domicile": "All India"},
+    # enriches the stored record, then a longer duplicate of it arrives
+    {"title": "BSSC Inter Level Recruitment 2025", "applyLink": "https://bssc.bihar.gov.in/inter",
+     "domicile": "Bihar", "numberOfPosts": 23175, "deadline": "2025-12-01"},
+    {"title": "BSSC Inter Level Recruitment 2025 - 23175 Posts", "applyLink": "https://bssc.bihar.gov.in/inter/",
+     "domicile": "Bihar", "deadline": "2025-12-01"},
+    # a longer duplicate that is ineligible (domicile)
+    {"title": "IBPS Clerk 2025", "applyLink": "https://ibps.in/clerk", "domicile": "All India"},
+    {"title": "IBPS Clerk 2025 for Kerala only", "applyLink": "https://ibps.in/clerk", "domicile": "Kerala"},
+    {"title": "RRB NTPC Graduate 2025", "applyLink": "https://rrb.gov.in/ntpc", "domicile": "All India"},
+]
+
+@pytest.fixture(autouse=True)
+def caches(tmp_path):
+    canonical.use_cache(str(tmp_path / "canonical_cache.json"))
+    verdict_cache.use_cache(str(tmp_path / "eligibility_cache.json"))
+    yield
+
+def run(lazy):
+    data = {"jobListings": copy.deepcopy(EXISTING), "sections": {"pinned": [], "primary": []}}
+    cands = copy.deepcopy(CANDIDATES)
+    out, stats = schema_merge.merge_data(data, iter(cands) if lazy else cands, {}, None)
+    return out["jobListings"], stats
+
+def test_iterator_matches_list():
+    listed, listed_stats = run(lazy=False)
+    lazy, lazy_stats = run(lazy=True)
+    assert lazy == listed
+    assert lazy_stats == listed_stats
+
+def test_longest_title_per_url_wins():
+    jobs, _ = run(lazy=False)
+    titles = [j["title"] for j in jobs]
+    assert "SSC CGL 2025 Combined Graduate Level" in titles
+    assert not any(t in ("SSC CGL 2025", "SSC CGL 2025 Combined") for t in titles)
+    assert len([j for j in jobs if "ibps.in" in j["applyLink"]]) == 0  # the winner was ineligible
+
+def test_rejections_rechecked_when_rules_change(monkeypatch):
+    kerala = {"title": "Kerala PSC Clerk 2025", "applyLink": "https://keralapsc.gov.in/clerk", "domicile": "Kerala"}
+    index = {"version": schema_merge.INDEX_VERSION, "records": {}, "candidates": {}}
+    def merge_once():
+        data = {"jobListings": [], "sections": {"pinned": [], "primary": []}}
+        return schema_merge.merge_data(data, [dict(kerala)], {}, index)[1]["added"]
+
+    assert merge_once() == 0
+    assert list(index["candidates"].values()) == [""]
+    # The verdict itself now passes, but the rules did not change: still skipped
+    monkeypatch.setattr(schema_merge, "cached_eligibility", lambda job: (True, "Eligible"))
+    assert merge_once() == 0
+    # A new ruleset re-checks the earlier rejection
+    monkeypatch.setattr(verdict_cache, "ruleset_hash", lambda code=(): "changed")
+    assert merge_once() == 1
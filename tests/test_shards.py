@@ -0,0 +1,88 @@
+import copy
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import shards
+
+def job(n, **kw):
+    return {"id": f"job_{n:04d}", "title": f"Recruitment {n}", "deadline": "2026-12-31", "source": "official", **kw}
+
+def data(jobs):
+    return {"jobListings": copy.deepcopy(jobs), "sections": {}}
+
+def view(out_dir, manifest):
+    read = shards.read_file(str(out_dir))
+    return [r for n in shards.VIEW_SHARDS for r in json.loads(read(manifest["shards"][n]["path"]))]
+
+def apply(records, feed):
+    """The feed applied the way app.js applyChanges() does"""
+    by_id = {r["id"]: r for r in records}
+    for jid in feed["removed"]:
+        del by_id[jid]
+    for jid, ch in feed["changed"].items():
+        rec = {**by_id[jid], **ch["set"]}
+        for k in ch["unset"]:
+            rec.pop(k)
+        by_id[jid] = rec
+    for r in feed["added"]:
+        by_id[r["id"]] = r
+    return by_id
+
+def test_feeds_chain_across_versions(tmp_path):
+    jobs = [job(n) for n in range(20)]
+    m1 = shards.write_shards(data(jobs), str(tmp_path))
+    start = view(tmp_path, m1)
+
+    jobs[3]["title"] = "Recruitment 3 (corrigendum)"
+    del jobs[5]["deadline"]
+    m2 = shards.write_shards(data(jobs + [job(20)]), str(tmp_path))
+    m3 = shards.write_shards(data([j for j in jobs if j["id"] != "job_0007"] + [job(20), job(21)]), str(tmp_path))
+    assert m3["changes"][-1]["to"] == m3["dataVersion"]
+    assert [c["from"] for c in m3["changes"]] == [m1["dataVersion"], m2["dataVersion"]]
+
+    by_id = {r["id"]: r for r in start}
+    for c in m3["changes"]:
+        with open(tmp_path / c["path"], "r", encoding="utf-8") as f:
+            by_id = apply(list(by_id.values()), json.load(f))
+    assert by_id == {r["id"]: r for r in view(tmp_path, m3)}
+    assert "deadline" not in by_id["job_0005"] and "job_0007" not in by_id
+
+    # An unchanged run keeps the manifest and its chain as they were
+    again = shards.write_shards(data([j for j in jobs if j["id"] != "job_0007"] + [job(20), job(21)]), str(tmp_path))
+    assert again["changes"] == m3["changes"]
+
+def test_chain_breaks_without_previous_shards(tmp_path):
+    m1 = shards.write_shards(data([job(1)]), str(tmp_path))
+    changes, feeds = shards.chain(m1, "other", [job(2)], lambda path: None)
+    assert (changes, feeds) == ([], {})
+
+def test_diff_records():
+    old = [job(1), job(2, posts=5)]
+    new = [job(2, posts=6), job(3)]
+    d = shards.diff_records(old, new)
+    assert d["removed"] == ["job_0001"]
+    assert [r["id"] for r in d["added"]] == ["job_0003"]
+    assert d["changed"] == {"job_0002": {"set": {"posts": 6}, "unset": []}}
+    assert shards.diff_records(old, [job(1), job(1)]) is None
+
+def test_one_record_change_keeps_other_shards(tmp_path):
+    jobs = [job(n) for n in range(40)]
+    before = shards.write_shards(data(jobs), str(tmp_path))["shards"]
+    assert all(s["count"] for s in before.values())
+    jobs[11]["title"] = "Recruitment 11 (date extended)"
+    after = shards.write_shards(data(jobs), str(tmp_path))["shards"]
+    touched = shards.SHARDS[shards.bucket("job_0011")]
+    assert [n for n in shards.SHARDS if after[n]["hash"] != before[n]["hash"]] == [touched]
+
+def test_feed_bridges_old_shard_layout(tmp_path):
+    jobs = [job(n) for n in range(6)]
+    read = shards.read_file(str(tmp_path))
+    (tmp_path / "shards").mkdir()
+    (tmp_path / "shards" / "primary.x.json").write_text(json.dumps(jobs[:4]))
+    (tmp_path / "shards" / "applied.x.json").write_text(json.dumps(jobs[4:]))
+    prev = {"dataVersion": "old", "shards": {"primary": {"path": "shards/primary.x.json"},
+                                             "applied": {"path": "shards/applied.x.json"}}}
+    changes, feeds = shards.chain(prev, "new", jobs[1:], read)
+    assert [c["removed"] for c in changes] == [1]
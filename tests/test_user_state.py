@@ -0,0 +1,82 @@
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from tools import user_sections
+from tools.user_sections import DirStore
+
+SECRET = "s" * 32
+OTHER = "o" * 32
+STATE = {"job_aaaa": {"action": "applied", "ts": "2026-10-01T00:00:00Z"}}
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    spec = importlib.util.spec_from_file_location("user_state_api", os.path.join(ROOT, "api", "user-state.py"))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    for k in ("CLOUDFLARE_KV_ACCOUNT_ID", "CLOUDFLARE_KV_NAMESPACE_ID", "CLOUDFLARE_KV_API_TOKEN"):
+        monkeypatch.setenv(k, "x")
+    store = DirStore(str(tmp_path / "users"))
+    monkeypatch.setattr(mod, "KVClient", lambda *a: store)
+    monkeypatch.setattr(mod, "INVITE", None)
+    monkeypatch.setattr(mod, "MIGRATION_SECRET", None)
+    mod.store = store
+    return mod
+
+def call(api, method, uid, secret, **body):
+    req = {"httpMethod": method, "headers": {"Authorization": f"Bearer {secret}"}}
+    if method == "POST":
+        req["body"] = json.dumps({"user": uid, "state": STATE, **body})
+    else:
+        req["queryStringParameters"] = {"user": uid}
+    r = api.handler(req)
+    return r["statusCode"], json.loads(r["body"])
+
+def test_first_save_claims_a_new_uid(api):
+    code, body = call(api, "POST", "u_abc", SECRET)
+    assert code == 200 and body["sections"]["applied"] == ["job_aaaa"]
+    assert call(api, "GET", "u_abc", SECRET)[0] == 200
+    assert call(api, "GET", "u_abc", OTHER) == (403, {"ok": False, "error": "forbidden"})
+    assert call(api, "POST", "u_abc", OTHER)[0] == 403
+    assert call(api, "POST", "u_short", "too-short")[0] == 403
+    assert call(api, "GET", "u_nobody", SECRET)[0] == 403  # reading never claims
+
+def test_invite_required_to_claim(api, monkeypatch):
+    monkeypatch.setattr(api, "INVITE", "let-me-in")
+    assert call(api, "POST", "u_abc", SECRET)[0] == 403
+    assert call(api, "POST", "u_abc", SECRET, invite="wrong")[0] == 403
+    assert call(api, "POST", "u_abc", SECRET, invite="let-me-in")[0] == 200
+    assert call(api, "POST", "u_abc", SECRET)[0] == 200  # owners need no invite after that
+
+def test_legacy_uid_needs_migration_secret(api, monkeypatch):
+    assert user_sections.import_legacy(api.store, STATE)
+    assert user_sections.unowned(api.store, user_sections.LEGACY_USER)
+    # No secret configured: nobody can take the imported marks over
+    assert call(api, "POST", "personal", SECRET) == (403, {"ok": False, "error": "claim_needs_secret"})
+    monkeypatch.setattr(api, "MIGRATION_SECRET", "move-them")
+    assert call(api, "POST", "personal", SECRET, migration="guess")[0] == 403
+    assert call(api, "POST", "personal", SECRET, migration="move-them")[0] == 200
+    assert not user_sections.unowned(api.store, "personal")
+    assert call(api, "POST", "personal", OTHER, migration="move-them") == (403, {"ok": False, "error": "forbidden"})
+
+def test_invite_also_adopts_legacy_marks(api, monkeypatch):
+    user_sections.import_legacy(api.store, STATE)
+    monkeypatch.setattr(api, "INVITE", "let-me-in")
+    assert call(api, "POST", "personal", SECRET, invite="let-me-in")[0] == 200
+
+def test_legacy_import_only_when_the_blob_changes(tmp_path):
+    store = DirStore(str(tmp_path))
+    assert user_sections.import_legacy(store, STATE)["applied"] == ["job_aaaa"]
+    # Marks saved per user since are not overwritten by the same blob
+    user_sections.save_state(store, "personal", {})
+    assert user_sections.import_legacy(store, STATE) is None
+    assert user_sections.load_sections(store, "personal")["applied"] == []
+    changed = {**STATE, "job_bbbb": {"action": "applied", "ts": "2026-10-02T00:00:00Z"}}
+    assert user_sections.import_legacy(store, changed)["applied"] == ["job_aaaa", "job_bbbb"]
+    assert user_sections.pinned_ids(user_sections.load_users(store)) == ["job_aaaa", "job_bbbb"]
+    assert user_sections.import_legacy(store, {}) is None
@@ -0,0 +1,25 @@
+import copy
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import search_index, view_model
+
+JOBS = [
+    {"id": "c", "title": "Zeta", "deadline": "N/A", "applyLink": "https://www.ssc.gov.in/c"},
+    {"id": "a", "title": "Alpha", "deadline": "2026-03-01", "applyLink": "https://bssc.bihar.gov.in/a"},
+    {"id": "b", "title": "Beta", "deadline": "15/01/2026", "detailLink": "http://ibps.in/b"},
+    {"id": "d", "title": "Eta", "applyLink": "ftp://x/d"},
+    {"id": "e", "title": "Gamma", "deadline": "2026-03-01"},
+]
+
+def test_order_without_stored_fields():
+    jobs = copy.deepcopy(JOBS)
+    view = view_model.build(jobs)
+    assert view == {"version": view_model.VIEW_VERSION, "order": ["b", "a", "e", "d", "c"]}
+    assert jobs == JOBS  # nothing derived is written back onto the records
+
+def test_org_facet_is_derived():
+    idx = search_index.build({"jobListings": copy.deepcopy(JOBS)})
+    assert idx["ids"] == ["b", "a", "e", "d", "c"]
+    assert idx["facets"]["org"] == {"bssc.bihar.gov.in": [1], "ibps.in": [0], "ssc.gov.in": [4]}
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# tools/archive.py — cold, append-only archive for jobs QC removes
+# Archived jobs no longer live in data.json. Each one is appended to a
+# monthly segment, archive/YYYY-MM.jsonl, one line per job:
+#   {"archivedAt": iso, "reason": flags.removed_reason, "record": job}
+# archive/rollup.json keeps what data.json reports without reading segments:
+#   months  -> {"YYYY-MM": {"count", "reasons": {reason: n}}}
+#   purged  -> {"count", "reasons"} of segments dropped by retention
+#   recent  -> the last RECENT_IDS archived job IDs, newest last
+# Retention (rules.json -> "archive" -> "retentionMonths") deletes whole
+# segments older than that many months; their counts move into "purged",
+# so the removal-reason rollup covers everything ever archived.
+# QC updates the rollup in memory (note, retain) and emit() writes it
+# (write, drop, save_rollup): segment lines first, so a crash can repeat a
+# line but never lose one.
+#
+#   python tools/archive.py                  # rollup summary
+#   python tools/archive.py --month YYYY-MM  # that month's archived records
+
+import os, sys, json
+from datetime import datetime, date
+
+ARCHIVE_DIR = "archive"
+ROLLUP = "rollup.json"
+ROLLUP_VERSION = 1
+RETENTION_MONTHS = 12
+RECENT_IDS = 50
+
+def config(rules):
+    cfg = (rules or {}).get("archive") or {}
+    return {
+        "retentionMonths": int(cfg.get("retentionMonths") or RETENTION_MONTHS),
+        "recentIds": int(cfg.get("recentIds") or RECENT_IDS),
+    }
+
+def reason_of(job):
+    return ((job.get("flags") or {}).get("removed_reason") or "unknown") if isinstance(job, dict) else "unknown"
+
+def _month(d):
+    return f"{d.year:04d}-{d.month:02d}"
+
+def _months_back(d, n):
+    y, m = divmod(d.year * 12 + d.month - 1 - n, 12)
+    return f"{y:04d}-{m + 1:02d}"
+
+def new_rollup():
+    return {"version": ROLLUP_VERSION, "months": {}, "purged": {"count": 0, "reasons": {}}, "recent": []}
+
+def load_rollup(base_dir="."):
+    try:
+        with open(os.path.join(base_dir, ARCHIVE_DIR, ROLLUP), "r", encoding="utf-8") as f:
+            r = json.load(f)
+        if isinstance(r, dict) and r.get("version") == ROLLUP_VERSION:
+            return r
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[WARN] {ARCHIVE_DIR}/{ROLLUP} unreadable: {e}, rebuilding from segments", file=sys.stderr)
+        return rebuild_rollup(base_dir)
+    return new_rollup()
+
+def save_rollup(rollup, base_dir="."):
+    os.makedirs(os.path.join(base_dir, ARCHIVE_DIR), exist_ok=True)
+    path = os.path.join(base_dir, ARCHIVE_DIR, ROLLUP)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(rollup, f, indent=2, ensure_ascii=False, sort_keys=True)
+    os.replace(temp_path, path)
+
+def _add(bucket, reason, n=1):
+    bucket["count"] = bucket.get("count", 0) + n
+    reasons = bucket.setdefault("reasons", {})
+    reasons[reason] = reasons.get(reason, 0) + n
+
+def segments(base_dir="."):
+    """Month names of the segments on disk, oldest first"""
+    d = os.path.join(base_dir, ARCHIVE_DIR)
+    if not os.path.isdir(d):
+        return []
+    return sorted(fn[:-6] for fn in os.listdir(d) if fn.endswith(".jsonl"))
+
+def iter_entries(base_dir=".", months=None):
+    """Archive lines, oldest segment first"""
+    for m in months or segments(base_dir):
+        try:
+            with open(os.path.join(base_dir, ARCHIVE_DIR, m + ".jsonl"), "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # half-written last line
+        except FileNotFoundError:
+            continue
+
+def iter_records(base_dir=".", months=None):
+    for e in iter_entries(base_dir, months):
+        if isinstance(e.get("record"), dict):
+            yield e["record"]
+
+def rebuild_rollup(base_dir=".", recent_ids=RECENT_IDS):
+    """Rollup recomputed from the segments on disk (purged counts are lost)"""
+    r = new_rollup()
+    for m in segments(base_dir):
+        for e in iter_entries(base_dir, [m]):
+            _add(r["months"].setdefault(m, {"count": 0, "reasons": {}}), e.get("reason") or "unknown")
+            jid = (e.get("record") or {}).get("id")
+            if jid:
+                r["recent"] = (r["recent"] + [jid])[-recent_ids:]
+    return r
+
+def note(rollup, jobs, now=None, recent_ids=RECENT_IDS):
+    """Count jobs archived at `now` into the rollup (in memory)"""
+    if not jobs:
+        return rollup
+    bucket = rollup["months"].setdefault(_month(now or datetime.utcnow()), {"count": 0, "reasons": {}})
+    for j in jobs:
+        _add(bucket, reason_of(j))
+        if isinstance(j, dict) and j.get("id"):
+            rollup["recent"].append(j["id"])
+    rollup["recent"] = rollup["recent"][-recent_ids:]
+    return rollup
+
+def retain(rollup, today=None, months=RETENTION_MONTHS):
+    """Move months older than the retention into "purged"; returns those months (segments to drop)"""
+    cutoff = _months_back(today or date.today(), months)
+    dropped = [m for m in sorted(rollup["months"]) if m < cutoff]
+    for m in dropped:
+        for reason, n in (rollup["months"].pop(m).get("reasons") or {}).items():
+            _add(rollup["purged"], reason, n)
+    return dropped
+
+def write(jobs, base_dir=".", now=None):
+    """Append jobs to the segment of the month they were archived in"""
+    if not jobs:
+        return
+    now = now or datetime.utcnow()
+    os.makedirs(os.path.join(base_dir, ARCHIVE_DIR), exist_ok=True)
+    stamp = now.isoformat() + "Z"
+    with open(os.path.join(base_dir, ARCHIVE_DIR, _month(now) + ".jsonl"), "a", encoding="utf-8") as f:
+        for j in jobs:
+            f.write(json.dumps({"archivedAt": stamp, "reason": reason_of(j), "record": j}, ensure_ascii=False) + "\n")
+
+def drop(months, base_dir="."):
+    for m in months:
+        try:
+            os.remove(os.path.join(base_dir, ARCHIVE_DIR, m + ".jsonl"))
+        except FileNotFoundError:
+            pass
+
+def summary(rollup, retention_months=RETENTION_MONTHS):
+    """What data.json carries instead of the archived records"""
+    reasons = dict(rollup["purged"].get("reasons") or {})
+    for b in rollup["months"].values():
+        for reason, n in (b.get("reasons") or {}).items():
+            reasons[reason] = reasons.get(reason, 0) + n
+    return {
+        "count": sum(reasons.values()),
+        "retained": sum(b.get("count", 0) for b in rollup["months"].values()),
+        "reasons": dict(sorted(reasons.items(), key=lambda kv: (-kv[1], kv[0]))),
+        "byMonth": {m: rollup["months"][m]["count"] for m in sorted(rollup["months"])},
+        "recentIds": list(rollup["recent"]),
+        "retentionMonths": retention_months,
+    }
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--month" in args:
+        m = args[args.index("--month") + 1]
+        for rec in iter_records(".", [m]):
+            print(json.dumps(rec, ensure_ascii=False))
+    else:
+        print(json.dumps(summary(load_rollup(".")), indent=2, ensure_ascii=False))
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# tools/canonical.py — canonical URL resolution so every stage agrees on job identity
+# canonical_id(url) is THE job ID. It hashes canonical_url(url), which is:
+#   1. rule-based: http->https, no www., no default port, no query/fragment,
+#      no trailing index.html/default.aspx or slash, lowercase
+#   2. then resolved through a persisted alias cache (redirects and
+#      <link rel=canonical>), filled lazily by fetches via record_response /
+#      record_canonical and written back with save(). Only same-host,
+#      non-root targets become aliases: a listing that redirects to the
+#      homepage, a login page on another host or an error page must not
+#      give many jobs one ID.
+
+import re, os, sys, json, hashlib
+from functools import lru_cache
+from urllib.parse import urlparse, urlunparse, urljoin
+
+CACHE_PATH = os.environ.get("CANONICAL_CACHE", "canonical_cache.json")
+CACHE_VERSION = 1
+MAX_HOPS = 5
+
+_SLASHES = re.compile(r"/{2,}")
+_INDEX_TAIL = re.compile(r"/(index|default)\.(html?|php|aspx?|jsp)$", re.I)
+_CANON_LINK = re.compile(r"<link\b[^>]*\brel\s*=\s*[\"']?canonical\b[^>]*>", re.I)
+_HREF = re.compile(r"\bhref\s*=\s*[\"']([^\"']+)[\"']", re.I)
+
+_state = {"aliases": None, "dirty": False, "path": CACHE_PATH}
+
+@lru_cache(maxsize=1 << 16)
+def rule_url(u):
+    """Rule-based canonical form (no cache lookups)"""
+    u = (u or "").strip()
+    if not u:
+        return ""
+    try:
+        p = urlparse(u)
+        scheme = (p.scheme or "").lower()
+        if scheme == "http":
+            scheme = "https"
+        host = (p.netloc or "").lower().rsplit("@", 1)[-1]
+        if (scheme == "https" and host.endswith(":443")) or host.endswith(":80"):
+            host = host.rsplit(":", 1)[0]
+        if host.startswith("www."):
+            host = host[4:]
+        path = _INDEX_TAIL.sub("", _SLASHES.sub("/", p.path or ""))
+        return urlunparse((scheme, host, path.rstrip("/"), "", "", "")).lower()
+    except Exception:
+        return u.rstrip("/").lower()
+
+def _aliases():
+    if _state["aliases"] is None:
+        aliases = {}
+        try:
+            with open(_state["path"], "r", encoding="utf-8") as f:
+                obj = json.load(f)
+            if isinstance(obj, dict) and obj.get("version") == CACHE_VERSION:
+                aliases = obj.get("aliases") or {}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[WARN] {_state['path']} unreadable: {e}, starting empty", file=sys.stderr)
+        _state["aliases"] = aliases
+    return _state["aliases"]
+
+def use_cache(path):
+    """Point the alias cache at another file (drops anything unsaved)"""
+    _state.update({"aliases": None, "dirty": False, "path": path})
+    _resolve.cache_clear()
+
+@lru_cache(maxsize=1 << 16)
+def _resolve(r):
+    aliases = _aliases()
+    hops = 0
+    while r in aliases and hops < MAX_HOPS:
+        r = aliases[r]
+        hops += 1
+    return r
+
+def canonical_url(u):
+    """Canonical URL used for dedup and IDs"""
+    return _resolve(rule_url(u))
+
+def canonical_id(url):
+    """Deterministic job ID shared by every stage"""
+    return f"job_{hashlib.sha1(canonical_url(url).encode()).hexdigest()[:12]}"
+
+def legacy_id(url):
+    """
+    The job ID before canonical_id(): sha1 of the URL without query, fragment
+    or trailing slash, lowercased. Only for carrying old IDs (and users'
+    marks on them) over to canonical_id(); never assigned to a job.
+    """
+    u = (url or "").strip()
+    try:
+        u = urlunparse(urlparse(u)._replace(query="", fragment=""))
+    except ValueError:
+        pass
+    return f"job_{hashlib.sha1(u.rstrip('/').lower().encode()).hexdigest()[:12]}"
+
+def canonical_url_many(urls):
+    memo = {}
+    return [memo[u] if u in memo else memo.setdefault(u, canonical_url(u)) for u in urls]
+
+def record_redirect(src, dst):
+    """Remember that src resolves to dst (HTTP redirect or canonical link)"""
+    if urlparse((src or "").strip()).query:
+        return False  # rule form drops the query, so the alias would cover sibling pages
+    a, b = rule_url(src), rule_url(dst)
+    if not a or not b or a == b:
+        return False
+    if _resolve(b) == a:
+        return False  # would create a loop
+    aliases = _aliases()
+    if aliases.get(a) == b:
+        return False
+    aliases[a] = b
+    _state["dirty"] = True
+    _resolve.cache_clear()
+    return True
+
+def trusted_target(src, dst):
+    """dst may stand for src: same host and not the site root"""
+    a, b = urlparse(rule_url(src)), urlparse(rule_url(dst))
+    return bool(b.netloc) and b.netloc == a.netloc and bool(b.path)
+
+def record_canonical(page_url, html):
+    """
+    Record <link rel=canonical> from a fetched page. Only same-host,
+    non-root targets are trusted (many sites point every page at /).
+    """
+    m = _CANON_LINK.search(html or "")
+    if not m:
+        return False
+    h = _HREF.search(m.group(0))
+    if not h:
+        return False
+    target = urljoin(page_url, h.group(1).strip())
+    if not trusted_target(page_url, target):
+        return False
+    return record_redirect(page_url, target)
+
+def record_response(requested_url, resp):
+    """Fill the cache from a requests/cloudscraper response"""
+    try:
+        final = getattr(resp, "url", None)
+        if not getattr(resp, "ok", True):
+            return  # an error page is not the job's canonical address
+        # Every hop of a 3xx chain has to stay on the host, and the end may not be "/"
+        hops = [getattr(h, "url", None) for h in getattr(resp, "history", None) or []] + [final]
+        if final and all(u and trusted_target(requested_url, u) for u in hops):
+            record_redirect(requested_url, final)
+        ctype = (getattr(resp, "headers", None) or {}).get("Content-Type", "")
+        if "html" in ctype.lower():
+            record_canonical(final or requested_url, resp.text[:200000])
+    except Exception as e:
+        print(f"[WARN] canonical cache update failed for {requested_url[:60]}: {e}", file=sys.stderr)
+
+def save():
+    """Persist the alias cache if anything was learned this run"""
+    if not _state["dirty"]:
+        return
+    path = _state["path"]
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "aliases": _aliases()}, f, indent=2, ensure_ascii=False, sort_keys=True)
+        os.replace(temp_path, path)
+        _state["dirty"] = False
+    except Exception as e:
+        print(f"[WARN] Writing {path}: {e}", file=sys.stderr)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# tools/core.py — shared normalisation used by every pipeline stage
+# One implementation of clean / dates / posts / fuzzy_title so collector,
+# schema_merge, qc_and_learn, qc_checks and pdf_parser agree. URLs and job IDs
+# live in tools/canonical.py. Hot paths are LRU-memoised.
+
+import re
+from datetime import datetime
+from functools import lru_cache
+
+CACHE_SIZE = 1 << 16
+# Longer strings (PDF/OCR text) are normalised without caching
+CACHE_MAX_LEN = 512
+
+_WS = re.compile(r"\s+")
+POSTS_PAT = re.compile(r"(\d{1,6})\s*(posts?|vacanc(?:y|ies)|seats?|पद|रिक्ति)", re.I)
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d %B %Y", "%d %b %Y")
+
+_FT_BRACKETS = re.compile(r"[\(\)\[\]\{\}]")
+_FT_PUNCT = re.compile(r"[^\w\s/:-]")
+_FT_NOTICE = re.compile(r"\b(notice|notification|advertisement|advt|recruitment|online\s*form|apply\s*online)\b")
+_FT_UPDATE = re.compile(r"\b(corrigendum|extension|extended|addendum|amendment|revised|rectified)\b")
+
+# ===== Whitespace =====
+
+def _clean(s):
+    return _WS.sub(" ", s.strip())
+
+_clean_cached = lru_cache(maxsize=CACHE_SIZE)(_clean)
+
+def clean(s):
+    """Collapse whitespace"""
+    s = s or ""
+    return _clean_cached(s) if len(s) <= CACHE_MAX_LEN else _clean(s)
+
+# ===== Dates =====
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_date(s):
+    for f in DATE_FORMATS:
+        try:
+            return datetime.strptime(s, f).date()
+        except ValueError:
+            pass
+    return None
+
+def parse_date_any(s):
+    """date for any supported format, None for blank/N/A/unparseable"""
+    s = (s or "").strip()
+    if not s or s.upper() == "N/A":
+        return None
+    return _parse_date(s)
+
+def norm_date(s):
+    """dd/mm/YYYY when parseable, the input as-is otherwise, N/A when blank"""
+    s = (s or "").strip()
+    d = parse_date_any(s)
+    if d:
+        return d.strftime("%d/%m/%Y")
+    return s if s else "N/A"
+
+def iso_date(s):
+    """YYYY-MM-DD when parseable, the input as-is otherwise, N/A when blank (stored deadlines)"""
+    s = (s or "").strip()
+    d = parse_date_any(s)
+    if d:
+        return d.isoformat()
+    return s if s else "N/A"
+
+# ===== Posts =====
+
+def _posts(txt):
+    m = POSTS_PAT.search(txt)
+    return int(m.group(1)) if m else None
+
+_posts_cached = lru_cache(maxsize=CACHE_SIZE)(_posts)
+
+def posts_from_text(txt):
+    """Number of posts mentioned in text ("1481 Posts", "25 vacancies"), or None"""
+    if not txt:
+        return None
+    return _posts_cached(txt) if len(txt) <= CACHE_MAX_LEN else _posts(txt)
+
+# ===== Titles =====
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _fuzzy_title(s):
+    s = s.lower()
+    s = _FT_BRACKETS.sub(" ", s)
+    s = _FT_PUNCT.sub(" ", s)
+    s = _FT_NOTICE.sub(" ", s)
+    s = _FT_UPDATE.sub(" ", s)
+    return _WS.sub(" ", s).strip()
+
+def fuzzy_title(s):
+    """Lowercased title without notice/update boilerplate, for dedup keys"""
+    return _fuzzy_title(s or "")
+
+def cache_info():
+    """Hit/miss counters per memoised function (for run summaries)"""
+    fns = {
+        "clean": _clean_cached,
+        "parse_date": _parse_date, "posts": _posts_cached, "fuzzy_title": _fuzzy_title,
+    }
+    return {k: f.cache_info()._asdict() for k, f in fns.items()}
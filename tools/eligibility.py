@@ -1,21 +1,29 @@
 #!/usr/bin/env python3
 # tools/eligibility.py v2025-11-03-FINAL
 # FIX C-003: Better Hindi detection + comprehensive eligibility
+#
+# The rule tables below are compiled once into one regex per check. Terms
+# match on word boundaries, so "ma" no longer fires inside "mahila" or "ai"
+# inside "air"; terms of STEM_MIN_LEN+ letters still match as word prefixes
+# ("engineer" -> "engineering"). Verdicts are LRU-cached per normalised title.
+# eligibility_golden.json documents where results differ from the old
+# substring matching:  python tools/eligibility.py --check-golden
 
-import re
+import re, os, sys, json
+from functools import lru_cache
 
 # Teacher positions
 TEACHER = {
-    "teacher", "tgt", "pgt", "prt", "faculty", "lecturer", 
+    "teacher", "tgt", "pgt", "prt", "faculty", "lecturer",
     "assistant professor", "professor", "b.ed", "b ed", "ctet", "tet",
     "teaching", "instructional"
 }
 
-# Tech/Engineering positions  
+# Tech/Engineering positions
 TECH = {
     "b.tech", "btech", "b tech", "b.e", "b e", "m.tech", "m tech", "m.e", "m e",
-    "mca", "bca", "engineer", "developer", "scientist", "architect", "analyst", 
-    "devops", "cloud", "ml", "ai", "ai/ml", "research", "nursing", "iti", 
+    "mca", "bca", "engineer", "developer", "scientist", "architect", "analyst",
+    "devops", "cloud", "ml", "ai", "ai/ml", "research", "nursing", "iti",
     "polytechnic", "diploma", "pharma", "pharmacy", "pharmacist"
 }
 
@@ -26,9 +34,55 @@ PG = {
     "msc", "m.sc", "m sc", "master"
 }
 
+# Specialty skills we filter out
+SKILLS = {
+    "steno", "stenographer", "shorthand",
+    "trade test", "welding", "plumbing", "carpentry",
+    "cad", "catia", "solidworks", "autocad",
+    "sap", "oracle", "ems", "tally", "tally erp",
+    "aws", "azure", "docker", "kubernetes", "jenkins"
+}
+
+# Domicile phrases (plain substrings, as before)
+DOMICILE_OPEN = [
+    "all india", "any state", "open to all", "pan india",
+    "indian citizens", "across india", "from any state",
+    "other state candidates", "outside state"
+]
+DOMICILE_LOCAL = ["domicile", "locals only", "local candidates", "state quota"]
+DOMICILE_BIHAR_LOCAL = ["domicile", "locals only", "local candidates"]
+
+# Alphabetic terms at least this long also match as word prefixes
+STEM_MIN_LEN = 5
+CACHE_SIZE = 1 << 15
+
+def _term(term):
+    p = re.escape(term)
+    if len(term) >= STEM_MIN_LEN and term.replace(" ", "").isalpha():
+        return p
+    return p + r"(?![a-z0-9])"
+
+def compile_terms(terms):
+    """One regex matching any term at a word start; longest alternatives first"""
+    alts = "|".join(_term(t) for t in sorted(terms, key=lambda t: (-len(t), t)))
+    return re.compile(r"(?<![a-z0-9])(?:" + alts + ")")
+
+def _any(phrases):
+    return re.compile("|".join(re.escape(p) for p in phrases))
+
+TEACHER_RE = compile_terms(TEACHER)
+TECH_RE = compile_terms(TECH)
+PG_RE = compile_terms(PG)
+SKILLS_RE = compile_terms(SKILLS)
+OPEN_RE = _any(DOMICILE_OPEN)
+LOCAL_RE = _any(DOMICILE_LOCAL)
+BIHAR_LOCAL_RE = _any(DOMICILE_BIHAR_LOCAL)
+
+_WS = re.compile(r"\s+")
+
 def clean(s):
     """Normalize whitespace"""
-    return re.sub(r"\s+", " ", (s or "").strip())
+    return _WS.sub(" ", (s or "").strip())
 
 def is_hindi_title(title):
     """
@@ -37,88 +91,115 @@ def is_hindi_title(title):
     """
     if not title or len(title) < 3:
         return False
-    
+
     devanagari_count = sum(1 for c in title if 0x0900 <= ord(c) <= 0x097F)
     total_chars = len(title)
-    
+
     devanagari_ratio = devanagari_count / total_chars if total_chars > 0 else 0
-    
+
     # Only reject if >70% is Devanagari (majority Hindi)
     return devanagari_ratio > 0.7
 
 def allow_skills(text):
     """Check if job requires specialty skills we filter out"""
-    t = (text or "").lower()
-    
-    blocked_skills = {
-        "steno", "stenographer", "shorthand",
-        "trade test", "welding", "plumbing", "carpentry",
-        "cad", "catia", "solidworks", "autocad",
-        "sap", "oracle", "ems", "tally", "tally erp",
-        "aws", "azure", "docker", "kubernetes", "jenkins"
-    }
-    
-    return not any(skill in t for skill in blocked_skills)
+    return not SKILLS_RE.search((text or "").lower())
 
 def allow_domicile(title):
     """
     Smart domicile check for Bihar/India jobs
     """
     t = (title or "").lower()
-    
+
     # Allow Bihar jobs without restriction
-    if "bihar" in t:
-        if "domicile" not in t and "locals only" not in t and "local candidates" not in t:
-            return True
-    
+    if "bihar" in t and not BIHAR_LOCAL_RE.search(t):
+        return True
+
     # Explicitly open to all India
-    if any(x in t for x in [
-        "all india", "any state", "open to all", "pan india",
-        "indian citizens", "across india", "from any state",
-        "other state candidates", "outside state"
-    ]):
+    if OPEN_RE.search(t):
         return True
-    
+
     # Restricted to locals and NOT Bihar = reject
-    if any(x in t for x in ["domicile", "locals only", "local candidates", "state quota"]):
-        if "bihar" not in t:
-            return False
-    
+    if LOCAL_RE.search(t) and "bihar" not in t:
+        return False
+
     # Default: allow (generic)
     return True
 
-def is_eligible(title):
-    """
-    Complete eligibility check combining all filters
-    Returns: (is_eligible: bool, reason: str)
-    """
-    if not title or len(title.strip()) < 3:
+@lru_cache(maxsize=CACHE_SIZE)
+def _verdict(title):
+    if len(title) < 3:
         return False, "Invalid_title"
-    
-    t = clean(title).lower()
-    
+
+    t = title.lower()
+
     # Check 1: Predominantly Hindi (>70% Devanagari)
     if is_hindi_title(title):
         return False, "Hindi_title"
-    
+
     # Check 2: Exclude Teacher positions
-    if any(k in t for k in TEACHER):
+    if TEACHER_RE.search(t):
         return False, "Teacher_position"
-    
+
     # Check 3: Exclude Tech/Engineering
-    if any(k in t for k in TECH):
+    if TECH_RE.search(t):
         return False, "Tech_position"
-    
+
     # Check 4: Exclude Postgraduate-only
-    if any(k in t for k in PG):
+    if PG_RE.search(t):
         return False, "Postgraduate_position"
-    
+
     # Check 5: Specialty skills
-    if not allow_skills(t):
+    if SKILLS_RE.search(t):
         return False, "Specialty_skills_required"
-    
+
     # Check 6: Domicile check
-    if not allow_domicile(title):
+    if not allow_domicile(t):
         return False, "Wrong_domicile"
-    
+
     return True, "Eligible"
+
+def is_eligible(title):
+    """
+    Complete eligibility check combining all filters
+    Returns: (is_eligible: bool, reason: str)
+    """
+    return _verdict(clean(title))
+
+def is_eligible_many(titles):
+    """is_eligible for a list of titles; each distinct normalised title is checked once"""
+    memo = {}
+    out = []
+    for title in titles:
+        key = clean(title)
+        if key not in memo:
+            memo[key] = _verdict(key)
+        out.append(memo[key])
+    return out
+
+def cache_info():
+    return _verdict.cache_info()._asdict()
+
+# ===== Golden file =====
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eligibility_golden.json")
+
+def check_golden(path=GOLDEN_PATH):
+    """Compare verdicts with the golden file; returns the mismatching cases"""
+    with open(path, "r", encoding="utf-8") as f:
+        cases = json.load(f)["cases"]
+    got = is_eligible_many([c["title"] for c in cases])
+    return [
+        {**c, "got": list(g)} for c, g in zip(cases, got)
+        if list(g) != c["expected"]
+    ]
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--check-golden"]:
+        bad = check_golden()
+        for c in bad:
+            print(f"MISMATCH {c['title']!r}: expected {c['expected']}, got {c['got']}")
+        print(f"{'FAIL' if bad else 'OK'}: {len(bad)} mismatches")
+        sys.exit(1 if bad else 0)
+    for line in sys.stdin:
+        ok, reason = is_eligible(line)
+        print(f"{'ELIGIBLE' if ok else 'REJECT'}\t{reason}\t{line.strip()}")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# tools/event_log.py — incremental consumer for the append-only JSONL logs
+# votes.jsonl / reports.jsonl / submissions.jsonl are only ever appended to.
+# We remember a byte offset plus a checksum of the bytes just before it per
+# file, read only what was appended since, and fold it into a compact
+# materialised state (logs_state.json):
+#   reports  -> tools/reports.py aggregate (per job ID and per canonical URL)
+#   submissions -> latest "missing" submission per canonical URL + official sites
+#   votes    -> per-job tallies
+# If a log shrinks or its checksum no longer matches (rewritten/rotated),
+# that log's section is rebuilt from byte 0.
+
+import os, sys, json, hashlib
+
+from tools.canonical import canonical_url
+from tools.reports import new_state as new_report_state, fold_report
+
+STATE_PATH = "logs_state.json"
+STATE_VERSION = 1
+TAIL_BYTES = 4096
+
+def _fold_vote(votes, ev):
+    jid = ev.get("jobId") or ""
+    vote = ev.get("vote") or ""
+    if not jid or not vote:
+        return
+    t = votes.setdefault(jid, {"right": 0, "wrong": 0})
+    if vote in ("right", "wrong"):
+        t[vote] += 1
+    elif vote in ("undo_right", "undo_wrong"):
+        k = vote[5:]
+        t[k] = max(0, t[k] - 1)
+    if ev.get("ts"):
+        t["ts"] = ev["ts"]
+
+def new_submission_state():
+    return {"missing": {}, "sites": []}
+
+def _fold_submission(subs, ev):
+    if ev.get("type") != "missing":
+        return
+    site = (ev.get("officialSite") or "").strip()
+    if site and site not in subs["sites"]:
+        subs["sites"].append(site)
+    cu = canonical_url((ev.get("url") or "").strip())
+    if not cu:
+        return
+    rec = subs["missing"].setdefault(cu, {"type": "missing"})
+    # Later non-empty values win per field
+    for k in ("title", "url", "officialSite", "lastDate", "deadline", "posts", "ts"):
+        v = ev.get(k)
+        if v not in (None, ""):
+            rec[k] = v
+
+# name -> (file, state section, empty section factory, fold(section, event))
+LOGS = {
+    "votes": ("votes.jsonl", "votes", dict, _fold_vote),
+    "reports": ("reports.jsonl", "reports", new_report_state, fold_report),
+    "submissions": ("submissions.jsonl", "submissions", new_submission_state, _fold_submission),
+}
+
+def new_state():
+    st = {"version": STATE_VERSION, "offsets": {}}
+    for _, section, factory, _ in LOGS.values():
+        st[section] = factory()
+    return st
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            st = json.load(f)
+        if isinstance(st, dict) and st.get("version") == STATE_VERSION:
+            base = new_state()
+            for k, v in base.items():
+                st.setdefault(k, v)
+            return st
+        print(f"[WARN] {path} has unknown version, replaying logs", file=sys.stderr)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[WARN] {path} unreadable: {e}, replaying logs", file=sys.stderr)
+    return new_state()
+
+def save_state(st, path=STATE_PATH):
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(st, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, path)
+    except Exception as e:
+        print(f"[WARN] Writing {path}: {e}", file=sys.stderr)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def _tail_sum(f, offset):
+    start = max(0, offset - TAIL_BYTES)
+    f.seek(start)
+    return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+def mark_valid(path, mark):
+    """False when the bytes before the stored offset are no longer what we consumed"""
+    offset = mark.get("offset") or 0
+    if not offset:
+        return True
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < offset:
+                return False
+            return _tail_sum(f, offset) == mark.get("tail")
+    except FileNotFoundError:
+        return False
+
+def read_new(path, mark):
+    """Yield events appended to path since mark ({"offset", "tail"}); updates mark in place"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        pos = mark.get("offset") or 0
+        f.seek(pos)
+        for raw in f:
+            line = raw.strip()
+            if line:
+                try:
+                    ev = json.loads(line.decode("utf-8"))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    if not raw.endswith(b"\n"):
+                        break  # half-written last line: pick it up next run
+                    print(f"[WARN] {path}: skipping bad line at byte {pos}", file=sys.stderr)
+                    ev = None
+                if isinstance(ev, dict):
+                    yield ev
+            pos += len(raw)
+        mark["offset"] = pos
+        mark["tail"] = _tail_sum(f, pos)
+
+def consume(st, base_dir="."):
+    """Fold every new log line into st; returns (and keeps as st["lastRead"]) {log name: events read}"""
+    counts = {}
+    for name, (fname, section, factory, fold) in LOGS.items():
+        path = os.path.join(base_dir, fname)
+        mark = st["offsets"].setdefault(fname, {"offset": 0, "tail": ""})
+        if not mark_valid(path, mark):
+            print(f"[WARN] {fname} was rewritten, rebuilding from the start", file=sys.stderr)
+            st[section] = factory()
+            mark.update({"offset": 0, "tail": ""})
+        n = 0
+        for ev in read_new(path, mark):
+            fold(st[section], ev)
+            n += 1
+        counts[name] = n
+    st["lastRead"] = counts
+    return counts
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# tools/job_store.py — SQLite store behind data.json: row-diffed saves, byte-identical export, indexed queries
+# Tables (one row per record, the record itself kept as JSON text in `doc`):
+#   jobs, archived  key, id, ord, canonical_url, deadline (ISO), source, doc
+#   updates         job_key, ord, title, link, capturedAt  (from jobs[].updates)
+#   sections        name, ord, job_id
+#   meta            top-level key order, transparencyInfo, other keys, export hash
+# schema_merge, QC and qc_checks read the document with load_data() and
+# write it with save_data(): one transaction that writes only the rows whose
+# doc or position changed (and their updates, and the sections whose ID list
+# changed), followed by an export of data.json that is byte-identical to
+# json.dumps(data, indent=2, ensure_ascii=False), so app.js is unaffected.
+# data.json is only read back when it no longer matches the last export
+# (edited by hand or by a workflow), and is then re-imported.
+# Those stages are whole-document passes (merge sorts, QC dedupes, screens
+# and archives every record), so they load every row; the indexed lookups
+# (get, find_by_url, deadline_between, by_source) serve the CLI below and
+# ad-hoc queries, not the stages.
+# jobs.db lives next to data.json (store_path()); JOB_STORE overrides the file
+# name, relative to that directory unless absolute.
+#
+#   python tools/job_store.py import [data.json]   # (re)build jobs.db
+#   python tools/job_store.py export [data.json]   # write data.json from jobs.db
+#   python tools/job_store.py url <url> | deadline <from> <to> | source <name>
+
+import os, sys, json, sqlite3, hashlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.core import parse_date_any
+from tools.canonical import canonical_url
+
+DB_PATH = os.environ.get("JOB_STORE", "jobs.db")  # file name, resolved by store_path()
+SCHEMA_VERSION = 1
+TABLES = {"jobListings": "jobs", "archivedListings": "archived"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY, id TEXT, ord INTEGER NOT NULL,
+    canonical_url TEXT, deadline TEXT, source TEXT, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS archived (
+    key TEXT PRIMARY KEY, id TEXT, ord INTEGER NOT NULL,
+    canonical_url TEXT, deadline TEXT, source TEXT, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS updates (
+    job_key TEXT NOT NULL, ord INTEGER NOT NULL, title TEXT, link TEXT, captured_at TEXT,
+    PRIMARY KEY (job_key, ord));
+CREATE TABLE IF NOT EXISTS sections (
+    name TEXT NOT NULL, ord INTEGER NOT NULL, job_id TEXT, PRIMARY KEY (name, ord));
+CREATE INDEX IF NOT EXISTS jobs_id ON jobs(id);
+CREATE INDEX IF NOT EXISTS jobs_url ON jobs(canonical_url);
+CREATE INDEX IF NOT EXISTS jobs_deadline ON jobs(deadline);
+CREATE INDEX IF NOT EXISTS jobs_source ON jobs(source);
+CREATE INDEX IF NOT EXISTS jobs_ord ON jobs(ord);
+CREATE INDEX IF NOT EXISTS archived_id ON archived(id);
+CREATE INDEX IF NOT EXISTS archived_url ON archived(canonical_url);
+CREATE INDEX IF NOT EXISTS archived_deadline ON archived(deadline);
+CREATE INDEX IF NOT EXISTS archived_source ON archived(source);
+CREATE INDEX IF NOT EXISTS archived_ord ON archived(ord);
+CREATE INDEX IF NOT EXISTS sections_job ON sections(job_id);
+"""
+
+def _dump(obj):
+    return json.dumps(obj, ensure_ascii=False)
+
+def _keys(records):
+    """Row keys: the record id, or a positional key for missing/duplicate ids"""
+    seen = set()
+    for n, rec in enumerate(records):
+        rid = rec.get("id") if isinstance(rec, dict) else None
+        k = rid if isinstance(rid, str) and rid and rid not in seen else f"~{n}"
+        seen.add(k)
+        yield k
+
+def _row(key, n, rec):
+    rec = rec if isinstance(rec, dict) else {}
+    d = parse_date_any(rec.get("deadline")) if isinstance(rec.get("deadline"), str) else None
+    return (key, rec.get("id"), n, canonical_url(rec.get("applyLink") or rec.get("detailLink")),
+            d.isoformat() if d else None, rec.get("source"))
+
+def store_path(json_path="data.json"):
+    """The store that backs json_path: DB_PATH in the same directory (or DB_PATH itself when absolute)"""
+    return os.path.join(os.path.dirname(os.path.abspath(json_path)), DB_PATH)
+
+class JobStore:
+    def __init__(self, path=None):
+        path = path or store_path()
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        if self.meta("schemaVersion", None, create=True) != SCHEMA_VERSION:
+            self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def reset(self):
+        with self.db:
+            for t in ("meta", "jobs", "archived", "updates", "sections"):
+                self.db.execute(f"DROP TABLE IF EXISTS {t}")
+            self.db.executescript(SCHEMA)
+            self._set_meta("schemaVersion", SCHEMA_VERSION)
+
+    def meta(self, k, default=None, create=False):
+        try:
+            row = self.db.execute("SELECT v FROM meta WHERE k=?", (k,)).fetchone()
+        except sqlite3.OperationalError:
+            if not create:
+                raise
+            return None
+        return json.loads(row["v"]) if row else default
+
+    def _set_meta(self, k, v):
+        self.db.execute("INSERT INTO meta(k, v) VALUES(?, ?) ON CONFLICT(k) DO UPDATE SET v=excluded.v", (k, _dump(v)))
+
+    # ===== Writes =====
+
+    def _upsert_records(self, table, records):
+        """Write only the rows whose doc or position changed, delete the rest; updates follow their job"""
+        keys = list(_keys(records))
+        stored = {r["key"]: (r["ord"], r["doc"]) for r in self.db.execute(f"SELECT key, ord, doc FROM {table}")}
+        rows = []
+        for n, (k, rec) in enumerate(zip(keys, records)):
+            doc = _dump(rec)
+            if stored.get(k) != (n, doc):
+                rows.append((_row(k, n, rec) + (doc,), rec))
+        gone = set(stored) - set(keys)
+        self.db.executemany(
+            f"""INSERT INTO {table}(key, id, ord, canonical_url, deadline, source, doc) VALUES(?,?,?,?,?,?,?)
+                ON CONFLICT(key) DO UPDATE SET id=excluded.id, ord=excluded.ord,
+                    canonical_url=excluded.canonical_url, deadline=excluded.deadline,
+                    source=excluded.source, doc=excluded.doc""",
+            (row for row, _ in rows))
+        self.db.executemany(f"DELETE FROM {table} WHERE key=?", ((k,) for k in gone))
+        if table == "jobs":
+            self.db.executemany("DELETE FROM updates WHERE job_key=?",
+                                [(row[0],) for row, _ in rows] + [(k,) for k in gone])
+            self.db.executemany(
+                "INSERT INTO updates(job_key, ord, title, link, captured_at) VALUES(?,?,?,?,?)",
+                ((row[0], m, u.get("title"), u.get("link"), u.get("capturedAt"))
+                 for row, rec in rows if isinstance(rec, dict)
+                 for m, u in enumerate(rec.get("updates") or []) if isinstance(u, dict)))
+        return {"rows": len(keys), "changed": len(rows), "deleted": len(gone)}
+
+    def _save_sections(self, sections):
+        """Rewrite only the sections whose ID list changed; returns how many"""
+        stored = self.sections()
+        changed = [name for name in set(stored) | set(sections) if stored.get(name) != (sections.get(name) or [])]
+        for name in changed:
+            self.db.execute("DELETE FROM sections WHERE name=?", (name,))
+            self.db.executemany("INSERT INTO sections(name, ord, job_id) VALUES(?,?,?)",
+                                ((name, n, jid) for n, jid in enumerate(sections.get(name) or [])))
+        return len(changed)
+
+    def save(self, data):
+        """Bring the stored document up to data in one transaction; returns per-table row stats"""
+        stats = {}
+        with self.db:
+            for key, table in TABLES.items():
+                stats[table] = self._upsert_records(table, data.get(key) or [])
+            stats["sections"] = self._save_sections(data.get("sections") or {})
+            self._set_meta("keys", list(data.keys()))
+            self._set_meta("sectionKeys", list((data.get("sections") or {}).keys()))
+            self._set_meta("present", {k: k in data and data[k] is not None for k in list(TABLES) + ["sections"]})
+            self._set_meta("other", {k: v for k, v in data.items() if k not in TABLES and k != "sections"})
+        return stats
+
+    # ===== Reads =====
+
+    def _docs(self, table, where="", args=()):
+        return [json.loads(r["doc"]) for r in self.db.execute(f"SELECT doc FROM {table} {where} ORDER BY ord", args)]
+
+    def sections(self):
+        out = {name: [] for name in self.meta("sectionKeys", [])}
+        for r in self.db.execute("SELECT name, job_id FROM sections ORDER BY name, ord"):
+            out.setdefault(r["name"], []).append(r["job_id"])
+        return out
+
+    def _value(self, key):
+        present = self.meta("present", {})
+        if key in TABLES:
+            return self._docs(TABLES[key]) if present.get(key, True) else None
+        if key == "sections":
+            return self.sections() if present.get(key, True) else None
+        return self.meta("other", {}).get(key)
+
+    def items(self):
+        """(key, value) pairs of the stored document, in data.json key order"""
+        for key in self.meta("keys", []):
+            yield key, self._value(key)
+
+    def load(self):
+        return dict(self.items())
+
+    def get(self, job_id, table="jobs"):
+        r = self.db.execute(f"SELECT doc FROM {table} WHERE id=? ORDER BY ord LIMIT 1", (job_id,)).fetchone()
+        return json.loads(r["doc"]) if r else None
+
+    def find_by_url(self, url, table="jobs"):
+        return self._docs(table, "WHERE canonical_url=?", (canonical_url(url),))
+
+    def deadline_between(self, start, end, table="jobs"):
+        """Records whose deadline (date or ISO string) falls in [start, end]"""
+        return self._docs(table, "WHERE deadline BETWEEN ? AND ?", (str(start), str(end)))
+
+    def by_source(self, source, table="jobs"):
+        return self._docs(table, "WHERE source=?", (source,))
+
+    def updates_for(self, job_id):
+        return [dict(r) for r in self.db.execute(
+            "SELECT u.title, u.link, u.captured_at FROM updates u JOIN jobs j ON j.key=u.job_key "
+            "WHERE j.id=? ORDER BY u.ord", (job_id,))]
+
+    # ===== data.json export =====
+
+    def export(self, out_path):
+        """
+        Write data.json from the store, one record at a time. Output is
+        byte-identical to json.dumps(data, indent=2, ensure_ascii=False).
+        Returns the sha1 of what was written.
+        """
+        def dump(obj, pad):
+            return json.dumps(obj, indent=2, ensure_ascii=False).replace("\n", "\n" + pad)
+
+        h = hashlib.sha1()
+        temp_path = out_path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                def w(s):
+                    f.write(s)
+                    h.update(s.encode("utf-8"))
+                keys = self.meta("keys", [])
+                present = self.meta("present", {})
+                if not keys:
+                    w("{}")
+                else:
+                    w("{")
+                    for n, key in enumerate(keys):
+                        w(("," if n else "") + "\n  " + json.dumps(key, ensure_ascii=False) + ": ")
+                        table = TABLES.get(key)
+                        first = None
+                        if table and present.get(key, True):
+                            rows = self.db.execute(f"SELECT doc FROM {table} ORDER BY ord")
+                            first = rows.fetchone()
+                        if first is not None:
+                            w("[")
+                            for m, r in enumerate(_chain(first, rows)):
+                                w(("," if m else "") + "\n    " + dump(json.loads(r["doc"]), "    "))
+                            w("\n  ]")
+                        else:
+                            w(dump(self._value(key), "  "))
+                    w("\n}")
+            os.replace(temp_path, out_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        digest = h.hexdigest()
+        with self.db:
+            self._set_meta("exportSha1", digest)
+        return digest
+
+def _chain(first, rows):
+    yield first
+    yield from rows
+
+def _file_sha1(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def load_data(json_path="data.json", db_path=None, default=None, strict=False):
+    """
+    data.json contents via the store. The store is used as-is when data.json
+    is still its last export; otherwise data.json is (re)imported. Unreadable
+    input gives default, or raises when strict.
+    """
+    db_path = db_path or store_path(json_path)
+    current = _file_sha1(json_path)
+    try:
+        with JobStore(db_path) as store:
+            if current is not None and store.meta("exportSha1") == current:
+                return store.load()
+            if current is None:
+                return default if default is not None else {}
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                store.save(data)
+                with store.db:
+                    store._set_meta("exportSha1", current)
+            return data
+    except (json.JSONDecodeError, sqlite3.DatabaseError) as e:
+        if strict:
+            raise
+        print(f"[WARN] {json_path} / {db_path} unreadable: {e}, using default", file=sys.stderr)
+        return default if default is not None else {}
+
+def save_data(data, json_path="data.json", db_path=None):
+    """Write data's changed rows to the store and export data.json; returns the per-table row stats"""
+    with JobStore(db_path or store_path(json_path)) as store:
+        stats = store.save(data)
+        store.export(json_path)
+    return stats
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    cmd = args[0] if args else ""
+    path = args[1] if cmd in ("import", "export") and len(args) > 1 else "data.json"
+    with JobStore(store_path(path)) as store:
+        if cmd == "import":
+            with open(path, "r", encoding="utf-8") as f:
+                print(json.dumps(store.save(json.load(f))))
+            with store.db:
+                store._set_meta("exportSha1", _file_sha1(path))
+        elif cmd == "export":
+            print(store.export(path))
+        elif cmd == "url" and len(args) == 2:
+            print(json.dumps(store.find_by_url(args[1]), ensure_ascii=False, indent=2))
+        elif cmd == "deadline" and len(args) == 3:
+            print(json.dumps(store.deadline_between(args[1], args[2]), ensure_ascii=False, indent=2))
+        elif cmd == "source" and len(args) == 2:
+            print(json.dumps(store.by_source(args[1]), ensure_ascii=False, indent=2))
+        else:
+            print("Usage: python tools/job_store.py import|export [data.json] | url <url> | deadline <from> <to> | source <name>")
+            sys.exit(2)
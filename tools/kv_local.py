@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# tools/kv_local.py — local stand-in for the Workers KV REST API
+# Serves GET / PUT / DELETE on
+#   /client/v4/accounts/<account>/storage/kv/namespaces/<namespace>/values/<key>
+# (a multipart PUT with "value" and "metadata" fields stores key metadata,
+# read back with GET .../metadata/<key>) and the key listing
+# GET .../namespaces/<namespace>/keys?prefix=&cursor=&limit=
+# from a directory (one file per namespace and URL-quoted key), with the
+# status codes the real API uses (200, 404, 401 without a bearer token, 413
+# over the value size limit). --fail N answers every Nth request with a 503,
+# to exercise the publisher's retries. Point tools/kv_publish.py (and
+# api/scrape-jobs.py) at it with KV_API_BASE=http://127.0.0.1:<port>/client/v4.
+#
+#   python tools/kv_local.py [--port 8788] [--dir tmp/kv] [--fail N]
+
+import os, sys, json, argparse, threading
+from email import policy
+from email.parser import BytesParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import quote, unquote, urlparse, parse_qs
+
+VALUE_LIMIT = 25 * 1024 * 1024
+PREFIX = "/client/v4/accounts/"
+
+class KVHandler(BaseHTTPRequestHandler):
+    server_version = "kv-local/1"
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _reply(self, code, body=b"", content_type="application/json"):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, code, message):
+        self._reply(code, json.dumps({"success": False, "errors": [{"code": code, "message": message}]}).encode())
+
+    def _path(self):
+        """File for the requested key, or None (after replying) when the request is refused"""
+        with self.server.lock:
+            self.server.requests += 1
+            n = self.server.requests
+        if self.server.fail and n % self.server.fail == 0:
+            self._error(503, "injected failure")
+            return None
+        if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+            self._error(401, "Authentication error")
+            return None
+        parts = self.path.split("?", 1)[0]
+        if not parts.startswith(PREFIX):
+            self._error(404, "not found")
+            return None
+        bits = parts[len(PREFIX):].split("/", 5)  # account/storage/kv/namespaces/ns/values/key
+        if len(bits) == 6 and bits[5] == "keys" and self.command == "GET":
+            d = os.path.join(self.server.root, quote(bits[4], safe=""))
+            os.makedirs(d, exist_ok=True)
+            return ("keys", d)
+        kind = bits[5].split("/", 1)[0] if len(bits) == 6 else None
+        if bits[1:3] != ["storage", "kv"] or bits[3] != "namespaces" or kind not in ("values", "metadata") \
+                or (kind == "metadata" and self.command != "GET"):
+            self._error(404, "not found")
+            return None
+        ns, key = bits[4], unquote(bits[5][len(kind) + 1:])
+        if not key:
+            self._error(400, "missing key")
+            return None
+        d = os.path.join(self.server.root, quote(ns, safe=""))
+        os.makedirs(d, exist_ok=True)
+        path = os.path.join(d, quote(key, safe=""))
+        return ("metadata", path) if kind == "metadata" else path
+
+    @staticmethod
+    def _meta_path(path):
+        """Sidecar holding a key's metadata (outside the namespace directory, so never listed)"""
+        d, name = os.path.split(path)
+        os.makedirs(d + ".metadata", exist_ok=True)
+        return os.path.join(d + ".metadata", name)
+
+    def _list(self, d):
+        q = parse_qs(urlparse(self.path).query)
+        prefix = (q.get("prefix") or [""])[0]
+        limit = int((q.get("limit") or ["1000"])[0])
+        start = int((q.get("cursor") or ["0"])[0] or 0)
+        names = sorted(n for n in (unquote(f) for f in os.listdir(d) if not f.endswith(".tmp")) if n.startswith(prefix))
+        page = names[start:start + limit]
+        cursor = str(start + limit) if start + limit < len(names) else ""
+        self._reply(200, json.dumps({"success": True, "errors": [], "result": [{"name": n} for n in page],
+                                     "result_info": {"count": len(page), "cursor": cursor}}).encode())
+
+    def do_GET(self):
+        path = self._path()
+        if path is None:
+            return
+        if isinstance(path, tuple) and path[0] == "keys":
+            return self._list(path[1])
+        if isinstance(path, tuple):
+            try:
+                with open(self._meta_path(path[1]), "rb") as f:
+                    meta = json.loads(f.read())
+            except FileNotFoundError:
+                return self._error(404, "key not found")
+            return self._reply(200, json.dumps({"success": True, "errors": [], "result": meta}).encode())
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+        except FileNotFoundError:
+            return self._error(404, "key not found")
+        self._reply(200, blob, "application/octet-stream")
+
+    def do_PUT(self):
+        path = self._path()
+        n = int(self.headers.get("Content-Length") or 0)
+        blob = self.rfile.read(n)  # read even when refused, so the connection stays usable
+        if path is None:
+            return
+        meta = None
+        ctype = self.headers.get("Content-Type") or ""
+        if ctype.startswith("multipart/form-data"):
+            msg = BytesParser(policy=policy.default).parsebytes(b"Content-Type: " + ctype.encode() + b"\r\n\r\n" + blob)
+            fields = {part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+                      for part in msg.iter_parts()}
+            blob, meta = fields.get("value") or b"", fields.get("metadata")
+        if len(blob) > VALUE_LIMIT:
+            return self._error(413, "value too large")
+        for p, b in ((path, blob), (self._meta_path(path), meta)):
+            if b is None:
+                if os.path.exists(p):
+                    os.remove(p)
+                continue
+            temp_path = p + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(b)
+            os.replace(temp_path, p)
+        self._reply(200, json.dumps({"success": True, "errors": [], "messages": [], "result": None}).encode())
+
+    def do_DELETE(self):
+        path = self._path()
+        if path is None:
+            return
+        for p in (path, self._meta_path(path)):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+        self._reply(200, json.dumps({"success": True, "errors": [], "messages": [], "result": None}).encode())
+
+def serve(port=8788, root="tmp/kv", fail=0, verbose=False):
+    """Start the stand-in in a background thread; returns the server (server.shutdown() stops it)"""
+    os.makedirs(root, exist_ok=True)
+    srv = ThreadingHTTPServer(("127.0.0.1", port), KVHandler)
+    srv.root, srv.fail, srv.verbose = root, fail, verbose
+    srv.requests, srv.lock = 0, threading.Lock()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Local stand-in for the Workers KV REST API")
+    ap.add_argument("--port", type=int, default=8788)
+    ap.add_argument("--dir", default="tmp/kv")
+    ap.add_argument("--fail", type=int, default=0, help="answer every Nth request with 503")
+    args = ap.parse_args()
+    srv = serve(args.port, args.dir, args.fail, verbose=True)
+    print(f"[KV] http://127.0.0.1:{srv.server_address[1]}/client/v4 -> {args.dir}", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()
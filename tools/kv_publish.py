@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# tools/kv_publish.py — hash-gated uploads to Cloudflare Workers KV
+# Publisher.put(key, blob) uploads a value only when its sha1 differs from the
+# one recorded for that key in the "data.meta" KV key:
+#   {"version", "keys": {key: {"sha1", "bytes", "stored", "encoding", "parts", "variants", "at"}}}
+# The Worker and app.js read keys directly, so a value is stored as-is under
+# its key whenever it fits (up to TRANSFORM_OVER, just under VALUE_LIMIT).
+# Only a value past that is gzip-compressed (encoding "gzip") and stored under
+# key.gz instead, split into key.gz.part0..N-1 when still over PART_BYTES; the
+# plain key is then absent, never holding compressed bytes or a pointer, and
+# only read() (through data.meta) reassembles it. put(..., precompressed=True)
+# also uploads key.gz / key.br (tools/publish.compress) with KV metadata
+# {"contentEncoding", "contentType"}, so the Worker can answer a request whose
+# Accept-Encoding allows it with those bytes and that Content-Encoding
+# (data.meta lists them under "variants"). prune() deletes the keys
+# under a prefix that the caller no longer references (superseded shards and
+# change feeds) and drops them from data.meta. finish() writes data.meta back
+# once, when anything changed.
+# Every request is retried on connection errors, 429 and 5xx with exponential
+# backoff (RETRIES attempts, BACKOFF seconds doubling, Retry-After honoured).
+# KV_API_BASE points the client at another KV REST endpoint, e.g. the local
+# stand-in in tools/kv_local.py, so the publish path can be exercised offline.
+#
+#   python tools/kv_publish.py <file> [key]   # upload one file (CLOUDFLARE_KV_* env)
+
+import os, sys, json, gzip, time, hashlib
+from datetime import datetime
+from urllib.parse import quote
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import publish
+
+API_BASE = os.environ.get("KV_API_BASE", "https://api.cloudflare.com/client/v4")
+META_KEY = "data.meta"
+META_VERSION = 2  # 2: transformed values moved off the plain key (key.gz)
+VALUE_LIMIT = 25 * 1024 * 1024  # Workers KV maximum value size
+TRANSFORM_OVER = VALUE_LIMIT - 1024 * 1024  # store values up to this as-is, gzip the rest under key.gz
+VARIANTS = {"gzip": ".gz", "br": ".br"}  # precompressed siblings: encoding -> key suffix
+PART_BYTES = 20 * 1024 * 1024  # split compressed values bigger than this (headroom under VALUE_LIMIT)
+RETRIES = 4
+BACKOFF = 0.5  # seconds before the first retry, doubled each time
+TIMEOUT = 30
+
+class KVError(Exception):
+    pass
+
+def sha1(blob):
+    return hashlib.sha1(blob).hexdigest()
+
+class KVClient:
+    """Workers KV REST API (values/<key>, keys listing) with retries"""
+
+    def __init__(self, account, namespace, token, base=None, session=None):
+        ns_url = f"{(base or API_BASE).rstrip('/')}/accounts/{account}/storage/kv/namespaces/{namespace}"
+        self.url = ns_url + "/values/"
+        self.keys_url = ns_url + "/keys"
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.http = session or requests.Session()
+        self.retried = 0
+
+    def _request(self, method, key, headers=None, url=None, **kw):
+        delay = BACKOFF
+        headers = {**self.headers, **(headers or {})}
+        url = url or self.url + quote(key, safe="")
+        for attempt in range(RETRIES + 1):
+            try:
+                r = self.http.request(method, url, headers=headers, timeout=TIMEOUT, **kw)
+                if r.status_code != 429 and r.status_code < 500:
+                    return r
+                err = f"HTTP {r.status_code}"
+                wait = float(r.headers.get("Retry-After") or delay)
+            except requests.RequestException as e:
+                err, wait = str(e), delay
+            if attempt == RETRIES:
+                raise KVError(f"{method} {key}: {err} after {RETRIES + 1} attempts")
+            self.retried += 1
+            print(f"[WARN] KV {method} {key}: {err}, retrying in {wait:.1f}s", file=sys.stderr)
+            time.sleep(wait)
+            delay *= 2
+
+    def get(self, key):
+        """Value bytes, or None when the key does not exist"""
+        r = self._request("GET", key)
+        if r.status_code == 404:
+            return None
+        if not r.ok:
+            raise KVError(f"GET {key}: HTTP {r.status_code} {r.text[:200]}")
+        return r.content
+
+    def put(self, key, blob, content_type="application/json", metadata=None):
+        """Write a value; metadata (a small dict, e.g. {"contentEncoding": "gzip"}) goes up as KV key metadata"""
+        if metadata is None:
+            r = self._request("PUT", key, data=blob, headers={"Content-Type": content_type})
+        else:
+            r = self._request("PUT", key, files={"value": (None, blob, content_type)},
+                              data={"metadata": json.dumps(metadata, sort_keys=True)})
+        if not r.ok:
+            raise KVError(f"PUT {key}: HTTP {r.status_code} {r.text[:200]}")
+
+    def list(self, prefix=""):
+        """Every key name starting with prefix (follows the listing cursor)"""
+        names, cursor = [], ""
+        while True:
+            params = {"prefix": prefix, "limit": 1000, **({"cursor": cursor} if cursor else {})}
+            r = self._request("GET", f"keys?prefix={prefix}", url=self.keys_url, params=params)
+            if not r.ok:
+                raise KVError(f"list {prefix}: HTTP {r.status_code} {r.text[:200]}")
+            body = r.json()
+            names += [k["name"] for k in body.get("result") or []]
+            cursor = (body.get("result_info") or {}).get("cursor")
+            if not cursor:
+                return names
+
+    def delete(self, key):
+        r = self._request("DELETE", key)
+        if not r.ok and r.status_code != 404:
+            raise KVError(f"DELETE {key}: HTTP {r.status_code} {r.text[:200]}")
+
+def encode(blob):
+    """(stored parts, encoding) for a value: itself, or gzip-compressed and split when too big"""
+    if len(blob) <= TRANSFORM_OVER:
+        return [blob], None
+    blob = gzip.compress(blob, compresslevel=9, mtime=0)
+    if len(blob) <= PART_BYTES:
+        return [blob], "gzip"
+    return [blob[i:i + PART_BYTES] for i in range(0, len(blob), PART_BYTES)], "gzip"
+
+def stored_keys(key, entry):
+    """The KV keys holding key's value, for its data.meta entry"""
+    if not entry.get("encoding"):
+        return [key]
+    if not entry.get("parts"):
+        return [f"{key}.gz"]
+    return [f"{key}.gz.part{n}" for n in range(entry["parts"])]
+
+def all_keys(key, entry):
+    """stored_keys() plus the precompressed variants (key.gz, key.br) put() uploaded"""
+    names = stored_keys(key, entry)
+    return names + [key + VARIANTS[enc] for enc in entry.get("variants") or [] if key + VARIANTS[enc] not in names]
+
+class Publisher:
+    """Uploads through a KVClient, skipping values data.meta says KV already has"""
+
+    def __init__(self, client, meta_key=META_KEY):
+        self.kv = client
+        self.meta_key = meta_key
+        self.meta = None
+        self.dirty = False
+        self.stats = {"uploaded": 0, "skipped": 0, "deleted": 0, "bytes": 0}
+
+    def _load(self):
+        if self.meta is None:
+            meta = None
+            try:
+                raw = self.kv.get(self.meta_key)
+                meta = json.loads(raw) if raw else None
+            except ValueError as e:
+                print(f"[WARN] KV {self.meta_key} unreadable: {e}, re-uploading everything", file=sys.stderr)
+            self.meta = meta if isinstance(meta, dict) and meta.get("version") == META_VERSION else {"version": META_VERSION, "keys": {}}
+        return self.meta["keys"]
+
+    def put(self, key, blob, hash_of=None, content_type="application/json", precompressed=False):
+        """
+        Upload blob under key unless KV already holds the same content; hash_of
+        (bytes) is what the gate compares instead of blob, for values with
+        fields that change on every run. With precompressed, key.gz and key.br
+        go up alongside, carrying their Content-Encoding as KV metadata.
+        Returns True when it uploaded.
+        """
+        keys = self._load()
+        h = sha1(blob if hash_of is None else hash_of)
+        prev = keys.get(key) or {}
+        want = sorted(publish.ENCODINGS) if precompressed and len(blob) <= TRANSFORM_OVER else []
+        if prev.get("sha1") == h and (prev.get("variants") or []) == want:
+            self.stats["skipped"] += 1
+            return False
+        parts, encoding = encode(blob)
+        entry = {"sha1": h, "bytes": len(blob), "stored": sum(len(p) for p in parts), "encoding": encoding,
+                 "parts": len(parts) if len(parts) > 1 else 0, "variants": want, "at": datetime.utcnow().isoformat() + "Z"}
+        for enc, packed in (publish.compress(blob) if want else {}).items():
+            if packed is not None:
+                self.kv.put(key + VARIANTS[enc], packed, content_type, {"contentEncoding": enc, "contentType": content_type})
+                entry["stored"] += len(packed)
+        names = stored_keys(key, entry)
+        meta = {"contentEncoding": encoding, "contentType": content_type} if encoding and len(parts) == 1 else None
+        for name, part in zip(names, parts):
+            self.kv.put(name, part, content_type if encoding is None else "application/octet-stream", meta)
+        stale = set(all_keys(key, prev)) - set(all_keys(key, entry)) if prev else set()
+        for name in sorted(stale):
+            self.kv.delete(name)
+        keys[key] = entry
+        self.dirty = True
+        self.stats["uploaded"] += 1
+        self.stats["bytes"] += keys[key]["stored"]
+        return True
+
+    def put_json(self, key, obj, volatile=(), precompressed=False):
+        """put() for a JSON object (minified); top-level volatile keys are left out of the hash"""
+        blob = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        gate = None
+        if volatile:
+            gate = json.dumps({k: v for k, v in obj.items() if k not in volatile},
+                              ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        return self.put(key, blob, hash_of=gate, precompressed=precompressed)
+
+    def has(self, key):
+        return key in self._load()
+
+    def prune(self, prefixes, keep):
+        """Delete the keys under prefixes that are not in keep (and their data.meta entries); returns how many"""
+        keys = self._load()
+        gone = [k for k in keys if k.startswith(tuple(prefixes)) and k not in keep]
+        for key in gone:
+            for name in all_keys(key, keys[key]):
+                self.kv.delete(name)
+            del keys[key]
+        if gone:
+            self.dirty = True
+            self.stats["deleted"] += len(gone)
+        return len(gone)
+
+    def finish(self):
+        """Write data.meta if anything was uploaded; returns the upload stats"""
+        if self.dirty:
+            self.kv.put(self.meta_key, json.dumps(self.meta, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+            self.dirty = False
+        return {**self.stats, "retries": self.kv.retried}
+
+def read(client, key, meta_key=META_KEY):
+    """A value as it was given to put(), reassembled and decompressed using data.meta"""
+    raw = client.get(meta_key)
+    entry = ((json.loads(raw) if raw else {}).get("keys") or {}).get(key) or {}
+    names = stored_keys(key, entry)
+    blobs = [client.get(name) for name in names]
+    if any(b is None for b in blobs):
+        return None
+    blob = b"".join(blobs)
+    return gzip.decompress(blob) if entry.get("encoding") == "gzip" else blob
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python tools/kv_publish.py <file> [key]", file=sys.stderr)
+        sys.exit(2)
+    path = sys.argv[1]
+    key = sys.argv[2] if len(sys.argv) > 2 else os.path.basename(path)
+    env = [os.environ.get(k) for k in ("CLOUDFLARE_KV_ACCOUNT_ID", "CLOUDFLARE_KV_NAMESPACE_ID", "CLOUDFLARE_KV_API_TOKEN")]
+    if not all(env):
+        print("[ERROR] CLOUDFLARE_KV_ACCOUNT_ID, CLOUDFLARE_KV_NAMESPACE_ID and CLOUDFLARE_KV_API_TOKEN are required", file=sys.stderr)
+        sys.exit(2)
+    pub = Publisher(KVClient(*env))
+    with open(path, "rb") as f:
+        uploaded = pub.put(key, f.read())
+    print(json.dumps({"key": key, "uploaded": uploaded, **pub.finish()}))
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# tools/near_dup.py — MinHash/LSH near-duplicate clustering for job titles
+# Catches aggregator vs official variants that exact keys miss, e.g.
+#   "SSC CGL Recruitment 2025 – Apply Online" ~ "Combined Graduate Level Examination 2025"
+# Candidate pairs come from LSH band collisions plus (org, deadline) and
+# (org, year) blocking keys, so clustering stays roughly linear in N.
+# Org, deadline and year only block and veto: the score is title similarity
+# alone, since one commission posts many different vacancies on one day
+# ("Asst Prof Chemistry" vs "Asst Prof Physics"). schema_merge only merges
+# on it when rules.json -> nearDuplicate.enabled is set (and the collector
+# folds title variants with it). report() measures precision/recall against
+# hand-labelled pairs: --labels for pairs of data.json IDs, otherwise the
+# labelled sample shipped in tools/near_dup_sample.json at the same settings.
+
+import json, sys, re, hashlib, random, argparse, os
+from urllib.parse import urlparse
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.core import fuzzy_title, norm_date
+from tools import archive
+
+# Stopwords dropped before shingling (fuzzy_title already strips notice/advt/etc.)
+STOP = {
+    "a", "an", "and", "the", "of", "for", "in", "on", "to", "at", "by",
+    "exam", "examination", "post", "posts", "various", "vacancy", "vacancies",
+    "form", "online", "apply", "last", "date", "out", "released", "new", "job", "jobs",
+    "recruitment", "notification", "bihar", "railway", "india", "govt",
+}
+
+# Spelled-out commission names seen in aggregator titles
+ORG_ALIASES = {"bihar ssc": "bssc", "bihar psc": "bpsc", "bihar police": "csbc"}
+
+# Exam codes written out before shingling, so "SSC CGL 2025" and "Combined
+# Graduate Level Examination 2025" share their content words
+ABBREVIATIONS = {
+    "cgl": "combined graduate level",
+    "chsl": "combined higher secondary level",
+    "mts": "multi tasking staff",
+    "gd": "general duty",
+    "je": "junior engineer",
+    "cpo": "central police organisation",
+    "ntpc": "non technical popular categories",
+    "alp": "assistant loco pilot",
+    "po": "probationary officer",
+    "cce": "combined competitive examination",
+    "tre": "teacher recruitment examination",
+}
+
+# Recruiting bodies we can spot in a title when the record has no org field
+KNOWN_ORGS = {
+    "ssc", "bpsc", "bssc", "ibps", "rbi", "isro", "rrb", "dda", "dsssb",
+    "emrs", "ccras", "upsc", "vssc", "ursc", "sac", "rpsc", "gpsc", "ppsc",
+    "tnpsc", "mppsc", "bpssc", "csbc",
+}
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "near_dup_sample.json")
+YEAR_PAT = re.compile(r"^(19|20)\d{2}$")
+MERSENNE = (1 << 61) - 1
+
+# Defaults (overridable from rules.json -> "nearDuplicate")
+DEFAULTS = {
+    "threshold": 0.8,   # title similarity needed to link two records (same-commission boilerplate reaches ~0.7)
+    "numPerm": 32,      # MinHash signature length (= bands * rows)
+    "bands": 16,
+    "rows": 2,
+    "maxBlock": 50,     # blocking buckets larger than this are skipped
+}
+
+def _h64(tok):
+    return int.from_bytes(hashlib.blake2b(tok.encode("utf-8"), digest_size=8).digest(), "big")
+
+def host_org(u):
+    """ssc.gov.in -> ssc, bssc.bihar.gov.in -> bssc, www.ibps.in -> ibps"""
+    try:
+        parts = [p for p in urlparse(u or "").netloc.lower().split(".") if p and p != "www"]
+    except Exception:
+        return ""
+    return parts[0] if parts else ""
+
+def org_of(item):
+    """
+    Recruiting body: the org field, else one named in the title ("Bihar SSC"
+    counts as bssc), else the official site's host, else one named in an
+    aggregator's URL slug (/ssc-cgl-2025/)
+    """
+    org = (item.get("org") or "").strip().lower()
+    if org:
+        return org
+    title = " ".join(re.split(r"[^a-z0-9]+", (item.get("title") or "").lower()))
+    for phrase, alias in ORG_ALIASES.items():
+        if f" {phrase} " in f" {title} ":
+            return alias
+    for tok in title.split():
+        if tok in KNOWN_ORGS:
+            return tok
+    link = item.get("applyLink") or item.get("detailLink")
+    if item.get("source") == "official":
+        h = host_org(link)
+        if h in KNOWN_ORGS:
+            return h
+    else:
+        for tok in re.split(r"[^a-z0-9]+", urlparse(link or "").path.lower()):
+            if tok in KNOWN_ORGS:
+                return tok
+    return ""
+
+def title_features(title, org=""):
+    """
+    Shingle set over fuzzy_title: content words (exam codes expanded, see
+    ABBREVIATIONS) plus acronyms of 2-4 word runs ("combined graduate
+    level" -> "cgl"). Org names and years are
+    returned separately so they act as blocking/conflict signals only.
+    """
+    words = [x for w in re.split(r"[\s/:\-]+", fuzzy_title(title)) if w
+             for x in ABBREVIATIONS.get(w, w).split()]
+    years = {w for w in words if YEAR_PAT.match(w)}
+    content = [w for w in words if w not in STOP and w not in years and w != org and w not in KNOWN_ORGS]
+    shingles = set(content)
+    alpha = [w for w in content if w.isalpha()]
+    for n in (2, 3, 4):
+        for i in range(len(alpha) - n + 1):
+            shingles.add("".join(w[0] for w in alpha[i:i + n]))
+    return shingles, years
+
+class NearDupIndex:
+    """
+    Incremental near-duplicate index.
+    add(item) -> ordinal; match(item) -> best (ordinal, score) or None;
+    clusters() -> lists of ordinals that are near-duplicates of each other.
+    """
+
+    def __init__(self, threshold=None, num_perm=None, bands=None, rows=None, max_block=None, seed=1):
+        self.threshold = DEFAULTS["threshold"] if threshold is None else threshold
+        self.bands = bands or DEFAULTS["bands"]
+        self.rows = rows or DEFAULTS["rows"]
+        self.num_perm = num_perm or max(DEFAULTS["numPerm"], self.bands * self.rows)
+        if self.bands * self.rows > self.num_perm:
+            raise ValueError("bands * rows must not exceed num_perm")
+        self.max_block = max_block or DEFAULTS["maxBlock"]
+        rnd = random.Random(seed)
+        self._perm = [(rnd.randrange(1, MERSENNE), rnd.randrange(0, MERSENNE)) for _ in range(self.num_perm)]
+        self.items = []       # (shingles, years, org, deadline)
+        self._item_keys = []  # (lsh keys, blocking keys) per item
+        self.buckets = defaultdict(list)
+        self.blocks = defaultdict(list)
+        self.stats = {"candidatePairs": 0, "verified": 0, "skippedBlocks": 0}
+
+    @classmethod
+    def from_rules(cls, rules):
+        cfg = {**DEFAULTS, **((rules or {}).get("nearDuplicate") or {})}
+        return cls(threshold=cfg["threshold"], num_perm=cfg["numPerm"], bands=cfg["bands"],
+                   rows=cfg["rows"], max_block=cfg["maxBlock"])
+
+    def _signature(self, shingles):
+        if not shingles:
+            return None
+        hs = [_h64(s) for s in shingles]
+        return [min((a * x + b) % MERSENNE for x in hs) for a, b in self._perm]
+
+    def _features(self, item):
+        org = org_of(item)
+        shingles, years = title_features(item.get("title"), org)
+        dl = norm_date(item.get("deadline"))
+        return shingles, years, org, ("" if dl == "N/A" else dl)
+
+    def _keys(self, feats, sig):
+        shingles, years, org, dl = feats
+        keys = []
+        if sig:
+            for b in range(self.bands):
+                band = sig[b * self.rows:(b + 1) * self.rows]
+                keys.append(("lsh", b, tuple(band)))
+        blocks = []
+        if org and dl:
+            blocks.append(("org_dl", org, dl))
+        if org:
+            for y in years:
+                blocks.append(("org_year", org, y))
+        return keys, blocks
+
+    def score(self, fa, fb):
+        """Title similarity in [0, 1]; 0 when deadlines, years or orgs conflict."""
+        sa, ya, oa, da = fa
+        sb, yb, ob, db = fb
+        if da and db and da != db:
+            return 0.0
+        if ya and yb and not (ya & yb):
+            return 0.0
+        if oa and ob and oa != ob:
+            return 0.0
+        if not sa or not sb:
+            return 0.0
+        inter = len(sa & sb)
+        if not inter:
+            return 0.0
+        containment = inter / min(len(sa), len(sb))
+        jaccard = inter / len(sa | sb)
+        return 0.5 * containment + 0.5 * jaccard
+
+    def _candidates(self, keys, blocks):
+        seen = set()
+        for k in keys:
+            seen.update(self.buckets.get(k, ()))
+        for k in blocks:
+            members = self.blocks.get(k, ())
+            if len(members) >= self.max_block:
+                self.stats["skippedBlocks"] += 1
+                continue
+            seen.update(members)
+        return seen
+
+    def match(self, item):
+        feats = self._features(item)
+        keys, blocks = self._keys(feats, self._signature(feats[0]))
+        return self._best(feats, self._candidates(keys, blocks))
+
+    def _best(self, feats, cands):
+        best, best_s = None, 0.0
+        self.stats["candidatePairs"] += len(cands)
+        for o in cands:
+            s = self.score(feats, self.items[o])
+            if s > best_s:
+                best, best_s = o, s
+        if best is not None and best_s >= self.threshold:
+            self.stats["verified"] += 1
+            return best, best_s
+        return None
+
+    def add(self, item):
+        feats = self._features(item)
+        keys, blocks = self._keys(feats, self._signature(feats[0]))
+        o = len(self.items)
+        self.items.append(feats)
+        self._item_keys.append((keys, blocks))
+        for k in keys:
+            self.buckets[k].append(o)
+        for k in blocks:
+            self.blocks[k].append(o)
+        return o
+
+    def pairs(self):
+        """All verified (i, j, score) pairs among added items, i < j."""
+        out = []
+        for j, feats in enumerate(self.items):
+            keys, blocks = self._item_keys[j]
+            for i in self._candidates(keys, blocks):
+                if i >= j:
+                    continue
+                self.stats["candidatePairs"] += 1
+                s = self.score(self.items[i], feats)
+                if s >= self.threshold:
+                    out.append((i, j, s))
+        return out
+
+    def clusters(self):
+        parent = list(range(len(self.items)))
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+        for i, j, _ in self.pairs():
+            ri, rj = find(i), find(j)
+            if ri != rj:
+                parent[rj] = ri
+        groups = defaultdict(list)
+        for o in range(len(self.items)):
+            groups[find(o)].append(o)
+        return [g for g in groups.values() if len(g) > 1]
+
+def report(items, labels=None, **params):
+    """
+    Precision/recall of the pairs the index links, against labels: a list of
+    [idA, idB] pairs known to be the same vacancy (every other pair among
+    the labelled items counts as different). Without labels there is nothing
+    to measure against: the linked pairs are listed (with titles) to label.
+    """
+    idx = NearDupIndex(**params)
+    for it in items:
+        idx.add(it)
+    scored = idx.pairs()
+    found = {(i, j) for i, j, _ in scored}
+    n = len(items)
+    out = {
+        "items": n,
+        "reference": "labels" if labels is not None else None,
+        "threshold": idx.threshold,
+        "bands": idx.bands,
+        "rows": idx.rows,
+        "candidatePairs": idx.stats["candidatePairs"],
+        "allPairs": n * (n - 1) // 2,
+        "foundPairs": len(found),
+        "clusters": [[items[o].get("id") for o in g] for g in idx.clusters()],
+    }
+    if labels is None:
+        out["unlabelled"] = [[items[i].get("id"), items[j].get("id"), round(s, 3),
+                              items[i].get("title"), items[j].get("title")] for i, j, s in scored]
+        return out
+    pos = {it.get("id"): o for o, it in enumerate(items)}
+    truth = set()
+    for a, b in labels:
+        if a in pos and b in pos and pos[a] != pos[b]:
+            truth.add(tuple(sorted((pos[a], pos[b]))))
+    tp = len(found & truth)
+    out.update({
+        "truePairs": len(truth),
+        "precision": round(tp / len(found), 4) if found else None,
+        "recall": round(tp / len(truth), 4) if truth else None,
+        "falsePairs": [[items[i].get("id"), items[j].get("id")] for i, j in sorted(found - truth)],
+        "missedPairs": [[items[i].get("id"), items[j].get("id")] for i, j in sorted(truth - found)],
+    })
+    return out
+
+def sample_report(path=SAMPLE, **params):
+    """report() on the labelled sample ({"items", "pairs"})"""
+    with open(path, "r", encoding="utf-8") as f:
+        sample = json.load(f)
+    return report(sample["items"], sample["pairs"], **params)
+
+def main():
+    ap = argparse.ArgumentParser(description="Near-duplicate precision/recall report")
+    ap.add_argument("data", nargs="?", default="data.json")
+    ap.add_argument("--labels", help="JSON list of [idA, idB] known duplicate pairs")
+    ap.add_argument("--threshold", type=float, default=DEFAULTS["threshold"])
+    ap.add_argument("--bands", type=int, default=DEFAULTS["bands"])
+    ap.add_argument("--rows", type=int, default=DEFAULTS["rows"])
+    ap.add_argument("--max-block", type=int, default=DEFAULTS["maxBlock"])
+    ap.add_argument("--include-archived", action="store_true")
+    args = ap.parse_args()
+
+    try:
+        data = json.load(open(args.data, "r", encoding="utf-8"))
+    except Exception as e:
+        print(f"[ERROR] Reading {args.data}: {e}", file=sys.stderr)
+        return 2
+    items = list(data.get("jobListings") or [])
+    if args.include_archived:
+        # legacy inline records plus the cold archive next to data.json
+        items += list(data.get("archivedListings") or [])
+        items += list(archive.iter_records(os.path.dirname(os.path.abspath(args.data))))
+    labels = None
+    if args.labels:
+        labels = json.load(open(args.labels, "r", encoding="utf-8"))
+    params = dict(threshold=args.threshold, bands=args.bands, rows=args.rows,
+                  num_perm=args.bands * args.rows, max_block=args.max_block)
+    rep = report(items, labels, **params)
+    if labels is None:
+        # No labels for these IDs: precision/recall at these settings on the labelled sample
+        s = sample_report(**params)
+        rep["sample"] = {k: s[k] for k in ("items", "truePairs", "foundPairs", "precision", "recall", "falsePairs", "missedPairs")}
+    print(json.dumps(rep, indent=2, ensure_ascii=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# tools/patterns.py — compiled matcher for learned per-host non-vacancy patterns
+# A pattern (learn["patterns"][host][i]) matches a job on that host when every
+# pathToken is a segment of the URL path and at least max(1, n//2) of its n
+# titleTokens occur in the title. Patterns are compiled once per run into
+# token -> pattern inverted indexes; a job only counts hits for patterns that
+# share a token with it, and a pattern matches when its counters reach the
+# required totals.
+
+import re, sys
+import urllib.parse
+from collections import defaultdict
+
+MAX_PER_HOST = 200
+
+_TITLE_SPLIT = re.compile(r"[^a-z0-9]+")
+
+def path_tokens(u):
+    try:
+        p=urllib.parse.urlparse(u or "")
+        return [s for s in (p.path or "").lower().split("/") if s]
+    except:
+        return []
+
+def title_tokens(t):
+    return [x for x in _TITLE_SPLIT.split((t or "").lower()) if x]
+
+def _sets(p):
+    return frozenset(p.get("titleTokens") or []), frozenset(p.get("pathTokens") or [])
+
+def _title_need(tt):
+    return max(1, len(tt) // 2)
+
+def subsumes(a, b):
+    """True when every job matching pattern b also matches pattern a"""
+    if a.get("kind") != b.get("kind"):
+        return False
+    att, apt = _sets(a)
+    btt, bpt = _sets(b)
+    if not apt <= bpt:
+        return False
+    if not att:
+        return True
+    if not btt:
+        return False
+    # Worst case for a: b's required title hits avoid a's tokens where possible
+    return _title_need(btt) - len(btt - att) >= _title_need(att)
+
+def compact(patterns, max_per_host=MAX_PER_HOST):
+    """
+    Drop patterns subsumed by another one (the older one is kept on exact
+    ties), then keep the newest max_per_host by addedAt.
+    """
+    kept = []
+    for p in patterns:
+        if any(subsumes(k, p) for k in kept):
+            continue
+        kept = [k for k in kept if not subsumes(p, k)]
+        kept.append(p)
+    if max_per_host and len(kept) > max_per_host:
+        newest = sorted(range(len(kept)), key=lambda i: kept[i].get("addedAt") or "")[-max_per_host:]
+        kept = [kept[i] for i in sorted(newest)]
+    return kept
+
+class _HostIndex:
+    def __init__(self, patterns):
+        self.by_title = defaultdict(list)
+        self.by_path = defaultdict(list)
+        self.need = []      # (required title hits, required path hits) per pattern
+        self.always = False # some pattern has no tokens at all
+        for i, p in enumerate(patterns):
+            if p.get("kind") != "non_vacancy":
+                self.need.append(None)
+                continue
+            tt, pt = _sets(p)
+            self.need.append((_title_need(tt) if tt else 0, len(pt)))
+            if not tt and not pt:
+                self.always = True
+            for t in tt:
+                self.by_title[t].append(i)
+            for t in pt:
+                self.by_path[t].append(i)
+
+    def match(self, tt, pt):
+        if self.always:
+            return True
+        t_hits = defaultdict(int)
+        p_hits = defaultdict(int)
+        for t in tt:
+            for i in self.by_title.get(t, ()):
+                t_hits[i] += 1
+        for t in pt:
+            for i in self.by_path.get(t, ()):
+                p_hits[i] += 1
+        for i in set(t_hits) | set(p_hits):
+            need_t, need_p = self.need[i]
+            if p_hits.get(i, 0) >= need_p and t_hits.get(i, 0) >= need_t:
+                return True
+        return False
+
+class PatternMatcher:
+    """Per-host compiled non-vacancy patterns; patterns is learn["patterns"]"""
+
+    def __init__(self, patterns, max_per_host=MAX_PER_HOST):
+        self.patterns = patterns
+        self.max_per_host = max_per_host
+        self.hosts = {}
+        for h in list(patterns):
+            self.compile_host(h)
+
+    def compile_host(self, h):
+        before = len(self.patterns.get(h) or [])
+        arr = compact(self.patterns.get(h) or [], self.max_per_host)
+        if len(arr) != before:
+            print(f"[QC] patterns {h}: {before} -> {len(arr)} after compaction", file=sys.stderr)
+        self.patterns[h] = arr
+        self.hosts[h] = _HostIndex(arr) if arr else None
+
+    def add(self, h, pat):
+        """Append a learned pattern (unless already covered) and recompile its host"""
+        arr = self.patterns.setdefault(h, [])
+        if any(subsumes(p, pat) for p in arr):
+            return False
+        arr.append(pat)
+        self.compile_host(h)
+        return True
+
+    def matches(self, h, title, url):
+        idx = self.hosts.get(h)
+        if idx is None:
+            return False
+        return idx.match(set(title_tokens(title)), set(path_tokens(url)))
@@ -5,7 +5,12 @@
 import re, json, sys, pathlib, hashlib, requests, time, urllib3, argparse, os
 from datetime import datetime, date
 from urllib.parse import urlparse
-import tempfile
+
+# Shared normalisation (tools/core.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.core import clean, posts_from_text
+from tools.canonical import canonical_id, record_response, save as save_canonical
+from tools import verdict_cache
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -38,29 +43,6 @@ BLOCKED_EDU = [
 ]
 
 DATE_PAT = re.compile(r"(\d{1,2}[-/\.]\d{1,2}[-/\.]\d{2,4})", re.I)
-POSTS_PAT = re.compile(r"(\d{1,6})\s*(posts?|vacanc(?:y|ies)|seats?|पद|रिक्ति)", re.I)
-
-def clean(s):
-    return re.sub(r"\s+", " ", (s or "").strip())
-
-def norm_url(u):
-    try:
-        p = urlparse(u or "")
-        base = p._replace(query="", fragment="")
-        return base.geturl().rstrip("/").lower()
-    except:
-        return (u or "").rstrip("/").lower()
-
-def stable_id(url):
-    """
-    FIX P2-C-006 & P2-C-007: Use DETERMINISTIC SHA1 ID (Phase 1 compatible)
-    Matches collector.py, schema_merge.py, qc_and_learn.py
-    """
-    try:
-        norm = norm_url(url)
-        return f"job_{hashlib.sha1(norm.encode()).hexdigest()[:12]}"
-    except:
-        return f"job_{hashlib.md5((url or '').lower().encode()).hexdigest()[:12]}"
 
 def download_pdf(url, cache_dir=".cache"):
     pathlib.Path(cache_dir).mkdir(exist_ok=True)
@@ -73,6 +55,7 @@ def download_pdf(url, cache_dir=".cache"):
     try:
         r = requests.get(url, timeout=20, headers={"User-Agent": "Mozilla/5.0"}, verify=True)
         r.raise_for_status()
+        record_response(url, r)
         cache_path.write_bytes(r.content)
         print(f"✓ Downloaded: {url[:60]}...", file=sys.stderr)
         return cache_path
@@ -81,6 +64,7 @@ def download_pdf(url, cache_dir=".cache"):
             print(f"⚠ SSL error, retrying without verification: {url[:60]}...", file=sys.stderr)
             r = requests.get(url, timeout=20, headers={"User-Agent": "Mozilla/5.0"}, verify=False)
             r.raise_for_status()
+            record_response(url, r)
             cache_path.write_bytes(r.content)
             print(f"✓ Downloaded (no SSL): {url[:60]}...", file=sys.stderr)
             return cache_path
@@ -164,13 +148,7 @@ def parse_date(text):
     return max(dates) if dates else None
 
 def parse_posts(text):
-    m = POSTS_PAT.search(text)
-    if m:
-        try:
-            return int(m.group(1))
-        except:
-            pass
-    return None
+    return posts_from_text(text)
 
 def check_eligibility(text):
     t = text.lower()
@@ -185,8 +163,9 @@ def parse_pdf(url, pdf_path, source="unknown"):
         print(f"✗ No text extracted from: {url}", file=sys.stderr)
         return None
     
-    # Check eligibility
-    if not check_eligibility(text[:2000]):
+    # Check eligibility (verdicts persist across runs)
+    head = text[:2000]
+    if not verdict_cache.lookup("pdf", head, lambda: check_eligibility(head), code=("tools/pdf_parser.py",)):
         print(f"✗ Filtered (eligibility): {url[:60]}...", file=sys.stderr)
         return None
     
@@ -212,11 +191,11 @@ def parse_pdf(url, pdf_path, source="unknown"):
     domicile = "Bihar" if any(kw in text.lower() for kw in ["bihar", "बिहार"]) else "All India"
     
     job = {
-        "id": stable_id(url),  # FIX P2-C-006: Deterministic SHA1
+        "id": canonical_id(url),  # FIX P2-C-006: Deterministic SHA1 of canonical URL
         "title": title,
         "qualificationLevel": "Any graduate",
         "domicile": domicile,
-        "deadline": last_date.strftime("%d/%m/%Y") if last_date else "N/A",
+        "deadline": last_date.isoformat() if last_date else "N/A",
         "applyLink": url,
         "detailLink": url,
         "source": "official",
@@ -273,6 +252,8 @@ def main():
             for job in results:
                 f.write(json.dumps(job, ensure_ascii=False) + "\n")
     
+    save_canonical()
+    verdict_cache.save()
     print(f"\n✓ Processed {len(inputs)} PDFs, extracted {len(results)} eligible jobs", file=sys.stderr)
     return 0 if results else 1
 
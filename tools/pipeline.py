@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# tools/pipeline.py — collector -> schema_merge -> qc_and_learn
+# inprocess (default): the stages are imported and hand data to each other in
+#   memory; data.json is read once and written once, at the end.
+# subprocess: each stage runs in its own interpreter through its CLI, with
+#   tmp/candidates.jsonl and data.json in between (isolation, old behaviour).
+# Both return {"ok", "complete", "mode", "collected", "jobs", "data", "timings", "skipped"};
+# timings are seconds per stage. run() adds "changed" (data.json bytes differ from
+# before the run) and "publish"; an unchanged data.json is not republished.
+#
+# Stage cache (inprocess): after each run pipeline_cache.json records, per
+# stage, a hash of the inputs the NEXT run would need to see for that stage
+# to be a no-op: the candidates just merged, the data.json / rules.json /
+# learn_registry.json just written, the log offsets, the pinned job IDs, the day
+# (which deadlines have passed) and the stage code. When the next run's inputs hash the same,
+# merge passes data.json through unchanged and QC reuses it as its output;
+# skipped stages are listed in health.json ("pipeline.skipped").
+#
+# Users: QC only sees the pinned IDs (tools/user_sections.py). After a local
+# run users/ is refreshed, re-materialising just the users whose sections went
+# stale; the KV handler does the same against KV with the returned "aliases".
+#
+# Usage: python tools/pipeline.py [--subprocess] [--mode nightly] [--budget SEC] [--continue TOKEN]
+
+import os, sys, json, time, hashlib, argparse, subprocess
+from datetime import date, datetime
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STAGE_TIMEOUT = 120
+MODES = ("inprocess", "subprocess")
+
+CACHE_FILE = "pipeline_cache.json"
+CACHE_VERSION = 1
+# Source files whose behaviour each stage's output depends on
+STAGE_CODE = {
+    "merge": ("tools/schema_merge.py", "tools/near_dup.py", "tools/core.py", "tools/canonical.py",
+              "tools/verdict_cache.py", "tools/job_store.py"),
+    "qc": ("qc_and_learn.py", "tools/eligibility.py", "tools/core.py", "tools/canonical.py",
+           "tools/update_linker.py", "tools/reports.py", "tools/patterns.py", "tools/event_log.py",
+           "tools/verdict_cache.py", "tools/job_store.py", "tools/shards.py", "tools/archive.py",
+           "tools/view_model.py", "tools/search_index.py"),
+}
+
+class StageError(Exception):
+    def __init__(self, stage, detail, stdout=""):
+        super().__init__(f"{stage}: {detail}")
+        self.stage = stage
+        self.detail = detail
+        self.stdout = stdout
+
+@contextmanager
+def timed(timings, stage):
+    t0 = time.perf_counter()
+    print(f"[STAGE] {stage}...", file=sys.stderr)
+    try:
+        yield
+    finally:
+        timings[stage] = round(time.perf_counter() - t0, 3)
+
+def digest(obj):
+    blob = json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(blob.encode("utf-8", "replace")).hexdigest()
+
+def file_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except FileNotFoundError:
+        return ""
+
+def code_digest(root, stage):
+    return digest([file_digest(os.path.join(root, p)) for p in STAGE_CODE[stage]])
+
+def load_cache(root):
+    try:
+        with open(os.path.join(root, CACHE_FILE), "r", encoding="utf-8") as f:
+            c = json.load(f)
+        if isinstance(c, dict) and c.get("version") == CACHE_VERSION:
+            c.setdefault("stages", {})
+            return c
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[WARN] {CACHE_FILE} unreadable: {e}, ignoring", file=sys.stderr)
+    return {"version": CACHE_VERSION, "stages": {}}
+
+def save_cache(root, cache):
+    path = os.path.join(root, CACHE_FILE)
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(temp_path, path)
+    except Exception as e:
+        print(f"[WARN] Writing {path}: {e}", file=sys.stderr)
+
+def stage_keys(root, cand_hash, inputs, pinned_hash, mode, today):
+    """Input hashes for the merge and QC stages, read from what is on disk now"""
+    data_hash = file_digest(os.path.join(root, "data.json"))
+    rules_hash = file_digest(os.path.join(root, "rules.json"))
+    merge = digest({
+        "candidates": cand_hash, "data": data_hash, "rules": rules_hash,
+        "code": code_digest(root, "merge"),
+    })
+    qc = digest({
+        "data": data_hash, "rules": rules_hash,
+        "learn": file_digest(os.path.join(root, "learn_registry.json")),
+        "logs": digest(inputs["logs"].get("offsets") or {}),
+        "pinned": pinned_hash,
+        "mode": mode, "day": today.isoformat(), "code": code_digest(root, "qc"),
+    })
+    return {"merge": merge, "qc": qc}
+
+# ===== Checkpoints (time-budgeted runs) =====
+# A run given a budget stops before a stage that might overrun it, saves a
+# checkpoint and returns {"complete": False, "continuation": token}. The next
+# run (same token, or none) resumes from it:
+#   stage "collect": progress = seeds done, jobs so far, aggregator counts,
+#                    PDF probes deferred by the budget
+#   stage "merge":   candidates collected
+#   stage "qc":      candidates plus merged data and merge index
+# Checkpoints older than CHECKPOINT_MAX_AGE are discarded.
+
+CHECKPOINT_FILE = os.path.join("tmp", "pipeline_checkpoint.json")
+CHECKPOINT_VERSION = 1
+CHECKPOINT_MAX_AGE = 6 * 3600
+# Seconds a stage may need once started (collect reserves per seed, see collector)
+STAGE_RESERVE = {"merge": 30, "qc": 30}
+
+class FileCheckpoints:
+    """Checkpoint store on local disk (cron worker / CLI); the handler uses KV"""
+
+    def __init__(self, root=ROOT):
+        self.path = os.path.join(root, CHECKPOINT_FILE)
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[WARN] {self.path} unreadable: {e}, starting over", file=sys.stderr)
+            return None
+
+    def save(self, ck):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(ck, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+def resume_or_start(store, token=None):
+    try:
+        ck = store.load()
+    except Exception as e:
+        print(f"[WARN] loading checkpoint failed: {e}, starting over", file=sys.stderr)
+        ck = None
+    if ck and ck.get("version") == CHECKPOINT_VERSION:
+        age = time.time() - (ck.get("savedAt") or 0)
+        if token and ck.get("token") != token:
+            print(f"[WARN] continuation {token} does not match checkpoint {ck.get('token')}, starting over", file=sys.stderr)
+        elif age > CHECKPOINT_MAX_AGE:
+            print(f"[WARN] checkpoint {ck.get('token')} is {int(age)}s old, starting over", file=sys.stderr)
+        else:
+            print(f"[RESUME] {ck['token']} at stage {ck['stage']}", file=sys.stderr)
+            ck["resumed"] = ck.get("resumed", 0) + 1
+            return ck
+    elif token:
+        print(f"[WARN] no checkpoint for continuation {token}, starting over", file=sys.stderr)
+    return {"version": CHECKPOINT_VERSION, "token": os.urandom(8).hex(), "stage": "collect",
+            "startedAt": datetime.utcnow().isoformat() + "Z", "resumed": 0, "collect": {}}
+
+def out_of_time(deadline, stage):
+    return deadline is not None and deadline - time.monotonic() < STAGE_RESERVE[stage]
+
+def suspend(store, ck, timings):
+    ck["savedAt"] = time.time()
+    store.save(ck)
+    print(f"[SUSPEND] {ck['token']} before stage {ck['stage']}", file=sys.stderr)
+    return {
+        "ok": True, "complete": False, "continuation": ck["token"], "stage": ck["stage"],
+        "mode": "inprocess", "collected": len((ck.get("collect") or {}).get("jobs") or ck.get("candidates") or []),
+        "jobs": None, "data": None, "timings": timings, "skipped": [],
+    }
+
+def run_inprocess(root=ROOT, pinned=None, mode="nightly", deadline=None, store=None, token=None):
+    timings = {}
+    store = store or FileCheckpoints(root)
+    ck = resume_or_start(store, token)
+
+    if ck["stage"] == "collect":
+        with timed(timings, "collect"):
+            from sources import collector
+            candidates = collector.run(ck["collect"], deadline)
+        if candidates is None:
+            return suspend(store, ck, timings)
+        ck.update({"stage": "merge", "candidates": candidates, "collect": {}})
+    candidates = ck["candidates"]
+
+    import qc_and_learn as qc
+    from tools import schema_merge
+
+    if ck["stage"] == "merge" and out_of_time(deadline, "merge"):
+        return suspend(store, ck, timings)
+
+    with timed(timings, "load"):
+        inputs = qc.load(root, pinned=pinned)
+        idx_path = schema_merge.index_path(os.path.join(root, "data.json"))
+        index = schema_merge.load_index(idx_path)
+        cache = load_cache(root)
+        cand_hash = digest(candidates)
+        pinned_hash = digest(inputs["pinned"])
+        today = date.today()
+        skipped = []
+        if ck["stage"] == "merge":
+            keys = stage_keys(root, cand_hash, inputs, pinned_hash, mode, today)
+            skipped = [st for st in ("merge", "qc") if (cache["stages"].get(st) or {}).get("key") == keys[st]]
+            if "merge" not in skipped:
+                skipped = []  # QC's cached output is only valid on top of a skipped merge
+        else:
+            # Resuming after merge: merged data and its index come from the checkpoint
+            inputs["data"], index = ck["data"], ck["index"]
+
+    merge_stats = ck.get("merge") or {"added": 0, "merged": 0}
+    if ck["stage"] == "merge":
+        if "merge" in skipped:
+            print("[SKIP] merge: candidates already merged into data.json", file=sys.stderr)
+        else:
+            with timed(timings, "merge"):
+                inputs["data"], merge_stats = schema_merge.merge_data(inputs["data"], candidates, inputs["rules"], index)
+                print(f"[OK] Merge: {json.dumps(merge_stats)}", file=sys.stderr)
+        ck.update({"stage": "qc", "data": inputs["data"], "index": index, "merge": merge_stats})
+
+    if "qc" not in skipped and out_of_time(deadline, "qc"):
+        return suspend(store, ck, timings)
+
+    health = {"pipeline": {"mode": "inprocess", "skipped": skipped, "timings": timings,
+                           "resumed": ck["resumed"], "checkedAt": datetime.utcnow().isoformat() + "Z"}}
+    if "qc" in skipped:
+        print("[SKIP] qc: no input changed since the last run", file=sys.stderr)
+        data = inputs["data"]
+        aliases = {}  # nothing was re-keyed
+        qc_timings = {}
+        with timed(timings, "write"):
+            qc.JWRITE(os.path.join(root, "health.json"), {"ok": True, **(data.get("transparencyInfo") or {}), **health})
+    else:
+        with timed(timings, "qc"):
+            result = qc.run(**inputs, mode=mode, today=today)
+        data = result["data"]
+        aliases = result["aliases"]
+        qc_timings = result["timings"]
+        with timed(timings, "write"):
+            qc.emit(result, root, health_extra=health)
+            if "merge" not in skipped:
+                schema_merge.save_index(idx_path, index)
+            # Keys the next run must match for each stage to be a no-op
+            after = stage_keys(root, cand_hash, inputs, pinned_hash, mode, today)
+            cache["stages"] = {st: {"key": after[st], "at": datetime.utcnow().isoformat() + "Z"} for st in after}
+            save_cache(root, cache)
+    try:
+        store.clear()
+    except Exception as e:
+        print(f"[WARN] clearing checkpoint {ck['token']} failed: {e}", file=sys.stderr)
+
+    return {
+        "ok": True, "complete": True, "mode": "inprocess", "collected": len(candidates),
+        "jobs": len(data.get("jobListings") or []), "data": data, "resumed": ck["resumed"],
+        "merge": merge_stats, "qcTimings": qc_timings, "timings": timings, "skipped": skipped,
+        "aliases": aliases,
+    }
+
+def _stage(stage, args, root, deadline=None):
+    timeout = STAGE_TIMEOUT
+    if deadline is not None:
+        timeout = max(1, min(timeout, deadline - time.monotonic()))
+    r = subprocess.run([sys.executable] + args, capture_output=True, text=True, timeout=timeout, cwd=root)
+    if r.returncode != 0:
+        raise StageError(stage, r.stderr[-500:], r.stdout[:500])
+    return r
+
+def run_subprocess(root=ROOT, pinned=None, mode="nightly", deadline=None):
+    """No checkpoints here: a deadline only caps each stage's timeout"""
+    timings = {}
+    qc_args = [os.path.join(root, "qc_and_learn.py"), "--mode", mode]
+    if pinned is not None:
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+        pinned_path = os.path.join(root, "tmp", "pinned.json")
+        with open(pinned_path, "w", encoding="utf-8") as f:
+            json.dump(sorted(pinned), f)
+        qc_args += ["--pinned", pinned_path]
+
+    with timed(timings, "collect"):
+        r = _stage("collect", [os.path.join(root, "sources/collector.py")], root, deadline)
+        candidates = []
+        for line in r.stdout.splitlines():
+            s = line.strip()
+            if not s:
+                continue
+            try:
+                candidates.append(json.loads(s))
+            except json.JSONDecodeError:
+                pass
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+        cand_path = os.path.join(root, "tmp", "candidates.jsonl")
+        with open(cand_path, "w", encoding="utf-8") as f:
+            for cand in candidates:
+                f.write(json.dumps(cand, ensure_ascii=False) + "\n")
+
+    data_path = os.path.join(root, "data.json")
+    with timed(timings, "merge"):
+        try:
+            _stage("merge", [os.path.join(root, "tools/schema_merge.py"), data_path, cand_path, data_path], root, deadline)
+        except StageError as e:
+            print(f"[WARN] Schema merge non-zero: {e.detail}", file=sys.stderr)
+
+    with timed(timings, "qc"):
+        try:
+            _stage("qc", qc_args, root, deadline)
+        except StageError as e:
+            print(f"[WARN] QC returned non-zero: {e.detail}", file=sys.stderr)
+
+    with timed(timings, "read"):
+        with open(data_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    try:
+        os.remove(cand_path)
+    except OSError:
+        pass
+
+    return {
+        "ok": True, "complete": True, "mode": "subprocess", "collected": len(candidates),
+        "jobs": len(data.get("jobListings") or []), "data": data, "timings": timings, "skipped": [],
+    }
+
+def refresh_users(root, out, today=None):
+    """Re-materialise stale per-user sections under root/users (local runs)"""
+    from tools import user_sections
+    with timed(out["timings"], "users"):
+        try:
+            due = user_sections.refresh(user_sections.DirStore(os.path.join(root, "users")), today, out.get("aliases"))
+            out["users"] = {"refreshed": len(due)}
+        except Exception as e:
+            print(f"[WARN] Refreshing users/: {e}", file=sys.stderr)
+
+def note_health(root, key, value):
+    """Add one section to health.json (after the stage that wrote it)"""
+    path = os.path.join(root, "health.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            health = json.load(f)
+    except (FileNotFoundError, ValueError):
+        health = {"ok": True}
+    health[key] = value
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(health, indent=2, ensure_ascii=False))
+    os.replace(temp_path, path)
+
+def publish_stage(root, out):
+    """Minified + precompressed artifacts; a blown size budget fails the run"""
+    from tools import publish
+    try:
+        with open(os.path.join(root, "rules.json"), "r", encoding="utf-8") as f:
+            rules = json.load(f)
+    except (FileNotFoundError, ValueError):
+        rules = {}
+    out_dir = os.path.join(root, (rules.get("publish") or {}).get("dir") or publish.PUBLISH_DIR)
+    if not out.get("changed", True):
+        # Nothing new came in: the published artifacts are already these bytes
+        try:
+            out["publish"] = {**publish.summary(publish.load_report(out_dir)), "skipped": True}
+            print("[SKIP] publish: data.json unchanged since the last run", file=sys.stderr)
+            note_health(root, "publish", out["publish"])
+            return
+        except KeyError:
+            pass  # never published here
+    with timed(out["timings"], "publish"):
+        try:
+            report = publish.publish(root, rules, out_dir)
+        except publish.BudgetExceeded as e:
+            note_health(root, "publish", publish.summary(e.report))
+            raise StageError("publish", f"size budget exceeded: {e}")
+        out["publish"] = publish.summary(report)
+        note_health(root, "publish", out["publish"])
+
+def run(root=ROOT, pinned=None, mode="nightly", how="inprocess", budget=None, token=None, store=None):
+    """
+    Run the pipeline. budget (seconds) bounds this invocation: in-process runs
+    checkpoint and return a continuation token instead of overrunning it.
+    pinned: job IDs users applied to (e.g. from the KV user/<uid>/meta.json keys); None reads
+    them from root/users and refreshes the users there afterwards.
+    """
+    if how not in MODES:
+        raise ValueError(f"unknown pipeline mode {how!r}, expected one of {MODES}")
+    t0 = time.perf_counter()
+    deadline = time.monotonic() + budget if budget else None
+    data_before = file_digest(os.path.join(root, "data.json"))
+    if how == "subprocess":
+        out = run_subprocess(root, pinned, mode, deadline)
+    else:
+        out = run_inprocess(root, pinned, mode, deadline, store, token)
+    if out["complete"]:
+        out["changed"] = file_digest(os.path.join(root, "data.json")) != data_before
+        publish_stage(root, out)
+        if pinned is None and how == "inprocess":
+            refresh_users(root, out)  # qc_and_learn.py does this itself in subprocess mode
+    out["timings"]["total"] = round(time.perf_counter() - t0, 3)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Run collector -> schema_merge -> qc_and_learn")
+    ap.add_argument("--subprocess", action="store_true", help="run each stage in its own interpreter")
+    ap.add_argument("--mode", default="nightly")
+    ap.add_argument("--budget", type=float, help="seconds this invocation may take (checkpoint and stop before)")
+    ap.add_argument("--continue", dest="token", help="continuation token from a previous run")
+    args = ap.parse_args()
+    out = run(ROOT, mode=args.mode, how="subprocess" if args.subprocess else "inprocess",
+              budget=args.budget, token=args.token)
+    out.pop("data")
+    print(json.dumps(out))
+    return 0 if out["complete"] else 3
+
+if __name__ == "__main__":
+    sys.exit(main())
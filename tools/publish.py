@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# tools/publish.py — minified, precompressed publish artifacts with a size budget
+# publish() copies the served JSON (data.json, manifest.json and the shards,
+# change feeds and search index it lists) into the publish directory as minified JSON with .gz
+# and .br siblings (.br needs the optional brotli package). Files whose bytes
+# did not change are not rewritten; files no longer published are removed.
+# Sizes per artifact (raw as written by the pipeline, minified, gzip, br and
+# the change since the last publish) are returned and kept in publish.json.
+# Budgets come from rules.json -> "publish" -> "budgets":
+#   {"data.json": {"gzip": 262144}, "shards/*.json": {"min": 524288}, "total": {"gzip": ...}}
+# Keys are fnmatch patterns ("total" = sum over all artifacts); limits are
+# bytes for "min", "gzip" or "br". Exceeding any raises BudgetExceeded.
+# The publish directory is a local build output (gitignored, not deployed):
+# what clients get is served from KV, where api/scrape-jobs.py uploads the
+# same .gz/.br bytes (compress()) next to each key with their Content-Encoding
+# in the key's metadata (tools/kv_publish.py). Here it is the size budget
+# check and a copy to inspect or sync to a static host.
+#
+#   python tools/publish.py [root]   # exit 1 when over budget
+
+import os, sys, json, gzip, fnmatch
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PUBLISH_DIR = "public"
+REPORT = "publish.json"
+ARTIFACTS = ("data.json", "manifest.json")  # health.json carries the report, so it is not budgeted
+DEFAULT_BUDGETS = {
+    "data.json": {"gzip": 256 * 1024},
+    "manifest.json": {"gzip": 16 * 1024},
+    "shards/*.json": {"gzip": 192 * 1024},
+    "changes/*.json": {"gzip": 64 * 1024},
+    "total": {"gzip": 512 * 1024},
+}
+SIZE_KINDS = ("min", "gzip", "br")
+
+class BudgetExceeded(Exception):
+    def __init__(self, over, report):
+        super().__init__("; ".join(f"{o['artifact']} {o['kind']} {o['bytes']} > {o['limit']}" for o in over))
+        self.over = over
+        self.report = report
+
+def minify(raw):
+    return json.dumps(json.loads(raw), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+ENCODINGS = ("gzip", "br") if brotli else ("gzip",)
+
+def compress(blob):
+    """{"gzip": bytes, "br": bytes or None}; gzip mtime is fixed so equal input gives equal output"""
+    return {
+        "gzip": gzip.compress(blob, compresslevel=9, mtime=0),
+        "br": brotli.compress(blob, quality=11) if brotli else None,
+    }
+
+def artifact_names(root):
+    names = [a for a in ARTIFACTS if os.path.exists(os.path.join(root, a))]
+    try:
+        with open(os.path.join(root, "manifest.json"), "r", encoding="utf-8") as f:
+            m = json.load(f)
+        names += [s["path"] for s in (m.get("shards") or {}).values()]
+        names += [c["path"] for c in m.get("changes") or []]
+        if (m.get("search") or {}).get("path"):
+            names.append(m["search"]["path"])
+    except (FileNotFoundError, ValueError, KeyError, AttributeError):
+        pass
+    return names
+
+def _write_if_changed(path, blob):
+    try:
+        with open(path, "rb") as f:
+            if f.read() == blob:
+                return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(blob)
+    os.replace(temp_path, path)
+    return True
+
+def check_budgets(sizes, budgets):
+    over = []
+    for pattern, limits in budgets.items():
+        if pattern == "total":
+            groups = [("total", {k: sum(s.get(k) or 0 for s in sizes.values()) for k in SIZE_KINDS})]
+        else:
+            groups = [(n, s) for n, s in sizes.items() if fnmatch.fnmatch(n, pattern)]
+        for name, s in groups:
+            for kind, limit in (limits or {}).items():
+                if s.get(kind) is not None and s[kind] > limit:
+                    over.append({"artifact": name, "kind": kind, "bytes": s[kind], "limit": limit})
+    return over
+
+def load_report(out_dir):
+    try:
+        with open(os.path.join(out_dir, REPORT), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def publish(root=".", rules=None, out_dir=None):
+    """Write the publish directory; returns the size report (raises BudgetExceeded)"""
+    cfg = (rules or {}).get("publish") or {}
+    out_dir = out_dir or os.path.join(root, cfg.get("dir") or PUBLISH_DIR)
+    budgets = cfg.get("budgets") or DEFAULT_BUDGETS
+    prev = (load_report(out_dir).get("artifacts")) or {}
+
+    sizes, written, keep = {}, 0, {REPORT}
+    for name in artifact_names(root):
+        with open(os.path.join(root, name), "rb") as f:
+            raw = f.read()
+        blob = minify(raw)
+        packed = compress(blob)
+        s = {"raw": len(raw), "min": len(blob), "gzip": len(packed["gzip"]),
+             "br": len(packed["br"]) if packed["br"] is not None else None}
+        p = prev.get(name) or {}
+        s["delta"] = {k: s[k] - p[k] for k in SIZE_KINDS if s[k] is not None and p.get(k) is not None}
+        sizes[name] = s
+        path = os.path.join(out_dir, name)
+        written += _write_if_changed(path, blob)
+        written += _write_if_changed(path + ".gz", packed["gzip"])
+        keep.update({name, name + ".gz"})
+        if packed["br"] is not None:
+            written += _write_if_changed(path + ".br", packed["br"])
+            keep.add(name + ".br")
+
+    removed = 0
+    for dirpath, _, files in os.walk(out_dir):
+        for fn in files:
+            rel = os.path.relpath(os.path.join(dirpath, fn), out_dir).replace(os.sep, "/")
+            if rel not in keep:
+                os.remove(os.path.join(dirpath, fn))
+                removed += 1
+
+    total = {k: sum(s.get(k) or 0 for s in sizes.values()) for k in ("raw",) + SIZE_KINDS}
+    if brotli is None:
+        total["br"] = None
+    over = check_budgets(sizes, budgets)
+    report = {"artifacts": sizes, "total": total, "brotli": brotli is not None,
+              "written": written, "removed": removed, "overBudget": over, "ok": not over}
+    _write_if_changed(os.path.join(out_dir, REPORT), json.dumps(report, indent=2).encode("utf-8"))
+    print(f"[PUBLISH] {len(sizes)} artifacts, {total['min']} B minified, {total['gzip']} B gzip"
+          f"{'' if brotli else ' (brotli not installed, no .br)'}; {written} files written, {removed} removed", file=sys.stderr)
+    if over:
+        raise BudgetExceeded(over, report)
+    return report
+
+def summary(report):
+    """Compact per-artifact sizes for health.json"""
+    return {
+        "ok": report["ok"], "total": report["total"], "overBudget": report["overBudget"],
+        "artifacts": {n: {k: s[k] for k in ("raw", "min", "gzip", "br", "delta")} for n, s in report["artifacts"].items()},
+    }
+
+if __name__ == "__main__":
+    root = sys.argv[1] if len(sys.argv) > 1 else "."
+    try:
+        with open(os.path.join(root, "rules.json"), "r", encoding="utf-8") as f:
+            rules = json.load(f)
+    except Exception:
+        rules = {}
+    try:
+        rep = publish(root, rules)
+    except BudgetExceeded as e:
+        print(f"[PUBLISH] Over budget: {e}", file=sys.stderr)
+        print(json.dumps(summary(e.report)))
+        sys.exit(1)
+    print(json.dumps(summary(rep)))
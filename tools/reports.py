@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# tools/reports.py — user reports pre-aggregated per job and per canonical URL
+# reports.jsonl is append-only; folding it once gives O(1) lookups in the QC loop
+# instead of scanning every report for every job.
+
+import sys
+
+from tools.canonical import canonical_url
+
+REPORT_FIELDS = ("lastDate", "eligibility", "evidenceUrl", "posts")
+
+def new_state():
+    return {"byJob": {}, "byUrl": {}}
+
+def _merge(agg, r):
+    # Later non-empty values win; reasonCode is the latest one given
+    for k in REPORT_FIELDS:
+        v = r.get(k)
+        if v:
+            agg[k] = v
+    if r.get("reasonCode"):
+        agg["reasonCode"] = r["reasonCode"]
+    if r.get("url"):
+        agg["url"] = r["url"]
+    if r.get("ts"):
+        agg["ts"] = r["ts"]
+    agg["count"] = agg.get("count", 0) + 1
+
+def fold_report(state, r):
+    """Fold one reports.jsonl event into state (ignores non-report events)"""
+    if r.get("type") != "report":
+        return False
+    jid = r.get("jobId") or ""
+    if not r.get("reasonCode"):
+        print(f"[WARN] report_missing_reasonCode for {jid}", file=sys.stderr)
+    _merge(state["byJob"].setdefault(jid, {"type": "report", "jobId": jid}), r)
+    cu = canonical_url(r.get("url")) if r.get("url") else ""
+    if cu:
+        _merge(state["byUrl"].setdefault(cu, {"type": "report", "jobId": jid}), r)
+    return True
+
+def aggregate_reports(reports, state=None):
+    state = state or new_state()
+    for r in reports:
+        fold_report(state, r)
+    return state
+
+def find_report(state, job):
+    """Aggregated report for a job: by job ID first, then by canonical apply URL"""
+    rep = state["byJob"].get(job.get("id"))
+    if rep:
+        return rep
+    return state["byUrl"].get(canonical_url(job.get("applyLink")))
@@ -3,88 +3,94 @@
 # PLUS: Preserve applied/other jobs, filter eligibility
 # FIXES: C-002, C-005, H-003, H-006, A-002 (ID consistency), A-003 (dedup)
 
-import json, sys, re, hashlib, os
-from datetime import datetime, timedelta, timezone
+import json, sys, hashlib, os
+from datetime import date
 
-def norm_spaces(s): 
-    return re.sub(r"\s+"," ", (s or "").strip())
-
-def fuzzy_title(s):
-    s = (s or "").lower()
-    s = re.sub(r"[\(\)\[\]\{\}]", " ", s)
-    s = re.sub(r"[^\w\s/:-]", " ", s)
-    s = re.sub(r"\b(notice|notification|advertisement|advt|recruitment|online\s*form|apply\s*online)\b", " ", s)
-    s = re.sub(r"\b(corrigendum|extension|extended|addendum|amendment|revised|rectified)\b", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
-
-def norm_date(s):
-    s = (s or "").strip()
-    for fmt in ("%d/%m/%Y","%d-%m-%Y","%Y-%m-%d"):
-        try:
-            return datetime.strptime(s, fmt).strftime("%d/%m/%Y")
-        except Exception:
-            pass
-    return s if s else "N/A"
+# Shared normalisation (tools/core.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.core import clean as norm_spaces, fuzzy_title, norm_date, iso_date, parse_date_any, posts_from_text
+from tools.canonical import canonical_url, canonical_id
+from tools import verdict_cache, job_store
 
 def make_key(item):
     title = fuzzy_title(item.get("title",""))
-    link  = (item.get("detailLink") or item.get("applyLink") or "").lower()
-    link  = re.sub(r"[?#].*$", "", link)
+    link  = canonical_url(item.get("detailLink") or item.get("applyLink"))
     date  = norm_date(item.get("deadline","")).lower()
     raw = f"{title}|{link}|{date}"
     return hashlib.sha1(raw.encode()).hexdigest()[:16]
 
-def norm_url(u):
-    """Normalize URL for deduplication"""
+def record_fingerprint(item):
+    """Cheap fingerprint of the fields make_key() reads (title, link, deadline)"""
+    link = item.get("detailLink") or item.get("applyLink") or ""
+    raw = f"{item.get('title') or ''}\x1f{link}\x1f{item.get('deadline') or ''}"
+    return hashlib.sha1(raw.encode("utf-8", "replace")).hexdigest()[:16]
+
+def candidate_hash(raw):
+    """Content hash of a raw candidate line (key order independent)"""
+    blob = json.dumps(raw, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(blob.encode("utf-8", "replace")).hexdigest()[:16]
+
+# ===== Persistent merge index (sidecar next to data.json) =====
+# records:    id -> {"fp": record_fingerprint, "key": make_key}
+# candidates: candidate_hash -> id it merged into ("" = rejected)
+# ruleset:    verdict_cache.ruleset_hash() the rejections were made under; when
+#             the eligibility rules change the "" entries are re-checked
+INDEX_VERSION = 2  # bump whenever make_key() changes
+
+def index_path(data_path):
+    return os.path.splitext(data_path)[0] + ".index.json"
+
+def load_index(path):
     try:
-        p = __import__('urllib.parse').parse.urlparse(u or "")
-        base = p._replace(query="", fragment="")
-        s = __import__('urllib.parse').parse.urlunparse(base)
-        return s.rstrip("/").lower()
-    except: 
-        return (u or "").rstrip("/").lower()
+        with open(path, "r", encoding="utf-8") as f:
+            idx = json.load(f)
+        if isinstance(idx, dict) and idx.get("version") == INDEX_VERSION:
+            idx.setdefault("records", {})
+            idx.setdefault("candidates", {})
+            return idx
+        print(f"[WARN] {path} has unknown version, rebuilding", file=sys.stderr)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[WARN] {path} unreadable: {e}, rebuilding", file=sys.stderr)
+    return {"version": INDEX_VERSION, "records": {}, "candidates": {}}
 
-def stable_id(url):
-    """
-    FIX A-002: Generate DETERMINISTIC stable ID using SHA1
-    Matches collector.py and qc_and_learn.py
-    """
+def save_index(path, index):
+    temp_path = path + ".tmp"
     try:
-        norm = norm_url(url)
-        return f"job_{hashlib.sha1(norm.encode()).hexdigest()[:12]}"
-    except:
-        return f"job_{hashlib.md5((url or '').lower().encode()).hexdigest()[:12]}"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, path)
+    except Exception as e:
+        print(f"[WARN] Writing {path}: {e}", file=sys.stderr)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
 
-def compute_days_left(deadline_ddmmyyyy):
+def build_key_index(existing, index):
     """
-    FIX H-003: Timezone-aware comparison
-    Always compare in IST (UTC+5:30) since jobs are India-centric
+    key -> record for every stored job.
+    Reuses the stored make_key() result when the record's fingerprint is
+    unchanged, so fuzzy_title/norm_date only run on new or edited records.
     """
-    try:
-        d = datetime.strptime(deadline_ddmmyyyy, "%d/%m/%Y")
-        
-        # Get today in IST (UTC+5:30)
-        ist_tz = timezone(timedelta(hours=5, minutes=30))
-        today_ist = datetime.now(ist_tz).date()
-        
-        days_diff = (d.date() - today_ist).days
-        return max(days_diff, 0)  # Never negative
-    except Exception:
-        return None
-
-POSTS_PAT = re.compile(r"(\d{1,6})\s*(posts?|vacanc(?:y|ies)|seats?)", re.I)
-
-def posts_from_text(txt):
-    if not txt: 
-        return None
-    m = POSTS_PAT.search(txt)
-    if m:
-        try: 
-            return int(m.group(1))
-        except: 
-            return None
-    return None
+    stored = index.get("records") or {}
+    records = {}
+    idx = {}
+    reused = 0
+    for x in existing:
+        jid = x.get("id")
+        fp = record_fingerprint(x)
+        ent = stored.get(jid) if jid else None
+        if ent and ent.get("fp") == fp and jid not in records:
+            k = ent["key"]
+            reused += 1
+        else:
+            k = make_key(x)
+        if jid and jid not in records:
+            records[jid] = {"fp": fp, "key": k}
+        idx[k] = x
+    index["records"] = records
+    print(f"✓ Merge index: {reused}/{len(existing)} keys reused", file=sys.stderr)
+    return idx
 
 def to_int(n):
     if n is None: 
@@ -125,13 +131,20 @@ def check_eligibility(job):
     
     return True, "Eligible"
 
+MERGE_CODE = ("tools/schema_merge.py",)  # besides verdict_cache.RULE_FILES, what a merge verdict depends on
+
+def cached_eligibility(job):
+    """check_eligibility() through the persistent verdict cache (title + domicile)"""
+    text = f"{job.get('title', '')}\x1f{job.get('domicile', '')}"
+    return verdict_cache.lookup("merge", text, lambda: check_eligibility(job), code=MERGE_CODE)
+
 def validate(i):
     out = {
-        "id": stable_id(i.get("applyLink") or i.get("detailLink")),
+        "id": canonical_id(i.get("applyLink") or i.get("detailLink")),
         "title": norm_spaces(i.get("title")),
         "qualificationLevel": norm_spaces(i.get("qualificationLevel") or ""),
         "domicile": norm_spaces(i.get("domicile") or ""),
-        "deadline": norm_date(i.get("deadline") or ""),
+        "deadline": iso_date(i.get("deadline") or ""),  # daysLeft is derived when read
         "applyLink": (i.get("applyLink") or "").strip(),
         "detailLink": (i.get("detailLink") or "").strip(),
         "source": i.get("source") or "official",
@@ -141,12 +154,23 @@ def validate(i):
     p = to_int(i.get("numberOfPosts")) or posts_from_text(out["title"])
     if p: 
         out["numberOfPosts"]=p
-    dl = compute_days_left(out["deadline"])
-    if dl is not None: 
-        out["daysLeft"] = dl
     return out
 
-def merge(existing, candidates, applied_ids, other_ids):
+def best_per_url(candidates):
+    """
+    FIX A-003: one candidate per canonical URL, the one with the longest
+    title (the first on ties), in the order each URL was first seen.
+    Consumes candidates once; holds one candidate per URL, not every line.
+    """
+    by_url = {}
+    for cand in candidates:
+        u = canonical_url(cand.get("applyLink") or cand.get("detailLink"))
+        cur = by_url.get(u)
+        if cur is None or len(cand.get("title") or "") > len(cur.get("title") or ""):
+            by_url[u] = cand  # an existing key keeps its position
+    return list(by_url.values())
+
+def merge(existing, candidates, applied_ids, other_ids, index=None, near_dup=None):
     """
     FIX C-002, H-006, A-003: Merge candidates while preserving applied jobs
     
@@ -154,23 +178,29 @@ def merge(existing, candidates, applied_ids, other_ids):
     1. PROTECT applied jobs from ANY filtering
     2. Keep other jobs (user marked)
     3. Enrich with new candidate data (dedup)
+
+    index: persistent merge index (see load_index). Updated in place;
+    candidates already merged on a previous run are skipped.
+    near_dup: optional tools/near_dup.NearDupIndex; candidates without an
+    exact key match are merged into a near-duplicate record when one exists.
+    candidates: a list or an iterator consumed once (e.g. iter_candidates);
+    either way it goes through best_per_url() and the same decisions.
     """
+    if index is None:
+        index = {"version": INDEX_VERSION, "records": {}, "candidates": {}}
     
     # FIX A-003: Dedup candidates first before adding to existing
-    candidate_by_url = {}
-    for cand in candidates:
-        cand_url = norm_url(cand.get("applyLink") or cand.get("detailLink"))
-        if cand_url not in candidate_by_url:
-            candidate_by_url[cand_url] = cand
-        else:
-            # Keep candidate with more data
-            existing_cand = candidate_by_url[cand_url]
-            if len((cand.get("title") or "")) > len((existing_cand.get("title") or "")):
-                candidate_by_url[cand_url] = cand
+    candidates = best_per_url(candidates)
     
-    candidates = list(candidate_by_url.values())
-    
-    idx = { make_key(x): x for x in existing }
+    idx = build_key_index(existing, index)
+    ids_present = {x.get("id") for x in existing}
+    seen_cands = index.get("candidates") or {}
+    ruleset = verdict_cache.ruleset_hash(MERGE_CODE)
+    if index.get("ruleset") != ruleset:
+        # Rejections only hold under the rules that made them: re-check those
+        seen_cands = {ch: jid for ch, jid in seen_cands.items() if jid}
+        index["ruleset"] = ruleset
+    cand_index = {}
     
     # FIX C-002: Preserve applied and other jobs BEFORE eligibility filtering
     preserved_applied = [j for j in existing if j.get('id') in applied_ids]
@@ -183,38 +213,75 @@ def merge(existing, candidates, applied_ids, other_ids):
     rejected_hindi = 0
     rejected_ineligible = 0
     merged = 0
+    unchanged = 0
+    near_merged = 0
+    near_rows = None  # ordinal in near_dup -> record, built on first miss
     
     # First pass: Check eligibility, then merge
     for raw in candidates:
+        # Same candidate content as a previous run: it was either rejected
+        # (under the same eligibility rules, see index["ruleset"]) or already
+        # merged into a record that is still present, so validate/merge would
+        # be a no-op.
+        ch = candidate_hash(raw)
+        prev = seen_cands.get(ch)
+        if prev is not None and (prev == "" or prev in ids_present):
+            cand_index[ch] = prev
+            unchanged += 1
+            continue
+
         v = validate(raw)
         k = make_key(v)
         
         # FIX C-001: Check eligibility BEFORE adding (only 3 reasons)
-        is_eligible, reason = check_eligibility(v)
+        is_eligible, reason = cached_eligibility(v)
         if not is_eligible:
             if "Hindi" in reason:
                 rejected_hindi += 1
             else:
                 rejected_ineligible += 1
+            cand_index[ch] = ""
             continue
-        
-        if k in idx:
+
+        ex = idx.get(k)
+        if ex is None and near_dup is not None:
+            if near_rows is None:
+                near_rows = []
+                for x in existing:
+                    near_dup.add(x)
+                    near_rows.append(x)
+            hit = near_dup.match(v)
+            if hit:
+                ex = near_rows[hit[0]]
+                # Keep the merged candidate's link, not just its ID, so a wrong merge can be undone
+                dups = ex.setdefault("flags", {}).setdefault("near_duplicates", [])
+                if v["id"] != ex.get("id") and all((d.get("id") if isinstance(d, dict) else d) != v["id"] for d in dups):
+                    dups.append({"id": v["id"], "applyLink": v.get("applyLink"), "title": v.get("title"),
+                                 "score": round(hit[1], 3)})
+                near_merged += 1
+
+        if ex is not None:
             # Merge into existing (enrich with new data)
-            ex = idx[k]
             for f in ["qualificationLevel","domicile","deadline","applyLink","detailLink","source","type"]:
                 if v.get(f) and (not ex.get(f) or ex.get(f)=="N/A"):
                     ex[f] = v[f]
             if v.get("numberOfPosts") and not ex.get("numberOfPosts"):
                 ex["numberOfPosts"]=v["numberOfPosts"]
             ex["flags"] = { **(ex.get("flags") or {}), **(v.get("flags") or {}) }
-            if v.get("daysLeft") is not None: 
-                ex["daysLeft"] = v["daysLeft"]
             merged += 1
+            if ex.get("id"):
+                cand_index[ch] = ex["id"]
         else:
             # Add new job
             existing.append(v)
             idx[k]=v
             added += 1
+            ids_present.add(v["id"])
+            if near_rows is not None:
+                near_dup.add(v)
+                near_rows.append(v)
+            index["records"].setdefault(v["id"], {"fp": record_fingerprint(v), "key": k})
+            cand_index[ch] = v["id"]
     
     # FIX H-006: Merge preserved jobs back (don't overwrite!)
     # Keep enriched versions but restore applied/other flags
@@ -239,85 +306,120 @@ def merge(existing, candidates, applied_ids, other_ids):
     
     # Sort by deadline
     def sort_key(it):
-        dd = it.get("deadline","N/A")
-        try:
-            dt = datetime.strptime(dd,"%d/%m/%Y")
+        dt = parse_date_any(it.get("deadline"))
+        if dt:
             return (0, dt, it.get("title",""))
-        except Exception:
-            return (1, datetime.max, it.get("title",""))
+        return (1, date.max, it.get("title",""))
     existing.sort(key=sort_key)
+
+    # Only remember candidates seen this run, so the map can't grow unbounded
+    index["candidates"] = cand_index
     
     print(f"\n✓ Added {added} new eligible jobs", file=sys.stderr)
     print(f"✓ Merged {merged} enrichments", file=sys.stderr)
+    print(f"✓ Merged {near_merged} near-duplicates", file=sys.stderr)
+    print(f"✓ Skipped {unchanged} unchanged candidates", file=sys.stderr)
     print(f"⊘ Rejected {rejected_hindi} Hindi titles", file=sys.stderr)
     print(f"⊘ Rejected {rejected_ineligible} ineligible jobs", file=sys.stderr)
     
     return existing, added
 
-if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: python tools/schema_merge.py data.json tmp/candidates.jsonl data.json")
-        sys.exit(2)
-    
-    data_path, cand_path, out_path = sys.argv[1], sys.argv[2], sys.argv[3]
-    
-    # Load existing data
+def iter_candidates(cand_path):
+    """Yield candidates from a JSONL file one line at a time"""
+    # FIX C-005: Check file existence properly
+    if not (os.path.exists(cand_path) and os.path.isfile(cand_path)):
+        print(f"[WARN] {cand_path} not found or not readable", file=sys.stderr)
+        return
     try:
-        data = json.load(open(data_path,"r",encoding="utf-8"))
-    except FileNotFoundError:
+        with open(cand_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"[WARN] Invalid JSON in {cand_path}: {line[:50]}", file=sys.stderr)
+                    continue
+    except Exception as e:
+        print(f"[ERROR] Reading {cand_path}: {e}", file=sys.stderr)
+
+def load_data(data_path):
+    """data.json contents, read through the job store (tools/job_store.py)"""
+    if not os.path.exists(data_path):
         print(f"[WARN] {data_path} not found, starting fresh", file=sys.stderr)
-        data = {}
-    except json.JSONDecodeError as e:
-        print(f"[ERROR] {data_path} corrupted: {e}, starting fresh", file=sys.stderr)
-        data = {}
-    
+        return {}
+    return job_store.load_data(data_path)
+
+def near_dup_for(rules):
+    """NearDupIndex configured by rules.json -> "nearDuplicate", or None unless enabled (opt-in)"""
+    if (rules.get("nearDuplicate") or {}).get("enabled", False):
+        from tools.near_dup import NearDupIndex
+        return NearDupIndex.from_rules(rules)
+    return None
+
+def merge_data(data, candidates, rules=None, index=None):
+    """
+    Merge candidates (a list, or an iterator such as iter_candidates()) into a
+    data.json-shaped dict in memory.
+    Returns (data, {"added", "merged"}); the caller writes data and the index.
+    """
     existing = data.get("jobListings") or []
-    sections = data.get("sections") or {"applied":[],"other":[]}
     
-    # FIX C-005: Check file existence properly
-    cands = []
-    if os.path.exists(cand_path) and os.path.isfile(cand_path):
-        try:
-            with open(cand_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        cands.append(json.loads(line))
-                    except json.JSONDecodeError:
-                        print(f"[WARN] Invalid JSON in {cand_path}: {line[:50]}", file=sys.stderr)
-                        continue
-        except Exception as e:
-            print(f"[ERROR] Reading {cand_path}: {e}", file=sys.stderr)
-    else:
-        print(f"[WARN] {cand_path} not found or not readable", file=sys.stderr)
+    seen = [0]
+    def counted(it):
+        for c in it:
+            seen[0] += 1
+            yield c
+    cands = counted(iter(candidates))
     
-    # Get applied/other IDs from data structure
-    applied_ids = set(data.get("sections", {}).get("applied", []))
-    other_ids = set(data.get("sections", {}).get("other", []))
+    # Pinned IDs (applied by some user) from data structure; per-user "other"
+    # marks live outside data.json now (tools/user_sections.py)
+    sections = data.get("sections") or {}
+    applied_ids = set(sections.get("pinned") or sections.get("applied") or [])
+    other_ids = set(sections.get("other") or [])
     
-    merged, added = merge(existing, cands, applied_ids, other_ids)
+    # Near-duplicate merging (tunable via rules.json -> "nearDuplicate")
+    near_dup = near_dup_for(rules or {})
+    
+    merged, added = merge(existing, cands, applied_ids, other_ids, index, near_dup)
     
     data["jobListings"] = merged
-    data.setdefault("archivedListings", data.get("archivedListings") or [])
-    data.setdefault("sections", data.get("sections") or {"applied":[],"other":[],"primary":[]})
+    data.setdefault("sections", data.get("sections") or {"pinned":[],"primary":[]})
     data.setdefault("transparencyInfo", {})
     data["transparencyInfo"]["totalListings"] = len(merged)
     data["transparencyInfo"]["appliedPreserved"] = len(applied_ids)
     data["transparencyInfo"]["otherPreserved"] = len(other_ids)
+    return data, {"added": added, "merged": seen[0] - added}
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) != 3:
+        print("Usage: python tools/schema_merge.py data.json tmp/candidates.jsonl data.json")
+        sys.exit(2)
+    
+    data_path, cand_path, out_path = args
+    
+    # Load existing data
+    data = load_data(data_path)
     
-    # FIX A-001: Atomic write (write to temp file, then rename)
-    temp_path = out_path + ".tmp"
     try:
-        with open(temp_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        os.replace(temp_path, out_path)
-        print(f"✓ Written {out_path} ({len(merged)} jobs)", file=sys.stderr)
+        rules = json.load(open("rules.json", "r", encoding="utf-8"))
+    except Exception:
+        rules = {}
+    
+    idx_path = index_path(out_path)
+    index = load_index(idx_path)
+    data, result = merge_data(data, iter_candidates(cand_path), rules, index)
+    
+    try:
+        # Transactional upsert into jobs.db, then a byte-compatible data.json export
+        job_store.save_data(data, out_path)
+        print(f"✓ Written {out_path} ({len(data['jobListings'])} jobs)", file=sys.stderr)
+        save_index(idx_path, index)
+        verdict_cache.save()
     except Exception as e:
         print(f"[ERROR] Writing {out_path}: {e}", file=sys.stderr)
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
         sys.exit(1)
     
-    print(json.dumps({"added":added, "merged": len(cands) - added}))
+    print(json.dumps(result))
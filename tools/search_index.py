@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# tools/search_index.py — inverted index app.js loads the first time someone searches
+# build() turns a data.json-shaped dict into:
+#   {"version", "ids": [job ID per ordinal, in data["view"] render order],
+#    "tokens": [[title token, [ordinals]], ...],   sorted by token (prefix = range scan)
+#    "facets": {facet: {value: [ordinals]}}}       qualification, domicile, source, org
+# Ordinal lists are ascending, so the client intersects them with a merge and
+# gets results already in render order. Tokens are a list, not an object:
+# JavaScript lists integer-like object keys ("2025") first, whatever order
+# they were written in. shards.write_shards() writes it as a
+# content-hashed shards/search.<hash>.json listed under manifest["search"].
+#
+#   python tools/search_index.py [data.json]   # token/facet counts
+
+import os, sys, json, re
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import view_model
+
+INDEX_VERSION = 2
+MIN_TOKEN = 2
+TOKEN_SPLIT = re.compile(r"[\W_]+")  # same split as app.js: runs of letters/digits
+# record field -> facet name ("org" is the applyLink/detailLink host, view_model.org_of)
+FACETS = (("qualificationLevel", "qualification"), ("domicile", "domicile"), ("source", "source"), ("org", "org"))
+
+def tokens(title):
+    """Distinct lowercase title tokens (letters/digits, at least MIN_TOKEN long)"""
+    out = []
+    for t in TOKEN_SPLIT.split((title or "").lower()):
+        if len(t) >= MIN_TOKEN and t not in out:
+            out.append(t)
+    return out
+
+def _ordered(data):
+    """Jobs in render order: data["view"]["order"] when present, else sorted like view_model"""
+    jobs = [j for j in data.get("jobListings") or [] if isinstance(j, dict) and j.get("id")]
+    order = ((data.get("view") or {}).get("order")) or view_model.render_order(jobs)
+    by_id = {}
+    for j in jobs:
+        by_id.setdefault(j["id"], j)
+    return [by_id[i] for i in order if i in by_id]
+
+def build(data):
+    jobs = _ordered(data)
+    toks, facets = {}, {name: {} for _, name in FACETS}
+    for n, j in enumerate(jobs):
+        for t in tokens(j.get("title")):
+            toks.setdefault(t, []).append(n)
+        for field, name in FACETS:
+            v = j.get(field) if field != "org" else view_model.org_of(j)
+            v = " ".join(str(v).split()) if v not in (None, "") else ""
+            if v and v.upper() != "N/A":
+                facets[name].setdefault(v, []).append(n)
+    return {
+        "version": INDEX_VERSION,
+        "ids": [j["id"] for j in jobs],
+        "tokens": [[t, toks[t]] for t in sorted(toks)],
+        "facets": {name: {v: vals[v] for v in sorted(vals)} for name, vals in facets.items()},
+    }
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else "data.json"
+    with open(src, "r", encoding="utf-8") as f:
+        idx = build(json.load(f))
+    print(json.dumps({"jobs": len(idx["ids"]), "tokens": len(idx["tokens"]),
+                      "facets": {k: len(v) for k, v in idx["facets"].items()}}))
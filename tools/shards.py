@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# tools/shards.py — content-hashed static shards of data.json for the frontend
+# write_shards() splits a data.json-shaped dict into SHARD_COUNT shards,
+# jobs0..jobsN-1, bucketing each jobListing by a hash of its ID: a job stays
+# in the same shard for life, so one changed record rewrites one shard and
+# every other shard keeps its path (and the browser's cached copy).
+# (archived jobs are not in data.json; see tools/archive.py)
+# Each shard is written to shards/<name>.<hash>.json, where hash is the sha1
+# of its bytes, so the file never changes and can be cached forever.
+# manifest.json (small, always revalidated) lists the current shard paths,
+# hashes and counts plus sections, the view model (tools/view_model.py) and
+# transparencyInfo. The search index (tools/search_index.py) is written the
+# same way, as shards/search.<hash>.json under manifest["search"]; app.js
+# only fetches it once someone searches. Shards no longer referenced by the
+# current or previous manifest are deleted.
+#
+# Delta feed: the manifest's dataVersion hashes what the main view loads
+# (the shards + sections). When it changes, the view records are
+# diffed per job ID against the previous manifest's shards and written to
+# changes/<from>-<to>.json ({"from", "to", "added", "removed", "changed"}).
+# chain() does this for any previous manifest and shard reader: write_shards()
+# uses out_dir's, api/scrape-jobs.py the ones KV serves.
+# The manifest lists the last CHANGE_HISTORY feeds, so a client holding any
+# of those versions can apply the chain instead of reloading the shards.
+#
+#   python tools/shards.py [data.json] [out_dir]
+
+import os, sys, json, hashlib
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools import search_index
+
+MANIFEST = "manifest.json"
+SHARD_DIR = "shards"
+MANIFEST_VERSION = 1
+SHARD_COUNT = 4
+SHARDS = tuple(f"jobs{n}" for n in range(SHARD_COUNT))
+VIEW_SHARDS = SHARDS  # what app.js loads (every shard the manifest lists)
+CHANGES_DIR = "changes"
+CHANGE_HISTORY = 10  # feeds listed in the manifest (older clients reload the shards)
+
+def bucket(jid):
+    """Shard index of a job ID"""
+    return int(hashlib.sha1((jid or "").encode("utf-8")).hexdigest()[:8], 16) % SHARD_COUNT
+
+def split(data):
+    """{shard name: records} for a data.json-shaped dict, data order kept within a shard"""
+    out = {name: [] for name in SHARDS}
+    for j in data.get("jobListings") or []:
+        jid = j.get("id") if isinstance(j, dict) else None
+        out[SHARDS[bucket(jid)]].append(j)
+    return out
+
+def encode(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def shard_hash(blob):
+    return hashlib.sha1(blob).hexdigest()[:16]
+
+def _write_atomic(path, blob):
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(blob)
+    os.replace(temp_path, path)
+
+def load_manifest(out_dir="."):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), "r", encoding="utf-8") as f:
+            m = json.load(f)
+        return m if isinstance(m, dict) and m.get("version") == MANIFEST_VERSION else None
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[WARN] {MANIFEST} unreadable: {e}, rewriting", file=sys.stderr)
+        return None
+
+def view_version(shards, sections):
+    """Content version of what the main view loads (view shards + sections)"""
+    parts = [shards[n]["hash"] for n in VIEW_SHARDS] + [hashlib.sha1(encode(sections)).hexdigest()]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+def read_file(out_dir):
+    """read(path) over out_dir for chain(): the file's bytes, or None when it is gone"""
+    def read(rel):
+        try:
+            with open(os.path.join(out_dir, rel), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    return read
+
+def _view_records(manifest, read):
+    """The view records a manifest points at, or None when a shard is gone"""
+    out = []
+    try:
+        # Every shard it lists, so a feed also bridges a change of shard layout
+        for s in manifest["shards"].values():
+            blob = read(s["path"])
+            if blob is None:
+                return None
+            out += json.loads(blob)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return out
+
+def _by_id(records):
+    out = {}
+    for r in records:
+        jid = r.get("id") if isinstance(r, dict) else None
+        if not jid or jid in out:
+            return None
+        out[jid] = r
+    return out
+
+def diff_records(old, new):
+    """
+    Per-record diff keyed by job ID: {"added": [records], "removed": [ids],
+    "changed": {id: {"set": {field: value}, "unset": [fields]}}}.
+    None when either side has a record without a unique id.
+    """
+    a, b = _by_id(old), _by_id(new)
+    if a is None or b is None:
+        return None
+    changed = {}
+    for jid, rec in b.items():
+        was = a.get(jid)
+        if was is None or was == rec:
+            continue
+        ch = {"set": {k: v for k, v in rec.items() if k not in was or was[k] != v},
+              "unset": [k for k in was if k not in rec]}
+        changed[jid] = ch
+    return {
+        "added": [rec for jid, rec in b.items() if jid not in a],
+        "removed": [jid for jid in a if jid not in b],
+        "changed": changed,
+    }
+
+def referenced(manifest):
+    """Every shard, search index and change feed path a manifest points at"""
+    m = manifest or {}
+    paths = {s.get("path") for s in (m.get("shards") or {}).values()}
+    paths.add((m.get("search") or {}).get("path"))
+    paths |= {c.get("path") for c in m.get("changes") or []}
+    paths.discard(None)
+    return paths
+
+def _prune(out_dir, sub, keep):
+    d = os.path.join(out_dir, sub)
+    removed = 0
+    for fn in os.listdir(d):
+        if fn.endswith(".json") and f"{sub}/{fn}" not in keep:
+            os.remove(os.path.join(d, fn))
+            removed += 1
+    return removed
+
+def chain(prev, version, view, read):
+    """
+    The manifest's change list for a view at version, given the previous
+    manifest prev (None when there is none) and read(path) -> bytes of prev's
+    shards. Returns (changes, {feed path: blob} of feeds to write).
+    """
+    changes = list((prev or {}).get("changes") or [])
+    prev_version = (prev or {}).get("dataVersion")
+    if not prev_version:
+        return [], {}
+    if prev_version == version:
+        return changes, {}
+    # Diff against the view the previous manifest published; without it the
+    # chain of feeds is broken and clients fall back to the shards
+    old = _view_records(prev, read)
+    feed = diff_records(old, view) if old is not None else None
+    if feed is None:
+        return [], {}
+    rel = f"{CHANGES_DIR}/{prev_version}-{version}.json"
+    blob = encode({"from": prev_version, "to": version, **feed})
+    changes = (changes + [{"from": prev_version, "to": version, "path": rel, "bytes": len(blob),
+                           "added": len(feed["added"]), "removed": len(feed["removed"]),
+                           "changed": len(feed["changed"])}])[-CHANGE_HISTORY:]
+    return changes, {rel: blob}
+
+def write_shards(data, out_dir="."):
+    """Write changed shards, the change feed and manifest.json; returns the manifest"""
+    prev = load_manifest(out_dir)
+    for sub in (SHARD_DIR, CHANGES_DIR):
+        os.makedirs(os.path.join(out_dir, sub), exist_ok=True)
+
+    parts = split(data)
+    shards, written = {}, 0
+    for name, records in parts.items():
+        blob = encode(records)
+        h = shard_hash(blob)
+        rel = f"{SHARD_DIR}/{name}.{h}.json"
+        path = os.path.join(out_dir, rel)
+        if not os.path.exists(path):
+            _write_atomic(path, blob)
+            written += 1
+        shards[name] = {"path": rel, "hash": h, "count": len(records), "bytes": len(blob)}
+
+    idx = search_index.build(data)
+    blob = encode(idx)
+    h = shard_hash(blob)
+    search = {"path": f"{SHARD_DIR}/search.{h}.json", "hash": h, "count": len(idx["ids"]), "bytes": len(blob)}
+    if not os.path.exists(os.path.join(out_dir, search["path"])):
+        _write_atomic(os.path.join(out_dir, search["path"]), blob)
+        written += 1
+
+    sections = data.get("sections") or {}
+    version = view_version(shards, sections)
+    changes, feeds = chain(prev, version, [r for n in VIEW_SHARDS for r in parts[n]], read_file(out_dir))
+    for rel, blob in feeds.items():
+        _write_atomic(os.path.join(out_dir, rel), blob)
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "dataVersion": version,
+        "generatedAt": datetime.utcnow().isoformat() + "Z",
+        "shards": shards,
+        "changes": changes,
+        "sections": sections,
+        "view": data.get("view"),
+        "search": search,
+        "transparencyInfo": data.get("transparencyInfo") or {},
+    }
+    unchanged = prev is not None and all(
+        prev.get(k) == manifest[k] for k in ("dataVersion", "shards", "changes", "sections", "view", "search", "transparencyInfo"))
+    if unchanged:
+        manifest = prev
+    else:
+        _write_atomic(os.path.join(out_dir, MANIFEST), json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    # A browser may still hold the previous manifest; keep its shards one more round
+    keep = {s["path"] for s in shards.values()} | {search["path"]}
+    keep |= {s.get("path") for s in ((prev or {}).get("shards") or {}).values()}
+    keep.add(((prev or {}).get("search") or {}).get("path"))
+    removed = _prune(out_dir, SHARD_DIR, keep)
+    removed += _prune(out_dir, CHANGES_DIR, {c["path"] for c in changes})
+    print(f"[SHARDS] {written} written, {len(shards) + 1 - written} unchanged, {removed} removed, "
+          f"{len(changes)} change feeds", file=sys.stderr)
+    return manifest
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else "data.json"
+    out = sys.argv[2] if len(sys.argv) > 2 else "."
+    with open(src, "r", encoding="utf-8") as f:
+        m = write_shards(json.load(f), out)
+    print(json.dumps({n: s["path"] for n, s in m["shards"].items()}))
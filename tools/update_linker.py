@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# tools/update_linker.py — match corrigendum/extension updates to their parent job
+# Parents are indexed once by URL root, PDF stem and advertisement number;
+# each update only scores parents sharing at least one key. Scores and
+# tie-breaking (first parent in list order wins) match the old O(U·P) scan.
+#
+# Benchmark: python tools/update_linker.py --bench 10000 100000
+
+import re, sys, time, random, argparse
+import urllib.parse
+from collections import defaultdict
+
+W_ROOT = 0.45
+W_STEM = 0.35
+W_ADV = 0.25
+LINK_THRESHOLD = 0.6
+
+_STEM_WORDS = re.compile(r"(?i)(corrigendum|extension|extended|addendum|amendment|notice|revised|rectified|reopen|re-open|reopened)")
+_NON_WORD = re.compile(r"[\W_]+")
+_ADV_PAT = re.compile(r"(advt|advertisement|notice)\s*(no\.?|number)?\s*[:\-]?\s*([A-Za-z0-9\/\-\._]+)", re.I)
+
+def normalize_pdf_stem(u):
+    try:
+        p=urllib.parse.urlparse(u or "")
+        fn=(p.path or "").rsplit("/",1)[-1].lower()
+        fn=_STEM_WORDS.sub("",fn)
+        return _NON_WORD.sub("", fn)
+    except:
+        return ""
+
+def url_root(u):
+    try:
+        p=urllib.parse.urlparse(u or "")
+        root=p._replace(query="", fragment="")
+        path=(root.path or "/").rsplit("/",1)[0]
+        return f"{root.scheme}://{root.netloc}{path}"
+    except:
+        return u or ""
+
+def adv_no(t):
+    m=_ADV_PAT.search(t or "")
+    if m:
+        return m.group(3).lower()
+    return ""
+
+def link_keys(job):
+    """(url_root, pdf_stem, adv_no) for one job"""
+    link = job.get("applyLink")
+    return url_root(link), normalize_pdf_stem(link), adv_no(job.get("title"))
+
+class ParentIndex:
+    """Inverted indexes over parents: url_root / pdf stem / adv no -> ordinals"""
+
+    def __init__(self, parents):
+        self.parents = parents
+        self.by_root = defaultdict(list)
+        self.by_stem = defaultdict(list)
+        self.by_adv = defaultdict(list)
+        for o, p in enumerate(parents):
+            root, stem, adv = link_keys(p)
+            self.by_root[root].append(o)
+            # Empty stems/adv numbers never score (the update side must be non-empty)
+            if stem:
+                self.by_stem[stem].append(o)
+            if adv:
+                self.by_adv[adv].append(o)
+
+    def best(self, update):
+        """(parent, score) with the highest score, earliest parent on ties; (None, 0.0) if none"""
+        root, stem, adv = link_keys(update)
+        scores = defaultdict(float)
+        for o in self.by_root.get(root, ()):
+            scores[o] += W_ROOT
+        if stem:
+            for o in self.by_stem.get(stem, ()):
+                scores[o] += W_STEM
+        if adv:
+            for o in self.by_adv.get(adv, ()):
+                scores[o] += W_ADV
+        best_o, best_s = None, 0.0
+        for o in sorted(scores):
+            if scores[o] > best_s:
+                best_o, best_s = o, scores[o]
+        return (self.parents[best_o] if best_o is not None else None), best_s
+
+def best_parent_scan(update, parents):
+    """Reference O(P) scan, kept for the benchmark's equivalence check"""
+    best=None;
+    score=0.0
+    for p in parents:
+        s=0.0
+        if url_root(update.get("applyLink"))==url_root(p.get("applyLink")):
+            s+=W_ROOT
+        if normalize_pdf_stem(update.get("applyLink")) and normalize_pdf_stem(update.get("applyLink"))==normalize_pdf_stem(p.get("applyLink")):
+            s+=W_STEM
+        if adv_no(update.get("title")) and adv_no(update.get("title"))==adv_no(p.get("title")):
+            s+=W_ADV
+        if s>score:
+            score, best = s, p
+    return best, score
+
+def synthetic_listings(n, update_ratio=0.1, seed=7):
+    """n fake listings (parents + updates) shaped like data.json records"""
+    rnd = random.Random(seed)
+    hosts = [f"https://board{i}.gov.in" for i in range(max(20, n // 200))]
+    parents, updates = [], []
+    n_upd = int(n * update_ratio)
+    for i in range(n - n_upd):
+        h = rnd.choice(hosts)
+        parents.append({
+            "title": f"Recruitment of Clerk Advt No. {i}/2025",
+            "applyLink": f"{h}/notices/{rnd.randint(1, 40)}/advt_{i}.pdf",
+        })
+    for i in range(n_upd):
+        p = parents[rnd.randrange(len(parents))]
+        kind = rnd.random()
+        if kind < 0.5:
+            link = p["applyLink"].replace(".pdf", "_corrigendum.pdf")
+        elif kind < 0.8:
+            link = f"{rnd.choice(hosts)}/misc/extension_{i}.pdf"
+        else:
+            link = p["applyLink"].rsplit("/", 1)[0] + f"/notice_{i}.pdf"
+        updates.append({"title": "Corrigendum: last date extended, " + p["title"], "applyLink": link})
+    return parents, updates
+
+def bench(n, sample=20):
+    parents, updates = synthetic_listings(n)
+    t0 = time.perf_counter()
+    pidx = ParentIndex(parents)
+    t_build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    indexed = [pidx.best(u) for u in updates]
+    t_indexed = time.perf_counter() - t0
+
+    # The scan is O(U·P): time a sample and extrapolate
+    picks = updates[:sample]
+    t0 = time.perf_counter()
+    scanned = [best_parent_scan(u, parents) for u in picks]
+    t_scan = (time.perf_counter() - t0) / max(len(picks), 1) * len(updates)
+
+    same = all(a[0] is b[0] and a[1] == b[1] for a, b in zip(indexed, scanned))
+    linked = sum(1 for p, s in indexed if p is not None and s >= LINK_THRESHOLD)
+    return {
+        "listings": n, "parents": len(parents), "updates": len(updates), "linked": linked,
+        "indexBuildSec": round(t_build, 3), "indexedSec": round(t_indexed, 3),
+        "scanSecEstimated": round(t_scan, 1), "identicalOnSample": same,
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="Update -> parent linker benchmark")
+    ap.add_argument("--bench", nargs="+", type=int, default=[10000, 100000])
+    ap.add_argument("--sample", type=int, default=20)
+    args = ap.parse_args()
+    for n in args.bench:
+        r = bench(n, args.sample)
+        print(" ".join(f"{k}={v}" for k, v in r.items()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# tools/user_sections.py — per-user state and materialised sections
+# The job pipeline is user-agnostic: it publishes shared job IDs and never
+# reads anyone's marks. Each user's marks live under their own keys (in KV,
+# or a directory with the same layout for local runs), and only that user's
+# saves write them (no shared index to lose entries to a concurrent save):
+#   user/<uid>/state.json     {job id: {"action", "ts"}} as app.js syncs it
+#   user/<uid>/sections.json  {"applied", "other", "examDoneArchived", "validUntil", "state"}
+#   user/<uid>/meta.json      {"version", "state", "validUntil", "applied", "ids", "legacy"}
+#   user/<uid>/auth.json      {"sha256"} of the user's secret (api/user-state.py);
+#                             marks without one (the imported legacy blob) are
+#                             only handed over with an invite or migration secret
+# save_state() stores one user's state and materialises only their sections.
+# refresh() re-materialises just the users whose sections went stale: an
+# exam_done mark passing its 7 days (validUntil) or a job ID QC merged into
+# another (aliases). Adding or editing a user never reruns the pipeline.
+# pinned_ids() (every ID someone applied to, from the users' meta keys) is
+# the one thing the pipeline takes from here: pinned jobs are never filtered
+# or archived.
+#
+#   python tools/user_sections.py [--dir users] pinned | refresh | show <uid> | import <state.json> [uid]
+
+import os, re, sys, json, hmac, hashlib
+from datetime import datetime, date, timedelta
+
+META_VERSION = 2
+SECTIONS_VERSION = 1
+EXAM_DONE_DAYS = 7  # applied jobs stay in "applied" this long after exam_done
+LEGACY_USER = "personal"  # owner of the old single user_state_personal.json / user_state.json
+USER_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+JOB_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")  # job_<sha1> and the legacy IDs QC re-keys
+MAX_STATE_ENTRIES = 2000
+MAX_STATE_BYTES = 256 * 1024
+PREFIX = "user/"
+
+class StateError(ValueError):
+    pass
+
+def state_key(uid):
+    return f"{PREFIX}{uid}/state.json"
+
+def sections_key(uid):
+    return f"{PREFIX}{uid}/sections.json"
+
+def meta_key(uid):
+    return f"{PREFIX}{uid}/meta.json"
+
+def auth_key(uid):
+    return f"{PREFIX}{uid}/auth.json"
+
+class DirStore:
+    """Directory with the KV key layout (get/put/list like tools.kv_publish.KVClient)"""
+
+    def __init__(self, root="users"):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, blob, content_type="application/json"):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(blob)
+        os.replace(temp_path, path)
+
+    def list(self, prefix=""):
+        out = []
+        for d, _, files in os.walk(self.root):
+            rel = os.path.relpath(d, self.root)
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                key = name if rel == "." else "/".join(rel.split(os.sep) + [name])
+                if key.startswith(prefix):
+                    out.append(key)
+        return sorted(out)
+
+def _dump(obj):
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+def _get_json(store, key, default):
+    try:
+        raw = store.get(key)
+        obj = json.loads(raw) if raw else None
+    except ValueError as e:
+        print(f"[WARN] {key} unreadable: {e}", file=sys.stderr)
+        obj = None
+    return obj if isinstance(obj, type(default)) else default
+
+def state_sha1(state):
+    return hashlib.sha1(_dump(state or {})).hexdigest()
+
+def check_uid(uid):
+    if not isinstance(uid, str) or not USER_ID.match(uid):
+        raise StateError("user id must be 1-64 letters, digits, '-' or '_'")
+    return uid
+
+def check_state(state):
+    """A state as app.js sends it, within MAX_STATE_ENTRIES / MAX_STATE_BYTES and with job IDs only"""
+    if not isinstance(state, dict):
+        raise StateError("state must be an object")
+    if len(state) > MAX_STATE_ENTRIES or len(_dump(state)) > MAX_STATE_BYTES:
+        raise StateError(f"state over {MAX_STATE_ENTRIES} entries or {MAX_STATE_BYTES} bytes")
+    bad = [jid for jid, rec in state.items() if not JOB_ID.match(jid) or not isinstance(rec, dict)]
+    if bad:
+        raise StateError(f"{len(bad)} entries are not job IDs with a mark, e.g. {bad[0][:40]!r}")
+    return state
+
+def _done_date(ts):
+    return datetime.fromisoformat(ts.replace("Z", "")).date()
+
+def marks(state, today):
+    """(applied, other, examDoneArchived, validUntil) for one user's state"""
+    applied, other, archived = set(), set(), set()
+    valid_until = None
+    for jid, rec in (state or {}).items():
+        if not isinstance(rec, dict):
+            continue
+        action = rec.get("action")
+        if action == "applied":
+            applied.add(jid)
+        elif action in ("other", "not_interested"):
+            other.add(jid)
+        elif action == "exam_done":
+            try:
+                done = _done_date(rec["ts"]) if rec.get("ts") else None
+            except ValueError:
+                print(f"[WARN] Bad timestamp for {jid}: {rec.get('ts')}", file=sys.stderr)
+                done = None  # keep the job rather than lose it
+            if done is None or (today - done).days <= EXAM_DONE_DAYS:
+                applied.add(jid)
+                if done is not None:
+                    expires = done + timedelta(days=EXAM_DONE_DAYS + 1)
+                    valid_until = min(valid_until or expires, expires)
+            else:
+                archived.add(jid)
+    other -= applied
+    return sorted(applied), sorted(other), sorted(archived), valid_until
+
+def remap(state, aliases):
+    """state with job IDs QC merged into another carried over to the surviving ID"""
+    if not aliases:
+        return state
+    out = dict(state)
+    for old, new in aliases.items():
+        if old in out and new not in out:
+            out[new] = out.pop(old)
+    return out
+
+def materialise(state, today, aliases=None):
+    state = remap(state or {}, aliases)
+    applied, other, archived, valid_until = marks(state, today)
+    return state, {
+        "version": SECTIONS_VERSION,
+        "applied": applied,
+        "other": other,
+        "examDoneArchived": archived,
+        "validUntil": valid_until.isoformat() if valid_until else None,
+        "state": state_sha1(state),
+    }
+
+def load_meta(store, uid):
+    meta = _get_json(store, meta_key(uid), {})
+    return meta if meta.get("version") == META_VERSION else {"version": META_VERSION}
+
+def load_users(store):
+    """{uid: meta} for every user with a meta key (one listing, one read per user)"""
+    out = {}
+    for key in store.list(PREFIX):
+        parts = key.split("/")
+        if len(parts) == 3 and parts[2] == "meta.json" and USER_ID.match(parts[1]):
+            out[parts[1]] = load_meta(store, parts[1])
+    return out
+
+def load_sections(store, uid):
+    return _get_json(store, sections_key(uid), {})
+
+def _write(store, uid, meta, state, sections, state_changed):
+    if state_changed:
+        store.put(state_key(uid), _dump(state))
+    store.put(sections_key(uid), _dump(sections))
+    meta.update({
+        "version": META_VERSION, "state": sections["state"], "validUntil": sections["validUntil"],
+        "applied": sections["applied"], "ids": sorted(state),
+    })
+    store.put(meta_key(uid), _dump(meta))
+
+def save_state(store, uid, state, today=None):
+    """Store one user's state and materialise their sections (touches only user/<uid>/)"""
+    check_uid(uid)
+    state, sections = materialise(check_state(state), today or date.today())
+    _write(store, uid, load_meta(store, uid), state, sections, True)
+    return sections
+
+def refresh(store, today=None, aliases=None, users=None):
+    """Re-materialise users whose sections are stale; returns their uids"""
+    today = today or date.today()
+    users = load_users(store) if users is None else users
+    aliased = set(aliases or {})
+    due = [uid for uid, u in users.items()
+           if (u.get("validUntil") and u["validUntil"] <= today.isoformat()) or aliased & set(u.get("ids") or [])]
+    for uid in due:
+        before = _get_json(store, state_key(uid), {})
+        state, sections = materialise(before, today, aliases)
+        _write(store, uid, users[uid], state, sections, state != before)
+    if due:
+        print(f"[USERS] Re-materialised {len(due)} of {len(users)} users", file=sys.stderr)
+    return due
+
+def pinned_ids(users):
+    """Every job ID some user has in "applied" (the pipeline never drops these), from load_users()"""
+    return sorted({jid for u in users.values() for jid in u.get("applied") or []})
+
+def import_legacy(store, state, uid=LEGACY_USER, today=None):
+    """
+    Adopt a single-user state blob (user_state.json) as uid's state, only when
+    the blob changed since it was last imported (so it never overwrites marks
+    saved per user since)
+    """
+    if not isinstance(state, dict) or not state:
+        return None
+    h = state_sha1(state)
+    if load_meta(store, uid).get("legacy") == h:
+        return None
+    state = {jid: rec for jid, rec in state.items() if JOB_ID.match(jid) and isinstance(rec, dict)}
+    sections = save_state(store, uid, state, today)
+    meta = load_meta(store, uid)
+    meta["legacy"] = h
+    store.put(meta_key(uid), _dump(meta))
+    return sections
+
+def _secret_sha(secret):
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+def unowned(store, uid):
+    """True when uid has marks but no secret yet (imported from the legacy blob): whoever claims it takes them over"""
+    return not _get_json(store, auth_key(uid), {}).get("sha256") and store.get(meta_key(uid)) is not None
+
+def authorize(store, uid, secret, claim=False, adopt=False):
+    """
+    True when secret is uid's secret. With claim, a new user takes this
+    secret; an unowned() one (marks imported from the legacy blob) also
+    needs adopt, which the caller grants for an invite or migration secret.
+    """
+    if not isinstance(secret, str) or len(secret) < 16:
+        return False
+    stored = _get_json(store, auth_key(uid), {}).get("sha256")
+    if stored:
+        return hmac.compare_digest(stored, _secret_sha(secret))
+    if not claim or (not adopt and unowned(store, uid)):
+        return False
+    store.put(auth_key(uid), _dump({"sha256": _secret_sha(secret)}))
+    return True
+
+def local_pins(base_dir=".", today=None):
+    """Pinned IDs for a local run: users/ (importing user_state.json first)"""
+    store = DirStore(os.path.join(base_dir, "users"))
+    try:
+        with open(os.path.join(base_dir, "user_state.json"), "r", encoding="utf-8") as f:
+            import_legacy(store, json.load(f), today=today)
+    except (FileNotFoundError, ValueError):
+        pass
+    return pinned_ids(load_users(store))
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    root = "users"
+    if "--dir" in args:
+        i = args.index("--dir")
+        root = args[i + 1]
+        del args[i:i + 2]
+    store = DirStore(root)
+    cmd = args[0] if args else "pinned"
+    if cmd == "pinned":
+        print(json.dumps(pinned_ids(load_users(store))))
+    elif cmd == "refresh":
+        print(json.dumps(refresh(store)))
+    elif cmd == "show" and len(args) == 2:
+        print(json.dumps(load_sections(store, args[1]), indent=2, ensure_ascii=False))
+    elif cmd == "import" and len(args) >= 2:
+        with open(args[1], "r", encoding="utf-8") as f:
+            print(json.dumps(save_state(store, args[2] if len(args) > 2 else LEGACY_USER, json.load(f)), indent=2))
+    else:
+        print("Usage: python tools/user_sections.py [--dir users] pinned | refresh | show <uid> | import <state.json> [uid]")
+        sys.exit(2)
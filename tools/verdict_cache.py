@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# tools/verdict_cache.py — persistent eligibility verdicts shared by merge, QC and the PDF parser
+# A verdict depends only on the text it was computed from and the rule
+# tables, so it is stored under (check, sha1 of the normalised text) next
+# to a ruleset hash per check: the sha1 of tools/eligibility.py, rules.json
+# and the checking module itself. When any of those files change the
+# check's verdicts are dropped on first use. Hits and misses per check are
+# kept for health.json; save() writes the cache back (like canonical.py).
+
+import os, sys, json, hashlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.environ.get("VERDICT_CACHE", "eligibility_cache.json")
+CACHE_VERSION = 1
+RULE_FILES = ("tools/eligibility.py", "rules.json")
+# rules.json keys QC rewrites every run that no check reads
+RULES_VOLATILE = ("captureHints",)
+MAX_ENTRIES = 50000  # per check; least recently used verdicts go first
+
+_state = {"checks": None, "lastRun": None, "dirty": False, "path": CACHE_PATH, "rulesets": {}, "stats": {}}
+
+def _file_sha1(path):
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return ""
+    if path.endswith(".json"):
+        # Hash the content, not the formatting QC happens to write it in
+        try:
+            obj = json.loads(raw)
+            if isinstance(obj, dict):
+                obj = {k: v for k, v in obj.items() if k not in RULES_VOLATILE}
+            raw = json.dumps(obj, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        except ValueError:
+            pass
+    return hashlib.sha1(raw).hexdigest()
+
+def ruleset_hash(code=()):
+    """Hash of the shared rule files plus the checking module's own files"""
+    parts = [_file_sha1(os.path.join(ROOT, p)) for p in RULE_FILES + tuple(code)]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+def text_key(text):
+    return hashlib.sha1(" ".join((text or "").split()).encode("utf-8", "replace")).hexdigest()[:16]
+
+def _load():
+    if _state["checks"] is None:
+        checks, last_run = {}, {}
+        try:
+            with open(_state["path"], "r", encoding="utf-8") as f:
+                obj = json.load(f)
+            if isinstance(obj, dict) and obj.get("version") == CACHE_VERSION:
+                checks = obj.get("checks") or {}
+                last_run = obj.get("lastRun") or {}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[WARN] {_state['path']} unreadable: {e}, starting empty", file=sys.stderr)
+        _state["checks"] = checks
+        _state["lastRun"] = last_run
+    return _state["checks"]
+
+def use_cache(path):
+    """Point the verdict cache at another file (drops anything unsaved)"""
+    _state.update({"checks": None, "lastRun": None, "dirty": False, "path": path, "stats": {}})
+
+def _table(check, code):
+    checks = _load()
+    rs = _state["rulesets"].get(check)
+    if rs is None:
+        rs = _state["rulesets"][check] = ruleset_hash(code)
+    entry = checks.get(check)
+    if not entry or entry.get("ruleset") != rs:
+        if entry:
+            print(f"[INFO] {check} eligibility rules changed, dropping {len(entry.get('verdicts') or {})} cached verdicts", file=sys.stderr)
+        entry = checks[check] = {"ruleset": rs, "verdicts": {}}
+        _state["dirty"] = True
+    return entry["verdicts"]
+
+def lookup(check, text, compute, code=()):
+    """
+    Cached compute() for text under check. compute must return a JSON-able
+    verdict (lists come back as tuples); code lists extra files (relative to
+    the repo root) whose changes invalidate this check.
+    """
+    verdicts = _table(check, code)
+    st = _state["stats"].setdefault(check, {"hits": 0, "misses": 0})
+    k = text_key(text)
+    v = verdicts.pop(k, None)
+    if v is None:
+        st["misses"] += 1
+        v = compute()
+        v = list(v) if isinstance(v, tuple) else v
+    else:
+        st["hits"] += 1
+    verdicts[k] = v  # re-insert: dict order doubles as recency
+    _state["dirty"] = True
+    return tuple(v) if isinstance(v, list) else v
+
+def stats():
+    """{check: {"hits", "misses", "hitRate"}} for this process, falling back to each check's last saved run"""
+    _load()
+    out = dict(_state["lastRun"] or {})
+    for check, st in _state["stats"].items():
+        n = st["hits"] + st["misses"]
+        out[check] = {**st, "hitRate": round(st["hits"] / n, 4) if n else 0.0}
+    return out
+
+def save():
+    """Persist the cache (verdicts, recency and this run's hit counts) if it was used"""
+    if not _state["dirty"]:
+        return
+    checks = _load()
+    for entry in checks.values():
+        v = entry["verdicts"]
+        if len(v) > MAX_ENTRIES:
+            entry["verdicts"] = dict(list(v.items())[-MAX_ENTRIES:])
+    path = _state["path"]
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "checks": checks, "lastRun": stats()},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, path)
+        _state["dirty"] = False
+    except Exception as e:
+        print(f"[WARN] Writing {path}: {e}", file=sys.stderr)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# tools/view_model.py — what app.js renders, precomputed so the page does not sort
+# build() returns data["view"]:
+#   {"version", "order": all IDs in render order}
+# Render order is app.js's old sortByDeadline: earliest deadline first (ties
+# keep job order), then jobs without a deadline by title. The sort key and
+# the org facet (org_of) are derived here and in tools/search_index.py, never
+# stored on the records. Who applied to what is per user
+# (tools/user_sections.py) and expiry moves with the clock, so app.js splits
+# the ordered list into its tabs itself.
+#
+#   python tools/view_model.py [data.json]   # print the view for a data.json
+
+import os, sys, json
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.core import parse_date_any
+
+VIEW_VERSION = 2  # 2: no sections; sortKey/org no longer stored on records
+NO_DEADLINE = 99991231
+
+def sort_key(deadline):
+    d = parse_date_any(deadline) if isinstance(deadline, str) else None
+    return d.year * 10000 + d.month * 100 + d.day if d else NO_DEADLINE
+
+def org_of(job):
+    for f in ("applyLink", "detailLink"):
+        try:
+            u = urlparse(job.get(f) or "")
+        except ValueError:
+            continue
+        h = u.netloc.lower() if u.scheme in ("http", "https") else ""
+        if h:
+            return h[4:] if h.startswith("www.") else h
+    return ""
+
+def render_order(jobs):
+    def key(j):
+        k = sort_key(j.get("deadline"))
+        return (k, (j.get("title") or "") if k == NO_DEADLINE else "")
+    return [j.get("id") for j in sorted(jobs, key=key) if j.get("id")]
+
+def build(jobs):
+    """data["view"] for data["jobListings"]"""
+    return {"version": VIEW_VERSION, "order": render_order(jobs)}
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else "data.json"
+    with open(src, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    print(json.dumps(build(data.get("jobListings") or []), indent=2, ensure_ascii=False))